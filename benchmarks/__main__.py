@@ -0,0 +1,140 @@
+"""
+Runs all benchmark suites and compares results with the baseline.
+
+    python -m benchmarks --output results.json --baseline baseline.json
+
+Results are written as JSON (one record per suite/case, see
+`benchmarks.common.record`). If baseline file does not exist, it is
+created from the current results; otherwise the command exits with
+non zero code when throughput, p90 latency or peak RSS of any case is
+worse than baseline by more than `--tolerance`.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import typer
+
+from benchmarks import common
+from benchmarks import db as db_bench
+from benchmarks import ocr as ocr_bench
+from benchmarks import s3 as s3_bench
+from benchmarks import startup as startup_bench
+from benchmarks import stitch as stitch_bench
+
+SUITES = ("startup", "db", "stitch", "s3", "ocr")
+
+app = typer.Typer(help="Benchmark suite")
+
+
+def run_suites(suites: list[str], quick: bool, work_dir: Path) -> list[dict]:
+    records = []
+    if "startup" in suites:
+        records.extend(startup_bench.run_suite(repeat=3 if quick else 5))
+    if "db" in suites:
+        url = f"sqlite:///{work_dir / 'bench.sqlite3'}"
+        page_counts = [10, 100] if quick else [10, 100, 1000]
+        records.extend(db_bench.run_suite(url, page_counts))
+    if "stitch" in suites:
+        page_counts = [10, 100] if quick else [10, 100, 1000]
+        records.extend(stitch_bench.run_suite(page_counts, work_dir / "stitch"))
+    if "s3" in suites:
+        page_counts = [10] if quick else [10, 100]
+        records.extend(s3_bench.run_suite(page_counts, work_dir / "s3"))
+    if "ocr" in suites:
+        page_count = 3 if quick else ocr_bench.DEFAULT_PAGE_COUNT
+        records.extend(ocr_bench.run_suite(page_count, work_dir / "ocr"))
+
+    return records
+
+
+def compare(records: list[dict], baseline: list[dict], tolerance: float):
+    """Returns list of regressions (human readable strings)"""
+    previous = {(item["suite"], item["case"]): item for item in baseline}
+    regressions = []
+    for item in records:
+        base = previous.get((item["suite"], item["case"]))
+        if base is None:
+            continue
+
+        name = f"{item['suite']} {item['case']}"
+        if item["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {item['throughput']:.1f} {item['unit']}"
+                f" < baseline {base['throughput']:.1f}"
+            )
+        if item["latency"]["p90"] > base["latency"]["p90"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p90 latency {item['latency']['p90']:.3f}s"
+                f" > baseline {base['latency']['p90']:.3f}s"
+            )
+        if item["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {item['peak_rss_mb']:.0f}MB"
+                f" > baseline {base['peak_rss_mb']:.0f}MB"
+            )
+
+    return regressions
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+@app.command()
+def run(
+    suite: list[str] = list(SUITES),
+    output: Path = Path("benchmark-results.json"),
+    baseline: Path = Path("benchmark-baseline.json"),
+    tolerance: float = 0.2,
+    quick: bool = False,
+):
+    """Run benchmark suites; exit with code 1 on regression"""
+    unknown = set(suite) - set(SUITES)
+    if unknown:
+        raise typer.BadParameter(f"Unknown suite(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        records = run_suites(suite, quick, Path(work_dir))
+
+    common.print_records(records)
+    results = {"environment": environment(), "results": records}
+    output.write_text(json.dumps(results, indent=2))
+
+    if not baseline.exists():
+        baseline.write_text(json.dumps(results, indent=2))
+        typer.echo(f"Baseline {baseline} created")
+        return
+
+    regressions = compare(
+        records, json.loads(baseline.read_text())["results"], tolerance
+    )
+    for line in regressions:
+        typer.echo(f"REGRESSION {line}", err=True)
+    if regressions:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
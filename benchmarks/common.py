@@ -0,0 +1,112 @@
+"""Helpers shared by benchmarks"""
+
+import multiprocessing
+import resource
+import statistics
+import time
+from queue import Empty
+
+# seconds between checks whether benchmark process is still alive
+POLL_INTERVAL = 1
+
+
+def run_isolated(func, *args, **kwargs) -> dict:
+    """Runs `func` in a fresh process
+
+    Returns dict with return value of the function ("result"), wall time
+    in seconds ("seconds") and peak RSS of the process in MB ("peak_rss_mb").
+    Fresh process is used so that peak RSS is not affected by what
+    happened in the benchmark process before. Raises RuntimeError if the
+    process dies without reporting (e.g. killed by OOM killer).
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(queue, func, args, kwargs))
+    process.start()
+    outcome = None
+    while outcome is None:
+        alive = process.is_alive()
+        try:
+            outcome = queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            if not alive:
+                # checked before the last `get`: result, if any, was
+                # already in the queue
+                process.join()
+                raise RuntimeError(
+                    f"Benchmark process exited with code {process.exitcode}"
+                    " without result"
+                )
+    process.join()
+    if "error" in outcome:
+        raise RuntimeError(outcome["error"])
+
+    return outcome
+
+
+def _run(queue, func, args, kwargs):
+    try:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        # ru_maxrss is in kilobytes on Linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        queue.put(
+            {"result": result, "seconds": seconds, "peak_rss_mb": peak_rss}
+        )
+    except Exception as ex:
+        queue.put({"error": repr(ex)})
+
+
+def latency_stats(samples: list[float]) -> dict:
+    """Latency percentiles (in seconds) of the given samples"""
+    samples = sorted(samples)
+    if len(samples) == 1:
+        p50 = p90 = p99 = samples[0]
+    else:
+        quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p90, p99 = quantiles[49], quantiles[89], quantiles[98]
+
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "max": samples[-1],
+    }
+
+
+def record(
+    suite: str,
+    case: str,
+    samples: list[float],
+    throughput: float,
+    unit: str,
+    peak_rss_mb: float,
+    **extra,
+) -> dict:
+    """One benchmark result in the format stored in JSON baseline"""
+    return {
+        "suite": suite,
+        "case": case,
+        "throughput": throughput,
+        "unit": unit,
+        "latency": latency_stats(samples),
+        "peak_rss_mb": peak_rss_mb,
+        **extra,
+    }
+
+
+def print_records(records: list[dict]):
+    print(
+        f"{'suite':<8}{'case':<44}{'throughput':>16}"
+        f"{'p50 s':>10}{'p90 s':>10}{'RSS MB':>8}"
+    )
+    for item in records:
+        throughput = f"{item['throughput']:.1f} {item['unit']}"
+        print(
+            f"{item['suite']:<8}{item['case']:<44}{throughput:>16}"
+            f"{item['latency']['p50']:>10.3f}{item['latency']['p90']:>10.3f}"
+            f"{item['peak_rss_mb']:>8.0f}"
+        )
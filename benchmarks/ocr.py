@@ -0,0 +1,225 @@
+"""
+Benchmark of `run_one_page_ocr`: per page latency and pages/sec.
+
+Requires tesseract and ghostscript; suite is skipped if they are missing.
+
+    python -m benchmarks.ocr --pages 10 --lang eng
+
+Pages are OCRed with both engines (tesseract subprocess per page and
+in-process tesserocr, if tesserocr is installed); pages/sec of tesserocr
+is reported along with its speed up over the subprocess engine.
+
+With `--sweep`, same pages are OCRed with every split of the CPU budget
+between worker processes and OCR threads (e.g. 8 = 8x1, 4x2, 2x4, 1x8)
+and the split with most pages/sec is reported:
+
+    python -m benchmarks.ocr --pages 32 --sweep --cpu-budget 8 \
+        --engine tesserocr
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import typer
+
+from benchmarks import common, synthetic
+
+DEFAULT_PAGE_COUNT = 5
+REQUIRED_PROGRAMS = ("tesseract", "gs")
+TESSERACT = "tesseract"
+TESSEROCR = "tesserocr"
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="OCR benchmark")
+
+
+def is_available() -> bool:
+    return all(shutil.which(program) for program in REQUIRED_PROGRAMS)
+
+
+def engines() -> list[str]:
+    """OCR engines available in this environment"""
+    try:
+        import tesserocr  # noqa: F401
+    except ImportError:
+        return [TESSERACT]
+
+    return [TESSERACT, TESSEROCR]
+
+
+def ocr_pages(
+    srcs: list[Path], work_dir: Path, lang: str, engine: str = TESSERACT
+) -> list[float]:
+    """Runs in a fresh process; returns OCR time of each page in seconds
+
+    First page includes one time costs (imports, loading of language
+    data), which is why it is reported separately by `run_suite`.
+    """
+    return [ocr_one(src, work_dir, lang, engine) for src in srcs]
+
+
+def ocr_one(
+    src: Path, work_dir: Path, lang: str, engine: str = TESSERACT
+) -> float:
+    """OCRs one page pdf file; returns duration in seconds"""
+    from ocrworker.ocr import run_one_page_ocr
+
+    page_id = uuid.uuid4()
+    output_dir = work_dir / str(page_id)
+    output_dir.mkdir(parents=True)
+    start = time.perf_counter()
+    run_one_page_ocr(
+        file_path=src,
+        output_dir=output_dir / "page.pdf",
+        sidecar_dir=work_dir,
+        uuid=page_id,
+        lang=lang,
+        engine=engine,
+    )
+
+    return time.perf_counter() - start
+
+
+def init_threads(threads: int):
+    from ocrworker import cpu_budget
+
+    cpu_budget.init_process(threads)
+
+
+def splits(budget: int) -> list[tuple[int, int]]:
+    """All (concurrency, threads) pairs with concurrency x threads = budget"""
+    return [(c, budget // c) for c in range(1, budget + 1) if budget % c == 0]
+
+
+def sweep(
+    srcs: list[Path],
+    work_dir: Path,
+    budget: int,
+    lang: str,
+    engine: str = TESSERACT,
+) -> list[dict]:
+    """OCRs `srcs` with every split of the CPU budget
+
+    Each split uses a pool of `concurrency` processes (like celery prefork
+    pool) with `threads` OCR threads each.
+    """
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for concurrency, threads in splits(budget):
+        with ProcessPoolExecutor(
+            max_workers=concurrency,
+            mp_context=ctx,
+            initializer=init_threads,
+            initargs=(threads,),
+        ) as executor:
+            # one page per process to exclude start up costs
+            warmup = partial(
+                ocr_one, work_dir=work_dir / "warmup", lang=lang, engine=engine
+            )
+            list(executor.map(warmup, srcs[:concurrency]))
+            run = partial(
+                ocr_one, work_dir=work_dir / "run", lang=lang, engine=engine
+            )
+            start = time.perf_counter()
+            samples = list(executor.map(run, srcs))
+            seconds = time.perf_counter() - start
+        results.append(
+            {
+                "concurrency": concurrency,
+                "threads": threads,
+                "pages_per_sec": len(srcs) / seconds,
+                "latency": common.latency_stats(samples),
+            }
+        )
+
+    return results
+
+
+def run_suite(page_count: int, work_dir: Path, lang: str = "eng") -> list[dict]:
+    if not is_available():
+        logger.warning(
+            f"OCR benchmark skipped: one of {REQUIRED_PROGRAMS} not found"
+        )
+        return []
+
+    srcs = synthetic.make_page_pdfs(work_dir / "pages", page_count)
+    records = []
+    for engine in engines():
+        outcome = common.run_isolated(
+            ocr_pages, srcs, work_dir / "ocr" / engine, lang, engine
+        )
+        first, *samples = outcome["result"]
+        samples = samples or [first]
+        # subprocess engine keeps its historical case name, so that
+        # existing baselines still apply
+        name = "run_one_page_ocr" if engine == TESSERACT else engine
+        records.append(
+            common.record(
+                suite="ocr",
+                case=f"{name}/{lang}/pages={page_count}",
+                samples=samples,
+                throughput=1 / statistics.median(samples),
+                unit="pages/s",
+                peak_rss_mb=outcome["peak_rss_mb"],
+                first_page_sec=first,
+            )
+        )
+
+    if len(records) > 1:
+        speedup = records[1]["throughput"] / records[0]["throughput"]
+        records[1]["speedup"] = round(speedup, 2)
+
+    return records
+
+
+@app.command()
+def main(
+    pages: int = DEFAULT_PAGE_COUNT,
+    lang: str = "eng",
+    sweep_budget: bool = typer.Option(False, "--sweep"),
+    cpu_budget: int = os.cpu_count(),
+    engine: str = TESSERACT,
+):
+    """Run OCR benchmark and print results"""
+    if not is_available():
+        typer.echo(f"One of {REQUIRED_PROGRAMS} not found", err=True)
+        raise typer.Exit(1)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if not sweep_budget:
+            records = run_suite(pages, Path(work_dir), lang)
+            common.print_records(records)
+            for item in records:
+                if "speedup" in item:
+                    print(f"{item['case']}: {item['speedup']}x pages/s")
+            return
+
+        srcs = synthetic.make_page_pdfs(Path(work_dir) / "pages", pages)
+        results = sweep(srcs, Path(work_dir), cpu_budget, lang, engine)
+
+    print(f"{'processes':>10}{'threads':>10}{'pages/s':>10}{'p50 s':>10}")
+    for item in results:
+        print(
+            f"{item['concurrency']:>10}{item['threads']:>10}"
+            f"{item['pages_per_sec']:>10.2f}{item['latency']['p50']:>10.2f}"
+        )
+    best = max(results, key=lambda item: item["pages_per_sec"])
+    print(
+        f"Best split of {cpu_budget} CPUs: celery --concurrency="
+        f"{best['concurrency']} with"
+        f" PAPERMERGE__OCR__THREADS_PER_PROCESS={best['threads']}"
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,155 @@
+"""
+Benchmark of `s3.download_pdf_pages` against local S3 stand-in.
+
+Stand-in is a tiny HTTP server which serves GET/HEAD requests (path or
+virtual host style, signature is not checked) from a local folder, so
+that benchmark measures overhead of the client side (signing, connection
+reuse, concurrency, writing files) without network noise.
+
+    python -m benchmarks.s3 --pages 10 --pages 100
+"""
+
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import typer
+
+from benchmarks import common, synthetic
+
+DEFAULT_PAGE_COUNTS = [10, 100]
+BUCKET = "bench"
+
+app = typer.Typer(help="S3 download benchmark")
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """Serves `<bucket>/<key>` files from the `directory`"""
+
+    def translate_path(self, path):
+        path = path.split("?", 1)[0]
+        host = self.headers.get("Host", "")
+        if host.startswith(f"{BUCKET}."):
+            # virtual host style: key is the whole path
+            path = f"/{BUCKET}{path}"
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def local_s3(root: Path):
+    """Yields endpoint URL of S3 stand-in serving files from `root`"""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(Handler, directory=str(root))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def populate(root: Path, page_count: int, work_dir: Path) -> list[str]:
+    """Uploads (copies) `page_count` page.pdf files into the bucket"""
+    from ocrworker import constants as const
+    from ocrworker import plib
+
+    srcs = synthetic.make_page_pdfs(work_dir, page_count)
+    page_ids = []
+    for src in srcs:
+        page_id = str(uuid.uuid4())
+        dst = root / BUCKET / plib.page_path(page_id) / const.PAGE_PDF
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(src, dst)
+        page_ids.append(page_id)
+
+    return page_ids
+
+
+def download(endpoint_url: str, media_root: str, page_ids: list[str]):
+    """Runs in a fresh process; returns download time in seconds"""
+    from ocrworker import config
+
+    settings = config.get_settings()
+    settings.papermerge__s3__bucket_name = BUCKET
+    settings.papermerge__s3__endpoint_url = endpoint_url
+    settings.papermerge__main__media_root = Path(media_root)
+    settings.aws_access_key_id = "bench"
+    settings.aws_secret_access_key = "bench"
+    settings.aws_region_name = "us-east-1"
+
+    from ocrworker import s3
+
+    start = time.perf_counter()
+    s3.download_pdf_pages(page_ids)
+
+    return time.perf_counter() - start
+
+
+def bench_s3(page_counts: list[int], work_dir: Path, repeat: int = 3):
+    root = work_dir / "s3"
+    page_ids = populate(root, max(page_counts), work_dir / "pages")
+    results = []
+    with local_s3(root) as endpoint_url:
+        for page_count in page_counts:
+            samples = []
+            peak_rss = 0.0
+            for _ in range(repeat):
+                # every run starts with empty local cache
+                media_root = tempfile.mkdtemp(dir=work_dir)
+                outcome = common.run_isolated(
+                    download, endpoint_url, media_root, page_ids[:page_count]
+                )
+                samples.append(outcome["result"])
+                peak_rss = max(peak_rss, outcome["peak_rss_mb"])
+                shutil.rmtree(media_root)
+            results.append(
+                {
+                    "pages": page_count,
+                    "seconds": samples,
+                    "peak_rss_mb": peak_rss,
+                }
+            )
+
+    return results
+
+
+def run_suite(page_counts: list[int], work_dir: Path) -> list[dict]:
+    records = []
+    for result in bench_s3(page_counts, work_dir):
+        samples = result["seconds"]
+        records.append(
+            common.record(
+                suite="s3",
+                case=f"download_pdf_pages/pages={result['pages']}",
+                samples=samples,
+                throughput=result["pages"] / statistics.median(samples),
+                unit="pages/s",
+                peak_rss_mb=result["peak_rss_mb"],
+            )
+        )
+
+    return records
+
+
+@app.command()
+def main(pages: list[int] = DEFAULT_PAGE_COUNTS):
+    """Run S3 download benchmark and print results"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        common.print_records(run_suite(pages, Path(work_dir)))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,77 @@
+"""
+Benchmark of start up time: CLI, import of worker tasks and OCR warm up.
+
+Each case is a fresh Python interpreter, i.e. includes interpreter start.
+
+    python -m benchmarks.startup --repeat 5
+"""
+
+import resource
+import subprocess
+import sys
+import time
+
+import typer
+
+from benchmarks import common
+
+DEFAULT_REPEAT = 5
+
+CASES = {
+    "cli --help": [
+        "-c",
+        "import sys; from ocrworker.cli.ocr import app; sys.argv[1:] = "
+        "['--help']; app()",
+    ],
+    "import ocrworker.tasks": ["-c", "import ocrworker.tasks"],
+    "ocr warm up": ["-c", "from ocrworker import ocr; ocr.warm_up('eng')"],
+}
+
+app = typer.Typer(help="Start up benchmark")
+
+
+def run_command(args: list[str], repeat: int) -> dict:
+    """Runs in a fresh process; returns durations and peak RSS of children"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        samples.append(time.perf_counter() - start)
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    return {"seconds": samples, "peak_rss_mb": peak_rss}
+
+
+def run_suite(repeat: int = DEFAULT_REPEAT) -> list[dict]:
+    records = []
+    for case, args in CASES.items():
+        result = common.run_isolated(run_command, args, repeat)["result"]
+        samples = result["seconds"]
+        records.append(
+            common.record(
+                suite="startup",
+                case=case,
+                samples=samples,
+                throughput=1 / common.latency_stats(samples)["p50"],
+                unit="runs/s",
+                peak_rss_mb=result["peak_rss_mb"],
+            )
+        )
+
+    return records
+
+
+@app.command()
+def main(repeat: int = DEFAULT_REPEAT):
+    """Run start up benchmark and print results"""
+    common.print_records(run_suite(repeat))
+
+
+if __name__ == "__main__":
+    app()
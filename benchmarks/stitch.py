@@ -0,0 +1,100 @@
+"""
+Benchmark of `stitch_pdf`: time, output size and peak RSS.
+
+Each page count is stitched from one page pdf files and from segments of
+`SEGMENT_SIZE` pages (as pre-stitched by OCR tasks, see
+`ocrworker.segments`; building segments is not measured).
+
+    python -m benchmarks.stitch --pages 10 --pages 100 --pages 1000
+"""
+
+import tempfile
+from pathlib import Path
+
+import typer
+
+from benchmarks import common, synthetic
+from ocrworker import utils
+
+DEFAULT_PAGE_COUNTS = [10, 100, 1000]
+SEGMENT_SIZE = 32
+
+app = typer.Typer(help="stitch_pdf benchmark")
+
+
+def stitch(srcs: list[Path], dst: Path) -> int:
+    utils.stitch_pdf(srcs=srcs, dst=dst)
+
+    return dst.stat().st_size
+
+
+def bench_stitch(page_counts: list[int], work_dir: Path) -> list[dict]:
+    # pages are generated once, for largest document
+    srcs = synthetic.make_page_pdfs(work_dir / "pages", max(page_counts))
+    input_size = [src.stat().st_size for src in srcs]
+    segments = make_segments(srcs, work_dir / "segments")
+    results = []
+    for page_count in page_counts:
+        # whole segments plus one page files of the remaining pages
+        full = page_count // SEGMENT_SIZE
+        rest = full * SEGMENT_SIZE
+        cases = {
+            f"pages={page_count}": srcs[:page_count],
+            f"pages={page_count}/segments": (
+                segments[:full] + srcs[rest:page_count]
+            ),
+        }
+        for case, case_srcs in cases.items():
+            outcome = common.run_isolated(
+                stitch, case_srcs, work_dir / f"stitched-{page_count}.pdf"
+            )
+            results.append(
+                {
+                    "case": case,
+                    "pages": page_count,
+                    "seconds": outcome["seconds"],
+                    "pages_per_sec": page_count / outcome["seconds"],
+                    "input_bytes": sum(input_size[:page_count]),
+                    "output_bytes": outcome["result"],
+                    "peak_rss_mb": outcome["peak_rss_mb"],
+                }
+            )
+
+    return results
+
+
+def make_segments(srcs: list[Path], work_dir: Path) -> list[Path]:
+    segments = []
+    for index, chunk in enumerate(utils.chunks(srcs, SEGMENT_SIZE)):
+        segment = work_dir / f"{index:06d}.pdf"
+        utils.stitch_pdf(srcs=chunk, dst=segment)
+        segments.append(segment)
+
+    return segments
+
+
+def run_suite(page_counts: list[int], work_dir: Path) -> list[dict]:
+    return [
+        common.record(
+            suite="stitch",
+            case=result["case"],
+            samples=[result["seconds"]],
+            throughput=result["pages_per_sec"],
+            unit="pages/s",
+            peak_rss_mb=result["peak_rss_mb"],
+            input_bytes=result["input_bytes"],
+            output_bytes=result["output_bytes"],
+        )
+        for result in bench_stitch(page_counts, work_dir)
+    ]
+
+
+@app.command()
+def main(pages: list[int] = DEFAULT_PAGE_COUNTS):
+    """Run stitch benchmark and print results"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        common.print_records(run_suite(pages, Path(work_dir)))
+
+
+if __name__ == "__main__":
+    app()
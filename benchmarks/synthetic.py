@@ -0,0 +1,156 @@
+"""
+Synthetic "scanned" PDF documents for benchmarks.
+
+Each page consists of a grayscale JPEG image of the page with
+some lines of text and an invisible text layer which uses embedded
+(glyphless) font - same structure as pages OCRed by ocrmypdf, where every
+page carries its own copy of the font.
+"""
+
+import io
+import random
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+from pikepdf import Array, Dictionary, Name, Pdf, Stream
+
+A4_INCHES = (8.27, 11.69)
+WORDS = (
+    "invoice total amount date customer number payment bank account "
+    "rechnung betrag datum kunde zahlung factura suma data client"
+).split()
+
+
+def glyphless_font_file() -> bytes:
+    import ocrmypdf
+
+    candidates = list(Path(ocrmypdf.__file__).parent.rglob("*.ttf"))
+    # smallest font shipped with ocrmypdf is its glyphless font
+    candidates.sort(key=lambda p: p.stat().st_size)
+
+    return candidates[0].read_bytes()
+
+
+def page_image(rnd: random.Random, dpi: int, color: bool = False) -> bytes:
+    width, height = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+    image = Image.new("RGB" if color else "L", (width, height), "white")
+    lines = _text_lines(dpi)
+    line_height = lines[0].size[1]
+    for y in range(dpi, height - dpi, line_height):
+        image.paste(rnd.choice(lines), (dpi, y))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=75, dpi=(dpi, dpi))
+
+    return buffer.getvalue()
+
+
+@lru_cache()
+def _text_lines(dpi: int, count: int = 32) -> list[Image.Image]:
+    """Pre-rendered lines of text (rendering text is slow)"""
+    rnd = random.Random(dpi)
+    width = int((A4_INCHES[0] - 2) * dpi)
+    line_height = max(dpi // 6, 8)
+    lines = []
+    for _ in range(count):
+        line = Image.new("L", (width, line_height), "white")
+        text = " ".join(rnd.choice(WORDS) for _ in range(12))
+        ImageDraw.Draw(line).text((0, 0), text, fill="black")
+        lines.append(line)
+
+    return lines
+
+
+def add_page(
+    pdf: Pdf,
+    rnd: random.Random,
+    font_file: bytes,
+    dpi: int = 150,
+    color: bool = False,
+):
+    jpeg = page_image(rnd, dpi, color=color)
+    with Image.open(io.BytesIO(jpeg)) as im:
+        width, height = im.size
+    page_width, page_height = A4_INCHES[0] * 72, A4_INCHES[1] * 72
+
+    image = Stream(pdf, jpeg)
+    image.Type = Name.XObject
+    image.Subtype = Name.Image
+    image.Width = width
+    image.Height = height
+    image.ColorSpace = Name.DeviceRGB if color else Name.DeviceGray
+    image.BitsPerComponent = 8
+    image.Filter = Name.DCTDecode
+
+    font = Dictionary(
+        Type=Name.Font,
+        Subtype=Name.TrueType,
+        BaseFont=Name.GlyphLessFont,
+        FirstChar=32,
+        LastChar=126,
+        Widths=Array([500] * 95),
+        Encoding=Name.WinAnsiEncoding,
+        FontDescriptor=Dictionary(
+            Type=Name.FontDescriptor,
+            FontName=Name.GlyphLessFont,
+            Flags=4,
+            FontBBox=Array([0, 0, 500, 1000]),
+            ItalicAngle=0,
+            Ascent=1000,
+            Descent=0,
+            CapHeight=1000,
+            StemV=80,
+            FontFile2=Stream(pdf, font_file),
+        ),
+    )
+
+    text = " ".join(rnd.choice(WORDS) for _ in range(300))
+    content = (
+        f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q\n"
+        f"BT 3 Tr /F0 10 Tf 72 {page_height - 72:.2f} Td ({text}) Tj ET\n"
+    ).encode()
+
+    page = pdf.add_blank_page(page_size=(page_width, page_height))
+    page.obj.Resources = Dictionary(
+        XObject=Dictionary(Im0=pdf.make_indirect(image)),
+        Font=Dictionary(F0=pdf.make_indirect(font)),
+    )
+    page.obj.Contents = pdf.make_stream(content)
+
+
+def make_pdf(
+    path: Path,
+    page_count: int,
+    seed: int = 0,
+    dpi: int = 150,
+    color: bool = False,
+):
+    """Writes synthetic scanned pdf document with `page_count` pages"""
+    rnd = random.Random(seed)
+    font_file = glyphless_font_file()
+    pdf = Pdf.new()
+    for _ in range(page_count):
+        add_page(pdf, rnd, font_file, dpi=dpi, color=color)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.save(path)
+    pdf.close()
+
+
+def make_page_pdfs(
+    dst_dir: Path, page_count: int, seed: int = 0, dpi: int = 150
+) -> list[Path]:
+    """Writes `page_count` one page pdf files (like OCRed page.pdf files)"""
+    rnd = random.Random(seed)
+    font_file = glyphless_font_file()
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for number in range(1, page_count + 1):
+        pdf = Pdf.new()
+        add_page(pdf, rnd, font_file, dpi=dpi)
+        path = dst_dir / f"{number:06d}.pdf"
+        pdf.save(path)
+        pdf.close()
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,226 @@
+"""
+Local (per node) cache of files downloaded from/uploaded to S3.
+
+Every cached file (or folder) is recorded in a small SQLite index
+together with its size, S3 ETag and time of last use. Index is used to:
+
+- validate local files without any network call (cache hit)
+- keep disk usage of `docvers/` and `ocr/pages/` within budget by evicting
+  least recently used entries
+
+Eviction is performed only when S3 is enabled (otherwise local files are
+the only copy) and never touches entries used within last
+`papermerge__cache__min_age` seconds.
+"""
+
+import logging
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ocrworker import config
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "cache.sqlite3"
+# evict down to this fraction of the budget, so that eviction does not run
+# after every single download
+LOW_WATERMARK = 0.9
+# minimal interval (in seconds) between two budget checks in one process
+CHECK_INTERVAL = 60
+
+_last_check = 0.0
+
+
+def lookup(rel_path: Path) -> bool:
+    """Returns True if file is present locally and valid
+
+    File is valid if it is recorded in the index and its size matches
+    recorded size. On hit, time of last use is updated.
+    """
+    abs_path = _abs(rel_path)
+    with _index() as conn:
+        row = conn.execute(
+            "SELECT size FROM entries WHERE path = ?", (str(rel_path),)
+        ).fetchone()
+        if row is None:
+            return False
+
+        if not abs_path.exists() or _size(abs_path) != row[0]:
+            logger.debug(f"Stale cache entry {rel_path}")
+            conn.execute("DELETE FROM entries WHERE path = ?", (str(rel_path),))
+            return False
+
+        conn.execute(
+            "UPDATE entries SET last_used = ? WHERE path = ?",
+            (time.time(), str(rel_path)),
+        )
+
+    return True
+
+
+def register(rel_path: Path, etag: str | None = None) -> None:
+    """Records (or updates) entry for the local file or folder
+
+    Entry of a folder replaces entries of the files inside it.
+    """
+    abs_path = _abs(rel_path)
+    if not abs_path.exists():
+        return
+
+    with _index() as conn:
+        if abs_path.is_dir():
+            conn.execute(
+                "DELETE FROM entries WHERE path LIKE ?", (f"{rel_path}/%",)
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (path, size, etag, last_used)"
+            " VALUES (?, ?, ?, ?)",
+            (str(rel_path), _size(abs_path), etag, time.time()),
+        )
+
+
+def forget(rel_path: Path) -> None:
+    """Removes entries of the file or folder (and of files inside it)
+
+    Called when the file/folder was deleted by other means than eviction.
+    """
+    with _index() as conn:
+        conn.execute(
+            "DELETE FROM entries WHERE path = ? OR path LIKE ?",
+            (str(rel_path), f"{rel_path}/%"),
+        )
+
+
+def touch(rel_path: Path) -> None:
+    """Updates time of last use of the entry (if it is in the index)"""
+    with _index() as conn:
+        conn.execute(
+            "UPDATE entries SET last_used = ? WHERE path = ?",
+            (time.time(), str(rel_path)),
+        )
+
+
+def get_etag(rel_path: Path) -> str | None:
+    with _index() as conn:
+        row = conn.execute(
+            "SELECT etag FROM entries WHERE path = ?", (str(rel_path),)
+        ).fetchone()
+
+    return row[0] if row else None
+
+
+def enforce_budget(force: bool = False) -> int:
+    """Evicts least recently used entries if cache is over budget
+
+    Returns number of freed bytes. Unless `force` is True, check is
+    performed at most once per `CHECK_INTERVAL` seconds.
+    """
+    global _last_check
+
+    max_size = settings.papermerge__cache__max_size
+    if max_size is None:
+        return 0
+
+    now = time.time()
+    if not force and now - _last_check < CHECK_INTERVAL:
+        return 0
+    _last_check = now
+
+    with _index() as conn:
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= max_size:
+            return 0
+
+        rows = conn.execute(
+            "SELECT path, size FROM entries WHERE last_used < ?"
+            " ORDER BY last_used ASC",
+            (now - settings.papermerge__cache__min_age,),
+        ).fetchall()
+
+        freed = 0
+        target = total - int(max_size * LOW_WATERMARK)
+        for path, size in rows:
+            if freed >= target:
+                break
+            _remove(_abs(Path(path)))
+            conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            freed += size
+
+    logger.info(f"Cache eviction freed {freed} bytes")
+
+    return freed
+
+
+@contextmanager
+def _index():
+    """Yields connection to the cache index; commits on success"""
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _connect() -> sqlite3.Connection:
+    index_dir = _cache_dir()
+    index_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(index_dir / INDEX_FILE_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " path TEXT PRIMARY KEY,"
+        " size INTEGER NOT NULL,"
+        " etag TEXT,"
+        " last_used REAL NOT NULL"
+        ")"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+    )
+
+    return conn
+
+
+def _cache_dir() -> Path:
+    if settings.papermerge__cache__dir:
+        return Path(settings.papermerge__cache__dir)
+
+    return Path(settings.papermerge__main__media_root) / ".cache"
+
+
+def _abs(rel_path: Path) -> Path:
+    return Path(settings.papermerge__main__media_root) / rel_path
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+    return path.stat().st_size
+
+
+def _remove(path: Path) -> None:
+    logger.debug(f"Evicting {path}")
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink()
+    else:
+        return
+
+    # remove empty parent folders e.g. ocr/pages/ab/cd/
+    parent = path.parent
+    try:
+        while parent != _abs(Path(".")) and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+    except OSError:
+        # folder was populated concurrently by other process
+        pass
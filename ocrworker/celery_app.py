@@ -1,7 +1,17 @@
 import logging
+import time
 from celery import Celery
-from ocrworker import config, utils
-from celery.signals import setup_logging
+from ocrworker import config, cpu_budget, metrics, scheduling, utils
+from celery.signals import (
+    before_task_publish,
+    celeryd_after_setup,
+    setup_logging,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_ready,
+)
 
 
 settings = config.get_settings()
@@ -14,7 +24,20 @@ app = Celery(
     include=["ocrworker.tasks"],
 )
 
-app.conf.update(broker_connection_retry_on_startup=True)
+app.conf.update(
+    broker_connection_retry_on_startup=True,
+    # task priorities (see `ocrworker.scheduling`); with Redis 0 is the
+    # highest priority. Priorities apply within the queue, queues are
+    # consumed in round robin fashion
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "round_robin",
+    },
+    # otherwise worker reserves low priority tasks before high priority
+    # ones are published
+    worker_prefetch_multiplier=1,
+)
 
 app.autodiscover_tasks()
 
@@ -25,6 +48,83 @@ def config_loggers(*args, **kwags):
         utils.setup_logging(settings.papermerge__main__logging_cfg)
 
 
+@worker_process_init.connect
+def init_worker_process(*args, **kwargs):
+    # S3 client (and its connection pool) must not be shared with
+    # the parent process
+    from ocrworker import ocr, s3
+
+    s3.reset_client()
+    cpu_budget.init_process()
+    # so that first task of the process does not pay for it
+    ocr.warm_up(settings.papermerge__ocr__preload_langs)
+
+
+@celeryd_after_setup.connect
+def add_worker_queues(sender=None, instance=None, **kwargs):
+    # large documents are routed to their own queue and stitching to the
+    # node which has most page files (see `ocrworker.scheduling`)
+    queues = instance.app.amqp.queues
+    for queue in scheduling.worker_queues(set(queues.consume_from or ())):
+        queues.select_add(queue)
+        logger.info(f"Consuming queue {queue}")
+
+
+@worker_init.connect
+def init_worker(sender=None, **kwargs):
+    # worker processes split CPU budget (see `ocrworker.cpu_budget`)
+    cpu_budget.set_concurrency(getattr(sender, "concurrency", None))
+    metrics.start_http_server(getattr(sender, "hostname", None))
+
+
+@worker_ready.connect
+def start_node_heartbeat(sender=None, **kwargs):
+    # stitching is routed to node queue only while node is alive (see
+    # `ocrworker.coordination.run_tail`)
+    from ocrworker import coordination
+
+    if coordination.is_enabled() and settings.papermerge__ocr__locality:
+        coordination.start_heartbeat(scheduling.node_name())
+
+
+# task ID -> start time (of tasks running in current process)
+_task_started: dict[str, float] = {}
+
+
+@before_task_publish.connect
+def task_published(headers=None, **kwargs):
+    # custom headers end up as attributes of `task.request`
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+@task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at is not None:
+        delivery_info = task.request.delivery_info or {}
+        metrics.observe(
+            metrics.QUEUE_WAIT_SECONDS,
+            max(0.0, time.time() - enqueued_at),
+            queue=delivery_info.get("routing_key") or "",
+            task=task.name,
+        )
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.observe(
+            metrics.TASK_SECONDS,
+            time.perf_counter() - started,
+            task=task.name,
+            state=state,
+        )
+    metrics.flush()
+
+
 def prefixed(name: str) -> str:
     pref = settings.papermerge__main__prefix
     if pref:
@@ -36,6 +136,7 @@ def prefixed(name: str) -> str:
 app.conf.task_routes = {
     "i3": {"queue": prefixed("i3")},
     "ocr": {"queue": prefixed("ocr")},
+    "ocr_large": {"queue": prefixed("ocr_large")},
     "s3preview": {"queue": prefixed("s3preview")},
 }
 
@@ -0,0 +1,67 @@
+"""
+Resumable OCR of the documents.
+
+IDs of the OCRed document version and of its pages are derived from the
+source document version ID and OCR parameters (instead of being random),
+thus resubmitted document gets same target IDs as the failed attempt and
+pages OCRed by the failed attempt are found in their folders.
+
+Page is done when its page.pdf file is on S3 (or, without S3, in local
+page folder); page.pdf is uploaded after all other OCR results of the
+page (see `ocrworker.s3.upload_pages_dirs`).
+"""
+
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ocrworker import config, plib, s3
+from ocrworker import constants as const
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+# namespace of target document version IDs
+NAMESPACE = uuid.UUID("8f5d3c1e-2b0a-4d8e-9a53-6f1c0e7b4a21")
+
+
+def target_ids(
+    doc_ver_id: uuid.UUID, page_count: int, params: dict
+) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """Returns IDs of the OCRed document version and of its pages
+
+    `params` are parameters with effect on OCR results; same document
+    version OCRed with same parameters always gets same IDs.
+    """
+    name = f"{doc_ver_id}:{json.dumps(params, sort_keys=True, default=str)}"
+    target_docver_id = uuid.uuid5(NAMESPACE, name)
+    target_page_ids = [
+        uuid.uuid5(target_docver_id, str(page_number))
+        for page_number in range(1, page_count + 1)
+    ]
+
+    return target_docver_id, target_page_ids
+
+
+def is_page_done(page_id: uuid.UUID) -> bool:
+    """Returns True if OCR results of the page are complete"""
+    if s3.is_enabled():
+        keyname = Path(s3.get_prefix()) / plib.page_path(page_id)
+        return s3.obj_exists(str(keyname / const.PAGE_PDF))
+
+    # page.pdf is written after the sidecar files
+    return (plib.abs_page_path(page_id) / const.PAGE_PDF).exists()
+
+
+def missing_pages(page_ids: list[uuid.UUID]) -> list[uuid.UUID]:
+    """Returns pages (of the given ones) which are not done yet
+
+    Pages are checked concurrently.
+    """
+    max_workers = settings.papermerge__s3__download_concurrency
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        done = list(executor.map(is_page_done, page_ids))
+
+    return [page_id for page_id, is_done in zip(page_ids, done) if not is_done]
@@ -1,10 +1,11 @@
+import tempfile
 import uuid
 from pathlib import Path
 
 import typer
 
-from ocrworker.ocr import run_one_page_ocr
-from ocrworker.utils import stitch_pdf
+# ocrworker.ocr and ocrworker.utils (ocrmypdf, pikepdf) are imported by
+# commands which need them, so that e.g. `ocr --help` starts fast
 
 app = typer.Typer(help="OCR documents")
 
@@ -19,6 +20,8 @@ def ocrmypdf_cmd(
     preview_width: int = 300,
 ):
     """Raw OCR command - invokes directly ocrmypdf module"""
+    from ocrworker.ocr import run_one_page_ocr
+
     target_page_id = uuid.uuid4()
     print(f"Target page ID={target_page_id}")
 
@@ -37,6 +40,38 @@ def ocrmypdf_cmd(
 def ocr_cmd(): ...
 
 
+@app.command(name="classify")
+def classify_cmd(file_path: Path, mode: str = "auto"):
+    """Report for each page whether its text layer is used instead of OCR"""
+    from ocrworker import text_layer
+    from ocrworker.utils import split_pdf
+
+    used = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pages = split_pdf(file_path, Path(tmp_dir))
+        for number, page in enumerate(pages, start=1):
+            decision = text_layer.decide(page, mode=mode)
+            used += decision.use_text_layer
+            action = "text layer" if decision.use_text_layer else "OCR"
+            print(f"{number:>5}  {action:<10}  {decision.reason}")
+
+    print(f"{used} of {len(pages)} pages use text layer")
+
+
+@app.command(name="detect-lang")
+def detect_lang_cmd(file_path: Path, lang: str):
+    """Report languages (of `lang` e.g. deu+eng) detected on each page"""
+    from ocrworker import lang_detection
+    from ocrworker.utils import split_pdf
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pages = split_pdf(file_path, Path(tmp_dir))
+        for number, page in enumerate(pages, start=1):
+            print(f"{number:>5}  {lang_detection.detect(page, lang)}")
+
+
 @app.command(name="stitch")
 def stitch_cmd(dst: Path, srcs: list[Path]):
+    from ocrworker.utils import stitch_pdf
+
     stitch_pdf(srcs=srcs, dst=dst)
@@ -1,5 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -9,11 +10,88 @@ class Settings(BaseSettings):
     papermerge__main__logging_cfg: Path | None = None
     papermerge__main__media_root: Path = Path(".")
     papermerge__main__prefix: str = ""
+    # name of the node; defaults to host name
+    papermerge__main__node_name: str | None = None
     papermerge__database__url: str = "sqlite:////db/db.sqlite3"
+    # number of pages updated in one go (e.g. when saving OCRed text)
+    papermerge__database__batch_size: int = 500
     aws_access_key_id: str | None = None
     aws_secret_access_key: str | None = None
     aws_region_name: str | None = None
     papermerge__s3__bucket_name: str | None = None
+    # custom S3 endpoint e.g. MinIO; if not set AWS S3 is used
+    papermerge__s3__endpoint_url: str | None = None
+    papermerge__s3__max_pool_connections: int = 10
+    papermerge__s3__tcp_keepalive: bool = True
+    papermerge__s3__max_attempts: int = 5
+    papermerge__s3__retry_mode: str = "standard"
+    # number of files uploaded concurrently (also max number of concurrent
+    # parts in multipart upload of one file, see `s3.get_transfer_config`)
+    papermerge__s3__upload_concurrency: int = 8
+    # number of files downloaded concurrently
+    papermerge__s3__download_concurrency: int = 16
+    # files larger than this (in bytes) are uploaded in multiple parts
+    papermerge__s3__multipart_threshold: int = 8 * 1024 * 1024
+    # disk budget (in bytes) of the local cache i.e. of downloaded/generated
+    # files in `docvers/` and `ocr/pages/`; no eviction if not set
+    papermerge__cache__max_size: int | None = None
+    # entries used within this number of seconds are never evicted
+    papermerge__cache__min_age: int = 3600
+    # location of the cache index; defaults to <media root>/.cache
+    papermerge__cache__dir: Path | None = None
+    # cache of OCR results: "off", "local" or "s3"
+    papermerge__ocr__result_cache: Literal["off", "local", "s3"] = "local"
+    # OCR pages in chunks i.e. one celery task per chunk of pages
+    papermerge__ocr__page_batching: bool = True
+    # number of worker processes; if not set number of CPUs is used
+    papermerge__ocr__worker_concurrency: int | None = None
+    papermerge__ocr__min_pages_per_task: int = 4
+    papermerge__ocr__max_pages_per_task: int = 32
+    # tracking of OCR tasks completion: "redis" (see
+    # `ocrworker.coordination`) or "chord" (celery chord)
+    papermerge__ocr__coordination: Literal["redis", "chord"] = "redis"
+    # max number of OCR (or fan out) tasks published by one task
+    papermerge__ocr__fan_out: int = 64
+    # OCR tasks pre-stitch their chunks of pages (see `ocrworker.segments`)
+    papermerge__ocr__segments: bool = True
+    # segments of document versions not stitched on this node (e.g.
+    # stitched elsewhere) are removed after this many seconds
+    papermerge__ocr__segments_ttl: int = 24 * 3600
+    # stitch pages on the node which OCRed most of them (see
+    # `ocrworker.scheduling.node_queue`)
+    papermerge__ocr__locality: bool = True
+    # route OCR tasks of small and large documents to separate queues and
+    # prioritize smaller documents (see `ocrworker.scheduling`)
+    papermerge__ocr__size_scheduling: bool = True
+    # documents with more pages are "large"
+    papermerge__ocr__small_doc_max_pages: int = 10
+    # number of CPUs shared by all worker processes of the node; if not set
+    # number of CPUs is used
+    papermerge__ocr__cpu_budget: int | None = None
+    # threads (ocrmypdf jobs and tesseract OpenMP threads) of one worker
+    # process; if not set: cpu budget / worker concurrency
+    papermerge__ocr__threads_per_process: int | None = None
+    # OCR of pages with text layer: "force" (always OCR), "skip" (never
+    # OCR pages with text) or "auto" (OCR unless text layer is usable)
+    papermerge__ocr__text_layer: Literal["force", "skip", "auto"] = "force"
+    # downsample images sent to tesseract to `target_dpi` and convert them
+    # to grayscale (see `ocrworker.normalize`)
+    papermerge__ocr__normalize: bool = False
+    papermerge__ocr__target_dpi: int = 300
+    # "auto": OCR each page only with the languages (of the document's
+    # languages) detected on it (see `ocrworker.lang_detection`)
+    papermerge__ocr__lang_detection: Literal["off", "auto"] = "off"
+    # "tesseract" (subprocess per page) or "tesserocr" (tesseract API
+    # handles kept by each worker process, see `ocrworker.tesserocr_engine`)
+    papermerge__ocr__engine: Literal["tesseract", "tesserocr"] = "tesseract"
+    # tesseract languages (e.g. "deu+eng") preloaded by each worker process
+    papermerge__ocr__preload_langs: str | None = None
+    # port of the HTTP metrics endpoint; no endpoint if not set
+    papermerge__metrics__port: int | None = None
+    papermerge__metrics__host: str = "0.0.0.0"
+    # where worker processes dump their metrics (in subfolder per celery
+    # node); defaults to <tmp dir>/ocrworker-metrics
+    papermerge__metrics__dir: Path | None = None
 
 
 @lru_cache()
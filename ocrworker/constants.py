@@ -5,7 +5,12 @@ PAGES = "pages"
 THUMBNAILS = "thumbnails"
 DOCVERS = "docvers"
 OCR = "ocr"
+OCR_LARGE = "ocr_large"
 PAGE_PDF = "page.pdf"
+PAGE_LANG = "page.lang"
+SPLIT = "split"
+CACHE = "cache"
+SEGMENTS = "segments"
 INDEX_ADD_DOCS = "index_add_docs"
 WORKER_OCR_DOCUMENT = "worker_ocr_document"
 S3_WORKER_GENERATE_PREVIEW = "s3_worker_generate_preview"
@@ -0,0 +1,211 @@
+"""
+Completion tracking of OCR workflows without chord.
+
+`group(ocr tasks) | stitch_pages_task | ...` is a chord: results of all OCR
+tasks are stored in the result backend, the chord counter is updated
+on every result, and the signatures of all OCR tasks travel in one message.
+With thousands of pages that message is huge and the result backend
+is busy with results nobody reads.
+
+Instead, for each workflow (identified by random ID, so that a resubmitted
+document never mixes with the previous attempt) Redis holds:
+
+- `total` - number of OCR tasks of the workflow
+- `done` - set of finished OCR tasks (set, not counter, so that a retried
+  or redelivered task is never counted twice)
+- `tail` - serialized signature of the tasks completing the workflow
+  (stitch, DB update, preview, indexing)
+- `nodes` - number of OCRed pages per node (where page results are on
+  local disk)
+
+OCR task which completes the set publishes the tail; stitching is routed
+to the node with most pages (see `ocrworker.scheduling.node_queue`) if
+that node is alive i.e. its worker refreshed its heartbeat key within
+`NODE_TTL` seconds, otherwise to the shared OCR queue. OCR
+tasks are published with `ignore_result=True`, and not all at once: see
+`ocrworker.tasks.publish_ocr_tasks`.
+"""
+
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from celery import signature
+from kombu.utils import json
+
+from ocrworker import config, scheduling
+
+if TYPE_CHECKING:
+    from celery import Signature
+    from redis import Redis
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+REDIS = "redis"
+CHORD = "chord"
+
+# keys of workflows which never complete (e.g. failed OCR task) are
+# removed after this number of seconds
+TTL = 7 * 24 * 3600
+# worker refreshes heartbeat key of its node every `HEARTBEAT_INTERVAL`
+# seconds; node without heartbeat for `NODE_TTL` seconds is gone
+HEARTBEAT_INTERVAL = 30
+NODE_TTL = 90
+
+# KEYS: done, total, tail, nodes; ARGV: finished task, TTL, node, pages
+# Returns tail signature and pages per node if finished task is the
+# last one
+TASK_DONE_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return false
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HINCRBY', KEYS[4], ARGV[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[4], ARGV[2])
+end
+local total = redis.call('GET', KEYS[2])
+if not total or redis.call('SCARD', KEYS[1]) < tonumber(total) then
+    return false
+end
+local tail = redis.call('GET', KEYS[3])
+if not tail then
+    return false
+end
+local nodes = redis.call('HGETALL', KEYS[4])
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4])
+return {tail, nodes}
+"""
+
+
+def is_enabled() -> bool:
+    return settings.papermerge__ocr__coordination == REDIS
+
+
+@lru_cache()
+def get_redis() -> "Redis":
+    # redis-py connection pool re-creates its connections in forked
+    # processes, thus client can be shared by all worker processes
+    from redis import Redis
+
+    return Redis.from_url(settings.papermerge__redis__url)
+
+
+def start(workflow_id, total: int, tail: "Signature") -> None:
+    """Starts tracking of the workflow with `total` OCR tasks
+
+    Must be called before any of the OCR tasks is published.
+    """
+    if total == 0:
+        run_tail(tail)
+        return
+
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.set(key(workflow_id, "total"), total, ex=TTL)
+        pipe.set(key(workflow_id, "tail"), json.dumps(dict(tail)), ex=TTL)
+        pipe.delete(key(workflow_id, "done"), key(workflow_id, "nodes"))
+        pipe.execute()
+
+
+def task_done(
+    workflow_id, task: str, node: str | None = None, pages: int = 1
+) -> bool:
+    """Marks OCR task `task` of the workflow as finished
+
+    `pages` is number of pages OCRed by the task on `node`. Publishes the
+    tail of the workflow if it was the last unfinished task; returns True
+    in that case.
+    """
+    client = get_redis()
+    script = client.register_script(TASK_DONE_SCRIPT)
+    result = script(
+        keys=[
+            key(workflow_id, "done"),
+            key(workflow_id, "total"),
+            key(workflow_id, "tail"),
+            key(workflow_id, "nodes"),
+        ],
+        args=[task, TTL, node or "", pages],
+    )
+    if not result:
+        return False
+
+    tail, flat_nodes = result
+    # HGETALL reply is flat list: node, pages, node, pages...
+    nodes = {
+        name.decode(): int(count)
+        for name, count in zip(flat_nodes[::2], flat_nodes[1::2])
+    }
+    logger.debug(
+        f"Workflow {workflow_id}: all OCR tasks finished, pages per node"
+        f" {nodes}"
+    )
+    run_tail(signature(json.loads(tail)), node=best_node(nodes))
+
+    return True
+
+
+def best_node(nodes: dict[str, int]) -> str | None:
+    """Node with most pages (None if there are no nodes)"""
+    if not nodes:
+        return None
+
+    return max(sorted(nodes), key=lambda name: nodes[name])
+
+
+def run_tail(tail: "Signature", node: str | None = None) -> None:
+    """Publishes the tail; stitching runs on `node` if given and alive"""
+    queue = scheduling.node_queue(node) if node else None
+    if queue and not is_alive(node):
+        # nobody would consume node queue; stitching downloads the pages
+        logger.warning(f"Node {node} is gone, stitching on any node")
+        queue = None
+    if queue:
+        # first task of the tail is stitching
+        tail.tasks[0].set(queue=queue)
+    # first task of the tail gets (ignored) result of OCR tasks as
+    # positional argument, same as with chord
+    tail.apply_async(args=(None,))
+
+
+def is_alive(node: str) -> bool:
+    return bool(get_redis().exists(node_key(node)))
+
+
+def heartbeat(node: str) -> None:
+    get_redis().set(node_key(node), 1, ex=NODE_TTL)
+
+
+def start_heartbeat(node: str) -> None:
+    """Refreshes heartbeat of `node` in background thread"""
+
+    def run():
+        while True:
+            try:
+                heartbeat(node)
+            except Exception:
+                # e.g. Redis restarting; node looks gone meanwhile
+                logger.exception("Failed to refresh node heartbeat")
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=run, name="node-heartbeat", daemon=True).start()
+
+
+def key(workflow_id, name: str) -> str:
+    return _prefixed(f"ocrworker:workflow:{workflow_id}:{name}")
+
+
+def node_key(node: str) -> str:
+    return _prefixed(f"ocrworker:node:{node}")
+
+
+def _prefixed(result: str) -> str:
+    pref = settings.papermerge__main__prefix
+    if pref:
+        return f"{pref}:{result}"
+
+    return result
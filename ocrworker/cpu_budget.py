@@ -0,0 +1,79 @@
+"""
+Split of the node's CPU budget between worker processes.
+
+With celery prefork pool each worker process runs its own tesseract
+(via ocrmypdf); left alone, every tesseract starts one OpenMP thread per
+core and N processes end up running N x N threads. Instead, each worker
+process gets `cpu budget / concurrency` threads: this value is used as
+ocrmypdf `jobs` and as `OMP_THREAD_LIMIT` of tesseract.
+
+Concurrency is reported by the main worker process (`worker_init`
+signal) before worker processes are forked; threads are applied in each
+worker process (`worker_process_init` signal).
+"""
+
+import logging
+import os
+
+from ocrworker import config
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+# number of worker processes of this node (as reported by celery)
+_concurrency: int | None = None
+# threads of the current process
+_threads: int | None = None
+
+
+def set_concurrency(concurrency: int | None) -> None:
+    global _concurrency
+
+    _concurrency = concurrency
+
+
+def get_concurrency() -> int:
+    """Number of worker processes sharing the CPU budget"""
+    return (
+        _concurrency
+        or settings.papermerge__ocr__worker_concurrency
+        or os.cpu_count()
+    )
+
+
+def get_budget() -> int:
+    """Number of CPUs available to all worker processes of the node"""
+    return settings.papermerge__ocr__cpu_budget or os.cpu_count()
+
+
+def threads_per_process(budget: int, concurrency: int) -> int:
+    return max(1, budget // max(1, concurrency))
+
+
+def get_threads() -> int:
+    """Number of threads one OCR may use in the current process"""
+    if _threads is not None:
+        return _threads
+
+    if settings.papermerge__ocr__threads_per_process:
+        return settings.papermerge__ocr__threads_per_process
+
+    return threads_per_process(get_budget(), get_concurrency())
+
+
+def init_process(threads: int | None = None) -> int:
+    """Applies thread limit to the current process
+
+    `OMP_THREAD_LIMIT` is inherited by tesseract subprocesses started
+    from this process. Returns number of threads.
+    """
+    global _threads
+
+    _threads = threads or get_threads()
+    os.environ["OMP_THREAD_LIMIT"] = str(_threads)
+    logger.debug(
+        f"Process {os.getpid()}: {_threads} OCR threads"
+        f" (budget={get_budget()}, concurrency={get_concurrency()})"
+    )
+
+    return _threads
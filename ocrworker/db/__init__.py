@@ -1,25 +1,52 @@
-from .base import Base
-from .api import (
-    get_doc,
-    get_doc_ver,
-    get_docs,
-    get_last_version,
-    get_page,
-    get_pages,
-    increment_doc_ver,
-    update_doc_ver_text,
-)
-from .engine import get_engine
+import importlib
+
+# public names -> submodule which defines them; submodules (and thus
+# SQLAlchemy) are imported on first access, so that `from ocrworker import
+# db` is cheap for code which does not touch the database
+_exports = {
+    "Base": "base",
+    "get_doc": "api",
+    "get_doc_ver": "api",
+    "get_docs": "api",
+    "get_last_version": "api",
+    "get_page": "api",
+    "get_previous_version": "api",
+    "get_pages": "api",
+    "increment_doc_ver": "api",
+    "update_doc_ver_aggregate_text": "api",
+    "update_doc_ver_text": "api",
+    "update_pages_text": "api",
+    "get_engine": "engine",
+}
 
 __all__ = [
     "get_last_version",
     "increment_doc_ver",
     "update_doc_ver_text",
+    "update_pages_text",
+    "update_doc_ver_aggregate_text",
     "get_doc_ver",
     "get_docs",
     "get_doc",
     "get_pages",
     "get_page",
+    "get_previous_version",
     "Base",
     "get_engine",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(f".{_exports[name]}", __name__)
+    value = getattr(module, name)
+    # next access does not go through __getattr__
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -1,7 +1,8 @@
 import io
+from typing import Iterable
 from uuid import UUID
 
-from sqlalchemy import exc, select
+from sqlalchemy import exc, insert, select, update
 from sqlalchemy.orm import Session
 
 from ocrworker import schema
@@ -61,6 +62,30 @@ def get_doc_ver(
     return model_doc_ver
 
 
+def get_previous_version(
+    db_session: Session, doc_ver_id: UUID
+) -> schema.DocumentVersion | None:
+    """
+    Returns version of the same document which precedes
+    version identified by doc_ver_id (None if it is the first one)
+    """
+    doc_ver = db_session.get(DocumentVersion, doc_ver_id)
+    stmt = (
+        select(DocumentVersion)
+        .where(
+            DocumentVersion.document_id == doc_ver.document_id,
+            DocumentVersion.number < doc_ver.number,
+        )
+        .order_by(DocumentVersion.number.desc())
+        .limit(1)
+    )
+    db_doc_ver = db_session.scalars(stmt).one_or_none()
+    if db_doc_ver is None:
+        return None
+
+    return schema.DocumentVersion.model_validate(db_doc_ver)
+
+
 def get_pages(db_session: Session, doc_ver_id: UUID) -> list[schema.Page]:
     """
     Returns first page of the document version
@@ -115,7 +140,20 @@ def increment_doc_ver(
     target_docver_uuid: UUID,
     target_page_uuids: list[UUID],
     lang: str,
+    file_name: str | None = None,
+    page_langs: list[str | None] | None = None,
 ):
+    """Creates new (OCRed) version of the document
+
+    `file_name` is file name of the new version; defaults to file name
+    of the last version. `page_langs` are languages of the pages ordered
+    by page number; pages without one get `lang`. Does nothing if version
+    `target_docver_uuid` already exists (e.g. DB update task was
+    redelivered).
+    """
+    if db_session.get(DocumentVersion, target_docver_uuid) is not None:
+        return
+
     doc_ver = get_last_version(db_session, doc_id=document_id)
     page_count = doc_ver.page_count
     if page_count != len(target_page_uuids):
@@ -130,32 +168,71 @@ def increment_doc_ver(
         document_id=document_id,
         number=doc_ver.number + 1,
         lang=lang,
-        file_name=doc_ver.file_name,
+        file_name=file_name or doc_ver.file_name,
         page_count=doc_ver.page_count,
         short_description="With OCR text layer",
     )
     db_session.add(new_doc_ver)
-
-    for page_number in range(1, new_doc_ver.page_count + 1):
-        page = Page(
+    pages = [
+        dict(
             id=target_page_uuids[page_number - 1],
             document_version_id=target_docver_uuid,
             number=page_number,
-            lang=lang,
+            lang=(page_langs and page_langs[page_number - 1]) or lang,
             page_count=new_doc_ver.page_count,
         )
-        db_session.add(page)
-
-        db_session.commit()
+        for page_number in range(1, new_doc_ver.page_count + 1)
+    ]
+    if pages:
+        # all pages are inserted with one (multi-row) INSERT statement
+        db_session.execute(insert(Page), pages)
+    db_session.commit()
 
 
 def update_doc_ver_text(
     db_session: Session, doc_ver_id: UUID, streams: list[io.StringIO]
 ):
-    pages = get_pages(db_session, doc_ver_id=doc_ver_id)
+    """Updates text of all pages of the document version
 
-    for page, stream in zip(pages, streams):
-        db_page = db_session.get(Page, page.id)
-        db_page.text = stream.read()
+    `streams` are ordered by page number. Aggregate text of the document
+    version is updated as well.
+    """
+    stmt = (
+        select(Page.id)
+        .where(Page.document_version_id == doc_ver_id)
+        .order_by(Page.number.asc())
+    )
+    page_ids = db_session.scalars(stmt).all()
+    texts = {
+        page_id: stream.read() for page_id, stream in zip(page_ids, streams)
+    }
 
+    update_pages_text(db_session, texts)
+    update_doc_ver_aggregate_text(db_session, doc_ver_id, texts.values())
     db_session.commit()
+
+
+def update_pages_text(db_session: Session, texts: dict[UUID, str]):
+    """Bulk update of pages text; changes are not committed
+
+    `texts` maps page ID to page text.
+    """
+    values = [{"id": page_id, "text": text} for page_id, text in texts.items()]
+    if values:
+        # bulk UPDATE by primary key (executemany)
+        db_session.execute(update(Page), values)
+
+
+def update_doc_ver_aggregate_text(
+    db_session: Session, doc_ver_id: UUID, texts: Iterable[str]
+):
+    """Sets text of the document version to the text of all its pages
+
+    `texts` are page texts ordered by page number. Changes are
+    not committed.
+    """
+    db_session.execute(
+        update(DocumentVersion)
+        .where(DocumentVersion.id == doc_ver_id)
+        .values(text="\n".join(texts))
+    )
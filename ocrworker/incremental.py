@@ -0,0 +1,206 @@
+"""
+Incremental OCR of new document versions.
+
+When user appends, removes or reorders pages of an OCRed document, new
+version of the document contains pages of the OCRed version as they were.
+Those pages are not OCRed again: their OCR results (page.pdf, page.txt,
+page.hocr, page.svg and page.jpg) are copied from the pages of the
+previous version.
+
+Pages are matched by fingerprint i.e. by hash of page content (content
+streams, resources, page boxes and rotation) which, unlike file hash, does
+not depend on how the page was written (object numbers, stream
+compression, file ID). Stitching task stores fingerprints of all pages of
+the OCRed version in `fingerprints.json` next to the document version file.
+"""
+
+import hashlib
+import json
+import logging
+import shutil
+import uuid
+from pathlib import Path
+
+from pikepdf import Array, Dictionary, Name, Object, Pdf, PdfError, Stream
+
+from ocrworker import config, plib, s3
+from ocrworker import constants as const
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+MANIFEST = "fingerprints.json"
+
+# keys which are not part of page content
+IGNORED_KEYS = {"/Parent", "/P", "/StructParents", "/Length"}
+# with decoded stream data, encoding of the stream does not matter
+ENCODING_KEYS = {"/Filter", "/DecodeParms"}
+PAGE_KEYS = ("/MediaBox", "/CropBox", "/Rotate", "/UserUnit")
+
+
+def page_fingerprint(page_file: Path) -> str:
+    """Returns fingerprint of the first page of the pdf file"""
+    with Pdf.open(page_file) as pdf:
+        return fingerprint(pdf.pages[0].obj)
+
+
+def fingerprint(page: Dictionary) -> str:
+    digest = hashlib.sha256()
+    seen: dict[tuple[int, int], str] = {}
+    for key in PAGE_KEYS:
+        digest.update(key.encode())
+        digest.update(_hash(page.get(key), seen).encode())
+
+    contents = page.get("/Contents")
+    if isinstance(contents, Stream):
+        contents = [contents]
+    for stream in contents or []:
+        digest.update(_stream_data(stream)[0])
+
+    digest.update(_hash(page.get("/Resources"), seen).encode())
+
+    return digest.hexdigest()
+
+
+def _hash(obj, seen: dict[tuple[int, int], str]) -> str:
+    """Hash of PDF object (recursively)
+
+    `seen` holds hashes of indirect objects: shared objects (e.g. fonts)
+    are hashed only once and reference cycles end.
+    """
+    objgen = obj.objgen if isinstance(obj, Object) else (0, 0)
+    if objgen != (0, 0):
+        if objgen in seen:
+            return seen[objgen]
+        seen[objgen] = "cycle"
+
+    digest = hashlib.sha256()
+    if isinstance(obj, Stream):
+        data, decoded = _stream_data(obj)
+        digest.update(b"stream")
+        digest.update(data)
+        ignored = IGNORED_KEYS | (ENCODING_KEYS if decoded else set())
+        _hash_items(digest, obj.stream_dict.items(), ignored, seen)
+    elif isinstance(obj, Dictionary):
+        digest.update(b"dict")
+        _hash_items(digest, obj.items(), IGNORED_KEYS, seen)
+    elif isinstance(obj, Array):
+        digest.update(b"array")
+        for item in obj:
+            digest.update(_hash(item, seen).encode())
+    elif isinstance(obj, Name):
+        digest.update(f"name:{obj}".encode())
+    elif isinstance(obj, Object):
+        # string, null etc.
+        digest.update(obj.unparse())
+    else:
+        # numbers and booleans are returned as python objects
+        digest.update(f"{type(obj).__name__}:{obj}".encode())
+
+    result = digest.hexdigest()
+    if objgen != (0, 0):
+        seen[objgen] = result
+
+    return result
+
+
+def _hash_items(digest, items, ignored: set[str], seen) -> None:
+    for key, value in sorted(items, key=lambda item: item[0]):
+        if key in ignored:
+            continue
+        digest.update(key.encode())
+        digest.update(_hash(value, seen).encode())
+
+
+def _stream_data(stream: Stream) -> tuple[bytes, bool]:
+    """Returns decoded stream data (if possible) and whether it is decoded
+
+    Images compressed with lossy filters (e.g. DCTDecode) cannot be
+    decoded; their raw data is used.
+    """
+    try:
+        return stream.read_bytes(), True
+    except PdfError:
+        return stream.read_raw_bytes(), False
+
+
+def params_digest(params: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def write_manifest(
+    docver_id: uuid.UUID,
+    page_ids: list[uuid.UUID],
+    docver_file: Path,
+    params: dict,
+) -> Path:
+    """Writes fingerprints of the pages of OCRed document version
+
+    `docver_file` is the (stitched) pdf file of the version. Returns path
+    (relative to media root) of the manifest file.
+    """
+    with Pdf.open(docver_file) as pdf:
+        pages = {
+            fingerprint(page.obj): str(page_id)
+            for page_id, page in zip(page_ids, pdf.pages)
+        }
+    rel_path = plib.docver_path(docver_id, MANIFEST)
+    path = plib.rel2abs(rel_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"params": params_digest(params), "pages": pages})
+    )
+
+    return rel_path
+
+
+def load_manifest(docver_id: uuid.UUID, params: dict) -> dict[str, str]:
+    """Returns fingerprint -> page ID mapping of OCRed document version
+
+    Mapping is empty if the version has no manifest (i.e. it was not
+    OCRed by this worker) or if it was OCRed with different parameters.
+    """
+    rel_path = plib.docver_path(docver_id, MANIFEST)
+    path = plib.rel2abs(rel_path)
+    if not path.exists() and s3.is_enabled():
+        keyname = Path(s3.get_prefix()) / rel_path
+        if s3.obj_exists(str(keyname)):
+            s3.download_file(str(keyname), path)
+
+    if not path.exists():
+        return {}
+
+    manifest = json.loads(path.read_text())
+    if manifest["params"] != params_digest(params):
+        logger.debug(f"{rel_path} was OCRed with different parameters")
+        return {}
+
+    return manifest["pages"]
+
+
+def copy_page(src_page_id: uuid.UUID, dst_page_id: uuid.UUID) -> bool:
+    """Copies OCR results of `src_page_id` to `dst_page_id`
+
+    page.pdf is copied last, it marks page as done (see
+    `ocrworker.checkpoint`). Returns False if OCR results of
+    `src_page_id` are not found.
+    """
+    src_dir = plib.abs_page_path(src_page_id)
+    if not (src_dir / const.PAGE_PDF).exists() and s3.is_enabled():
+        s3.download_dir(plib.page_path(src_page_id), src_dir)
+
+    if not (src_dir / const.PAGE_PDF).exists():
+        return False
+
+    dst_dir = plib.abs_page_path(dst_page_id)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    paths = sorted(
+        (path for path in src_dir.iterdir() if path.is_file()),
+        key=lambda path: path.name == const.PAGE_PDF,
+    )
+    for path in paths:
+        shutil.copy2(path, dst_dir / path.name)
+
+    return True
@@ -0,0 +1,231 @@
+"""
+Detection of the page language(s) among the languages of the document.
+
+Users often pass compound language (e.g. "deu+eng+ron") because they do
+not know the language of the document in advance; tesseract time grows
+with each language. With `papermerge__ocr__lang_detection` set to "auto",
+each page is OCRed only with the languages detected on it:
+
+1. middle band of the page, rendered at low resolution, is the sample
+2. script of the sample is detected with tesseract OSD; languages written
+   in other scripts (e.g. "rus" on Latin page) are dropped
+3. if more than one language is left, sample is OCRed with the first
+   of them and the languages are scored by their stop words found in
+   the text
+
+When in doubt (no OSD data, too little text, unknown languages) candidate
+languages are kept. Chosen languages are written in page.lang file of the
+page; DB update task stores them in `Page.lang`.
+"""
+
+import logging
+import re
+import subprocess
+import tempfile
+import unicodedata
+from pathlib import Path
+
+from ocrworker import config, text_layer
+from ocrworker import constants as const
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+AUTO = "auto"
+
+# OSD scripts of tesseract languages
+LATIN = ("Latin",)
+CYRILLIC = ("Cyrillic",)
+SCRIPTS = {
+    **dict.fromkeys(
+        (
+            "eng deu fra spa ita por nld ron pol ces slk slv hrv hun fin swe"
+            " dan nor tur est lav lit cat glg eus isl gle vie ind msa afr sqi"
+        ).split(),
+        LATIN,
+    ),
+    **dict.fromkeys("rus ukr bel bul srp mkd kaz".split(), CYRILLIC),
+    "ell": ("Greek",),
+    "ara": ("Arabic",),
+    "fas": ("Arabic",),
+    "urd": ("Arabic",),
+    "heb": ("Hebrew",),
+    "chi_sim": ("Han",),
+    "chi_tra": ("Han",),
+    "jpn": ("Japanese", "Han"),
+    "kor": ("Hangul", "Han"),
+    "hin": ("Devanagari",),
+    "mar": ("Devanagari",),
+    "tha": ("Thai",),
+}
+
+# frequent words (lower case, without diacritics) of Latin script languages
+STOP_WORDS = {
+    "eng": set(
+        "the and of to in is that for with on this are be by from as at not "
+        "or have you your will".split()
+    ),
+    "deu": set(
+        "der die und das ist nicht mit den von zu des sich auf fur ein eine "
+        "dem im bei wir sie ihre oder auch".split()
+    ),
+    "fra": set(
+        "le la les et des du un une est pour que qui dans sur pas par au "
+        "avec ce vous nous sont".split()
+    ),
+    "spa": set(
+        "el la los las y de que en un una por con para es del se no al su "
+        "lo como".split()
+    ),
+    "ita": set(
+        "il la di che e per un una del della non con sono gli le nel da al "
+        "si lo".split()
+    ),
+    "por": set(
+        "o a os as de que e do da em um uma para com nao por dos das se no "
+        "na".split()
+    ),
+    "nld": set(
+        "de het een en van is dat niet op te voor met zijn die aan er ook "
+        "bij wij u".split()
+    ),
+    "ron": set(
+        "si in la de cu pe care este nu un o ale al din pentru sunt sau mai "
+        "se ca".split()
+    ),
+    "pol": set(
+        "i w z na nie sie do jest to ze o jak od po dla przez czy tak "
+        "oraz".split()
+    ),
+    "ces": set(
+        "a v se na je ze s z do to k o jak ale pro od po by jsou ktery".split()
+    ),
+}
+
+# OSD script confidence below which script is not trusted
+MIN_SCRIPT_CONFIDENCE = 1.0
+# (weighted) number of stop words needed to tell languages apart
+MIN_SCORE = 3
+# languages scoring at least this fraction of the best one are kept
+# (e.g. page with German text and English table)
+MIN_RATIO = 0.3
+
+
+def is_enabled() -> bool:
+    return settings.papermerge__ocr__lang_detection == AUTO
+
+
+def detect(page_file: Path, lang: str) -> str:
+    """Languages (of `lang` e.g. "deu+eng+ron") used on the page"""
+    candidates = lang.split("+")
+    if len(candidates) == 1:
+        return lang
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sample_file = Path(tmp_dir) / "sample.png"
+        sample(page_file).save(sample_file)
+
+        script = detect_script(sample_file)
+        if script is not None:
+            candidates = [
+                name
+                for name in candidates
+                if script in SCRIPTS.get(name, (script,))
+            ] or candidates
+
+        if len([name for name in candidates if name in STOP_WORDS]) > 1:
+            text = sample_text(sample_file, lang=candidates[0])
+            candidates = choose(text, candidates)
+
+    result = "+".join(candidates)
+    logger.debug(f"{page_file}: script={script}, languages {lang} -> {result}")
+
+    return result
+
+
+def detect_from_text(text: str, lang: str) -> str:
+    """Languages (of `lang`) of already known text of the page"""
+    return "+".join(choose(text, lang.split("+")))
+
+
+def sample(page_file: Path):
+    """Middle half of the page rendered at `text_layer.RENDER_DPI`"""
+    image = text_layer.render(page_file).convert("L")
+    top = image.height // 4
+
+    return image.crop((0, top, image.width, image.height - top))
+
+
+def detect_script(image_file: Path) -> str | None:
+    """Script (e.g. "Latin") detected by tesseract OSD"""
+    output = _tesseract(image_file, "-l", "osd", "--psm", "0")
+    if output is None:
+        return None
+
+    script = re.search(r"^Script: (\S+)", output, re.MULTILINE)
+    confidence = re.search(
+        r"^Script confidence: ([\d.]+)", output, re.MULTILINE
+    )
+    if script is None or confidence is None:
+        return None
+    if float(confidence.group(1)) < MIN_SCRIPT_CONFIDENCE:
+        return None
+
+    return script.group(1)
+
+
+def sample_text(image_file: Path, lang: str) -> str:
+    return _tesseract(image_file, "-l", lang, "--psm", "3") or ""
+
+
+def choose(text: str, candidates: list[str]) -> list[str]:
+    """Candidates whose stop words are (frequently enough) found in text
+
+    Stop word shared by several candidates counts proportionally less for
+    each of them. Candidates without stop word list are always kept.
+    """
+    known = [name for name in candidates if name in STOP_WORDS]
+    if len(known) < 2:
+        return candidates
+
+    scores = dict.fromkeys(known, 0.0)
+    for word in words(text):
+        langs = [name for name in known if word in STOP_WORDS[name]]
+        for name in langs:
+            scores[name] += 1 / len(langs)
+
+    best = max(scores.values())
+    if best < MIN_SCORE:
+        return candidates
+
+    return [
+        name
+        for name in candidates
+        if name not in scores or scores[name] >= best * MIN_RATIO
+    ]
+
+
+def words(text: str) -> list[str]:
+    """Lower case words of the text without diacritics"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    return re.findall(r"[a-z]+", text)
+
+
+def write(page_dir: Path, lang: str) -> None:
+    page_dir.mkdir(parents=True, exist_ok=True)
+    (page_dir / const.PAGE_LANG).write_text(lang)
+
+
+def _tesseract(image_file: Path, *args: str) -> str | None:
+    try:
+        return subprocess.run(
+            ["tesseract", str(image_file), "stdout", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as ex:
+        logger.warning(f"Language detection: tesseract failed: {ex}")
+        return None
@@ -0,0 +1,347 @@
+"""
+Timing histograms and counters of the worker.
+
+Metrics are collected in memory of each worker process. When metrics
+endpoint is enabled (`papermerge__metrics__port`), every worker process
+dumps snapshot of its metrics into the folder of its worker (subfolder of
+`papermerge__metrics__dir` named after celery node name) after each task;
+the main worker process serves sum of all snapshots in Prometheus text
+format at `http://<host>:<port>/metrics`. Snapshots of exited processes
+are folded into one cumulative snapshot, thus the number of files does
+not grow with recycled worker processes.
+
+    with metrics.timer(metrics.STAGE_SECONDS, stage="ocr"):
+        ...
+    metrics.inc(metrics.PAGES, stage="ocr")
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from ocrworker import config
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = "ocrworker_stage_seconds"
+TASK_SECONDS = "ocrworker_task_seconds"
+BYTES_SAVED = "ocrworker_s3_bytes_saved_total"
+QUEUE_WAIT_SECONDS = "ocrworker_queue_wait_seconds"
+PAGES = "ocrworker_pages_total"
+BYTES = "ocrworker_bytes_total"
+TEXT_LAYER = "ocrworker_text_layer_pages_total"
+NORMALIZE_SECONDS_SAVED = "ocrworker_normalize_seconds_saved_total"
+
+# upper bounds (in seconds) of histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# (name, labels) -> value
+_counters: dict[tuple, float] = {}
+# (name, labels) -> [count per bucket..., count of +Inf bucket]
+_buckets: dict[tuple, list[int]] = {}
+# (name, labels) -> sum of observed values
+_sums: dict[tuple, float] = {}
+# counters maintained by other modules e.g. `s3.client_stats`
+_sources: list[tuple[str, str, Counter]] = []
+_lock = threading.Lock()
+# name of the snapshot file of the current process: (pid, name)
+_snapshot_name: tuple[int, str] | None = None
+# celery node name of the worker (set in the main worker process, worker
+# processes inherit it)
+_node_name: str | None = None
+# sum of snapshots of exited worker processes
+RETIRED = "retired"
+_retire_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return settings.papermerge__metrics__port is not None
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Adds `value` (in seconds) to the histogram"""
+    key = _key(name, labels)
+    with _lock:
+        if key not in _buckets:
+            _buckets[key] = [0] * (len(BUCKETS) + 1)
+            _sums[key] = 0.0
+        index = next(
+            (i for i, bound in enumerate(BUCKETS) if value <= bound),
+            len(BUCKETS),
+        )
+        _buckets[key][index] += 1
+        _sums[key] += value
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observes duration of the `with` block (also when it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def register_counter(name: str, label: str, counter: Counter) -> None:
+    """Exports `counter` as metric `name`; its keys become `label` values"""
+    _sources.append((name, label, counter))
+
+
+def snapshot() -> dict:
+    """Metrics of the current process as JSON serializable dict"""
+    with _lock:
+        counters = [
+            [name, dict(labels), value]
+            for (name, labels), value in _counters.items()
+        ]
+        histograms = [
+            [name, dict(labels), buckets, _sums[(name, labels)]]
+            for (name, labels), buckets in _buckets.items()
+        ]
+    for name, label, counter in _sources:
+        counters.extend(
+            [name, {label: key}, value] for key, value in counter.items()
+        )
+
+    return {"counters": counters, "histograms": histograms}
+
+
+def flush() -> None:
+    """Writes snapshot of the current process into metrics folder"""
+    if not is_enabled():
+        return
+
+    metrics_dir = get_metrics_dir()
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    path = metrics_dir / f"{get_snapshot_name()}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot()))
+    tmp.rename(path)
+
+
+def aggregate(snapshots: list[dict]) -> dict:
+    """Sums snapshots of multiple processes"""
+    counters, buckets, sums = {}, {}, {}
+    for item in snapshots:
+        for name, labels, value in item["counters"]:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total in item["histograms"]:
+            key = _key(name, labels)
+            previous = buckets.get(key, [0] * len(counts))
+            buckets[key] = [a + b for a, b in zip(previous, counts)]
+            sums[key] = sums.get(key, 0.0) + total
+
+    return {"counters": counters, "buckets": buckets, "sums": sums}
+
+
+def render(snapshots: list[dict]) -> str:
+    """Renders snapshots in Prometheus text exposition format"""
+    total = aggregate(snapshots)
+    lines = []
+    for name in sorted({name for name, _ in total["counters"]}):
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(total["counters"].items()):
+            if key[0] == name:
+                lines.append(f"{name}{_labels(key[1])} {value}")
+
+    for name in sorted({name for name, _ in total["buckets"]}):
+        lines.append(f"# TYPE {name} histogram")
+        for key, counts in sorted(total["buckets"].items()):
+            if key[0] != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*BUCKETS, "+Inf"], counts):
+                cumulative += count
+                labels = _labels(key[1] + (("le", str(bound)),))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key[1])} {total['sums'][key]}")
+            lines.append(f"{name}_count{_labels(key[1])} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def read_snapshots() -> list[dict]:
+    retire_snapshots()
+    snapshots = [snapshot()]
+    for path in get_metrics_dir().glob("*.json"):
+        if path.stem == get_snapshot_name():
+            # current process is already included
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # file is being replaced
+            continue
+
+    return snapshots
+
+
+def retire_snapshots() -> None:
+    """Folds snapshots of exited processes into the retired snapshot"""
+    metrics_dir = get_metrics_dir()
+    with _retire_lock:
+        dead = [
+            path
+            for path in metrics_dir.glob("*.json")
+            if path.stem != RETIRED and not _is_alive(path.stem)
+        ]
+        if not dead:
+            return
+
+        retired_path = metrics_dir / f"{RETIRED}.json"
+        snapshots = []
+        for path in [retired_path, *dead]:
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        tmp = retired_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(_to_snapshot(aggregate(snapshots))))
+        tmp.rename(retired_path)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+
+def _is_alive(snapshot_name: str) -> bool:
+    try:
+        pid = int(snapshot_name.split("-", 1)[0])
+    except ValueError:
+        # not a snapshot of worker process
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # process of other user
+        return True
+
+    return True
+
+
+def _to_snapshot(total: dict) -> dict:
+    """Inverse of `aggregate` (for a single snapshot)"""
+    return {
+        "counters": [
+            [name, dict(labels), value]
+            for (name, labels), value in total["counters"].items()
+        ],
+        "histograms": [
+            [name, dict(labels), counts, total["sums"][(name, labels)]]
+            for (name, labels), counts in total["buckets"].items()
+        ],
+    }
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render(read_snapshots()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_http_server(
+    node_name: str | None = None,
+) -> ThreadingHTTPServer | None:
+    """Starts metrics endpoint in a background thread
+
+    `node_name` is celery node name of the worker (e.g. "celery@host"); it
+    is unique per worker on the host, thus workers sharing the host do not
+    see each other's snapshots. Snapshots left by previous run of the same
+    worker are removed.
+    """
+    global _node_name
+
+    if not is_enabled():
+        return None
+
+    _node_name = node_name
+    shutil.rmtree(get_metrics_dir(), ignore_errors=True)
+    get_metrics_dir().mkdir(parents=True)
+    server = ThreadingHTTPServer(
+        (
+            settings.papermerge__metrics__host,
+            settings.papermerge__metrics__port,
+        ),
+        MetricsHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"Metrics endpoint listening on {server.server_address}")
+
+    return server
+
+
+def get_snapshot_name() -> str:
+    """Name of the snapshot file of the current process
+
+    Name includes process start time, so that snapshot of a recycled
+    worker process is never overwritten by a new process with same PID
+    (counters would go backwards otherwise).
+    """
+    global _snapshot_name
+
+    pid = os.getpid()
+    if _snapshot_name is None or _snapshot_name[0] != pid:
+        _snapshot_name = (pid, f"{pid}-{time.time_ns()}")
+
+    return _snapshot_name[1]
+
+
+def get_metrics_dir() -> Path:
+    if settings.papermerge__metrics__dir:
+        base_dir = Path(settings.papermerge__metrics__dir)
+    else:
+        base_dir = Path(tempfile.gettempdir()) / "ocrworker-metrics"
+    if _node_name is None:
+        return base_dir
+
+    return base_dir / re.sub(r"[^A-Za-z0-9_.@-]", "_", _node_name)
+
+
+def reset() -> None:
+    """Drops all metrics of the current process"""
+    with _lock:
+        _counters.clear()
+        _buckets.clear()
+        _sums.clear()
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _labels(pairs: tuple) -> str:
+    if not pairs:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return f"{{{inner}}}"
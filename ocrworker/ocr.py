@@ -1,10 +1,24 @@
+import importlib
+import logging
+import re
+import subprocess
 import tempfile
+import time
 from pathlib import Path
 from uuid import UUID
 
-import ocrmypdf
 from pikepdf import Pdf
 
+from ocrworker import config, cpu_budget, normalize
+
+PLUGIN = "ocrmypdf_papermerge.plugin"
+# in-process tesseract engine, see `ocrworker.tesserocr_engine`
+TESSEROCR_PLUGIN = "ocrworker.tesserocr_engine"
+TESSEROCR = "tesserocr"
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
 
 def run_one_page_ocr(
     file_path: Path,
@@ -14,6 +28,7 @@ def run_one_page_ocr(
     lang: str,
     page_number: int = 1,
     preview_width: int = 300,
+    engine: str | None = None,
 ):
     """
     Run OCR on PDF file for one page only.
@@ -21,47 +36,130 @@ def run_one_page_ocr(
     OCR page is specified with `page_number` argument.
     `page_number` starts with 1 i.e. first page
     in the document has number 1.
+
+    `engine` is "tesseract" or "tesserocr"; defaults to
+    `papermerge__ocr__engine`.
+
+    For multi page documents prefer passing one page pdf file
+    (see `ocrworker.split.split_docver`), otherwise entire document
+    is parsed on every call.
     """
-    pdf = Pdf.open(file_path)
+    # imported here, as ocrmypdf is slow to import (see `warm_up`)
+    import ocrmypdf
 
     if page_number <= 0:
         raise ValueError("Page number must be at least '1'")
 
-    if page_number > len(pdf.pages):
-        raise ValueError(
-            f"File {file_path} has {len(pdf.pages)}. "
-            f"Request page number '{page_number}' out of range"
-        )
-
     with Pdf.open(file_path) as pdf, tempfile.NamedTemporaryFile() as temp:
+        if page_number > len(pdf.pages):
+            raise ValueError(
+                f"File {file_path} has {len(pdf.pages)}. "
+                f"Request page number '{page_number}' out of range"
+            )
+
         if len(pdf.pages) > 1:
             dst = Pdf.new()
             # extract page number `page_number` into temporary file
             # (one page pdf) and continue working with it
-            for n, page in enumerate(pdf.pages):
-                if n + 1 == page_number:
-                    dst.pages.append(page)
-                    break
+            dst.pages.append(pdf.pages[page_number - 1])
             dst.save(temp.name)
             dst.close()
             # ocrmypdf will ocr only one page
             file_path = temp.name
 
+        plugins = [PLUGIN]
+        if (engine or settings.papermerge__ocr__engine) == TESSEROCR:
+            plugins.append(TESSEROCR_PLUGIN)
+        if normalize.is_enabled():
+            plugins.append(normalize.PLUGIN)
+
         ocrmypdf.ocr(
             file_path,
             output_dir,
-            lang=lang,
-            plugins=["ocrmypdf_papermerge.plugin"],
+            plugins=plugins,
             progress_bar=False,
-            output_type="pdf",
-            pdf_renderer="hocr",
             use_threads=True,
-            force_ocr=True,
+            jobs=cpu_budget.get_threads(),
             keep_temporary_files=False,
             sidecar_dir=sidecar_dir,
             uuid=str(uuid),
             pages="1",  # OCR only one page
-            sidecar_format="svg",
-            preview_width=preview_width,
-            deskew=True,
+            **ocr_params(lang=lang, preview_width=preview_width),
         )
+
+
+def ocr_params(lang: str, preview_width: int) -> dict:
+    """
+    Returns `ocrmypdf.ocr` parameters which have effect on OCR results
+    (i.e. on page.pdf, page.hocr, page.txt, page.svg and page.jpg).
+    """
+    return dict(
+        lang=lang,
+        output_type="pdf",
+        pdf_renderer="hocr",
+        force_ocr=True,
+        sidecar_format="svg",
+        preview_width=preview_width,
+        deskew=True,
+    )
+
+
+def warm_up(langs: str | None = None) -> float:
+    """Pays one time costs of OCR in advance
+
+    Imports ocrmypdf and papermerge plugin and reads tesseract language
+    data of `langs` (e.g. "deu+eng") so that it is in OS page cache. With
+    tesserocr engine, tesseract API handle of `langs` is created.
+    Returns duration in seconds.
+    """
+    start = time.perf_counter()
+    modules = ["ocrmypdf", PLUGIN]
+    if settings.papermerge__ocr__engine == TESSEROCR:
+        modules.append(TESSEROCR_PLUGIN)
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as ex:
+            # OCR itself will fail with proper error
+            logger.warning(f"OCR warm up: {ex}")
+    if langs and settings.papermerge__ocr__engine == TESSEROCR:
+        try:
+            importlib.import_module(TESSEROCR_PLUGIN).preload(langs)
+        except (ImportError, RuntimeError) as ex:
+            logger.warning(f"OCR warm up: {ex}")
+    elif langs:
+        for path in traineddata_files(langs.split("+")):
+            with open(path, "rb") as file:
+                while file.read(1024 * 1024):
+                    pass
+    duration = time.perf_counter() - start
+    logger.debug(f"OCR warm up took {duration:.2f}s")
+
+    return duration
+
+
+def traineddata_files(langs: list[str]) -> list[Path]:
+    """Paths of tesseract language data files of given languages"""
+    try:
+        output = subprocess.run(
+            ["tesseract", "--list-langs"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as ex:
+        logger.warning(f"Cannot list tesseract languages: {ex}")
+        return []
+
+    # first line is e.g.:
+    # List of available languages in "/usr/share/tessdata/" (3):
+    match = re.search(r'"(.+)"', output)
+    if match is None:
+        return []
+
+    tessdata = Path(match.group(1))
+    return [
+        tessdata / f"{lang}.traineddata"
+        for lang in langs
+        if (tessdata / f"{lang}.traineddata").exists()
+    ]
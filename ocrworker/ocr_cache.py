@@ -0,0 +1,179 @@
+"""
+Content addressed cache of OCR results.
+
+OCR results of one page (page.pdf, page.hocr, page.txt, page.svg and
+page.jpg) are stored under a key computed from the content of the one page
+pdf file plus OCR parameters. When same page is OCRed again (e.g. document
+was uploaded one more time, or it shares cover page with other document)
+results are linked/copied from the cache instead of running OCR.
+
+Cached results are kept locally under `ocr/cache/` (subject to the same
+LRU eviction as other local files, see `ocrworker.cache`) and, with
+"s3" backend, also on S3 so that they are shared by all nodes. Each
+entry has a marker file listing its files; on S3 the marker is uploaded
+after all other files, thus entries being uploaded (or whose upload
+failed) are not restored.
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from ocrworker import cache, config, metrics, plib, s3, utils
+from ocrworker import constants as const
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+OFF = "off"
+LOCAL = "local"
+S3 = "s3"
+
+# lists files of the cache entry (see `store`)
+MARKER = "complete.json"
+
+# number of cache hits/misses in this process
+stats = Counter(hits=0, misses=0)
+metrics.register_counter("ocrworker_ocr_cache_total", "result", stats)
+
+
+def is_enabled() -> bool:
+    return settings.papermerge__ocr__result_cache != OFF
+
+
+def cache_key(page_file: Path, params: dict) -> str:
+    """Returns cache key of the OCR results
+
+    `params` are `ocrmypdf.ocr` parameters with effect on OCR results
+    (see `ocrworker.ocr.ocr_params`).
+    """
+    digest = hashlib.sha256()
+    digest.update(utils.file_digest(page_file).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(ocrmypdf_version().encode())
+
+    return digest.hexdigest()
+
+
+@lru_cache()
+def ocrmypdf_version() -> str:
+    # version is read from package metadata, so that ocrmypdf does not
+    # have to be imported
+    return importlib.metadata.version("ocrmypdf")
+
+
+def restore(key: str, target_page_id: uuid.UUID) -> bool:
+    """Places cached OCR results into target page folder
+
+    Returns True on cache hit, False otherwise.
+    """
+    if not is_enabled():
+        return False
+
+    cached_dir = plib.abs_ocr_cache_path(key)
+    if not cached_dir.exists() and settings.papermerge__ocr__result_cache == S3:
+        _download(key)
+
+    if not cached_dir.exists():
+        stats["misses"] += 1
+        logger.debug(f"OCR cache miss key={key} stats={dict(stats)}")
+        return False
+
+    target_dir = plib.abs_page_path(target_page_id)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    # page.pdf last, it marks page as done (see `ocrworker.checkpoint`)
+    paths = sorted(
+        (path for path in cached_dir.iterdir() if path.name != MARKER),
+        key=lambda path: path.name == const.PAGE_PDF,
+    )
+    for path in paths:
+        _link(path, target_dir / path.name)
+
+    cache.touch(plib.ocr_cache_path(key))
+    stats["hits"] += 1
+    logger.info(
+        f"OCR cache hit key={key} page_id={target_page_id} stats={dict(stats)}"
+    )
+
+    return True
+
+
+def store(key: str, page_id: uuid.UUID) -> None:
+    """Adds OCR results of the page to the cache"""
+    if not is_enabled():
+        return
+
+    page_dir = plib.abs_page_path(page_id)
+    cached_dir = plib.abs_ocr_cache_path(key)
+    if cached_dir.exists():
+        return
+
+    files = [path for path in page_dir.iterdir() if path.is_file()]
+    cached_dir.parent.mkdir(parents=True, exist_ok=True)
+    # link into temporary folder first and then rename it; this way
+    # `cached_dir` is either complete or absent
+    tmp_dir = Path(tempfile.mkdtemp(dir=cached_dir.parent))
+    try:
+        for path in files:
+            _link(path, tmp_dir / path.name)
+        (tmp_dir / MARKER).write_text(
+            json.dumps(sorted(path.name for path in files))
+        )
+        tmp_dir.rename(cached_dir)
+    except OSError:
+        # same page was stored concurrently by other process
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+
+    if settings.papermerge__ocr__result_cache == S3:
+        s3.upload_files(
+            [plib.ocr_cache_path(key) / path.name for path in files]
+        )
+        # marker last: entry is complete on S3 once marker is there
+        s3.upload_files([plib.ocr_cache_path(key) / MARKER])
+    cache.register(plib.ocr_cache_path(key))
+
+
+def _download(key: str) -> None:
+    cached_dir = plib.abs_ocr_cache_path(key)
+    cached_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=cached_dir.parent))
+    try:
+        s3.download_dir(plib.ocr_cache_path(key), tmp_dir)
+        if _is_complete(tmp_dir):
+            tmp_dir.rename(cached_dir)
+            cache.register(plib.ocr_cache_path(key))
+    except OSError:
+        # same results were downloaded concurrently by other process
+        pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _is_complete(entry_dir: Path) -> bool:
+    """True if all files listed in the marker are present"""
+    marker = entry_dir / MARKER
+    if not marker.exists():
+        # entry is being uploaded, or its upload failed
+        return False
+
+    names = json.loads(marker.read_text())
+
+    return all((entry_dir / name).exists() for name in names)
+
+
+def _link(src: Path, dst: Path) -> None:
+    """Hard links `src` to `dst`; falls back to copy"""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
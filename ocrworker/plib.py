@@ -18,11 +18,18 @@ __all__ = [
     "page_hocr_path",
     "abs_thumbnail_path",
     "abs_docver_path",
+    "docver_split_path",
+    "abs_docver_split_path",
     "abs_page_txt_path",
     "abs_page_path",
     "abs_page_svg_path",
     "abs_page_jpg_path",
     "abs_page_hocr_path",
+    "ocr_cache_path",
+    "abs_ocr_cache_path",
+    "segments_path",
+    "segment_path",
+    "abs_segments_path",
     "rel2abs",
 ]
 
@@ -75,6 +82,20 @@ def abs_docver_path(uuid: UUID | str, file_name: str):
     )
 
 
+def docver_split_path(uuid: UUID | str, digest: str) -> Path:
+    """
+    Relative path to the folder with single page PDFs of the document
+    version. `digest` is the content hash of the document version file.
+    """
+    return docver_base_path(uuid) / const.SPLIT / digest
+
+
+def abs_docver_split_path(uuid: UUID | str, digest: str) -> Path:
+    return Path(
+        settings.papermerge__main__media_root, docver_split_path(uuid, digest)
+    )
+
+
 def page_path(
     uuid: UUID | str,
 ) -> Path:
@@ -127,6 +148,38 @@ def abs_page_hocr_path(uuid: UUID | str) -> Path:
     return Path(settings.papermerge__main__media_root) / page_hocr_path(uuid)
 
 
+def ocr_cache_path(key: str) -> Path:
+    """
+    Relative path to the folder with cached OCR results.
+    `key` is the hex digest computed by `ocrworker.ocr_cache.cache_key`.
+    """
+    return Path(const.OCR, const.CACHE, key[0:2], key[2:4], key)
+
+
+def abs_ocr_cache_path(key: str) -> Path:
+    return Path(settings.papermerge__main__media_root) / ocr_cache_path(key)
+
+
+def segments_path(uuid: UUID | str) -> Path:
+    """
+    Relative path to the folder with pre-stitched segments (runs of
+    consecutive pages) of the OCRed document version.
+    """
+    uuid_str = str(uuid)
+
+    return Path(
+        const.OCR, const.SEGMENTS, uuid_str[0:2], uuid_str[2:4], uuid_str
+    )
+
+
+def segment_path(uuid: UUID | str, first: int, last: int) -> Path:
+    return segments_path(uuid) / f"{first:06d}-{last:06d}.pdf"
+
+
+def abs_segments_path(uuid: UUID | str) -> Path:
+    return Path(settings.papermerge__main__media_root) / segments_path(uuid)
+
+
 def page_file_type_path():
     """Yields four pages type path functions as tuples"""
     yield page_txt_path, abs_page_txt_path
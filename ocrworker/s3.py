@@ -1,18 +1,25 @@
+import os
 import uuid
 import logging
-import boto3
-from botocore.client import Config
-import asyncio
-from httpx import AsyncClient
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from pathlib import Path
-from botocore.client import BaseClient
-from botocore.exceptions import ClientError
 
-from ocrworker import config, plib
+from ocrworker import cache, config, metrics, plib
 from ocrworker import exceptions
 from ocrworker import constants as const
 
+# boto3/botocore, httpx and asyncio are imported only when S3 is actually
+# used (they are slow to import)
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+    from botocore.client import BaseClient
+    from httpx import AsyncClient
+
 settings = config.get_settings()
 logger = logging.getLogger(__name__)
 
@@ -28,14 +35,88 @@ def skip_if_s3_disabled(func):
     return inner
 
 
-def get_client() -> BaseClient:
+# async download of pages (see `supervisor`)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 60  # seconds
+PRESIGNED_URL_EXPIRES_IN = 300  # seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 8  # seconds
+
+# one S3 client per worker process; boto3 clients are thread safe and
+# keep a pool of (keep-alive) connections
+_client: "BaseClient | None" = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+# how many times S3 client was created/reused in this process
+client_stats = Counter(created=0, reused=0)
+metrics.register_counter("ocrworker_s3_clients_total", "event", client_stats)
+
+
+def get_client() -> "BaseClient":
+    """Returns S3 client of the current process
+
+    Client is created on first call and reused afterwards.
+    Client is never shared between processes: if current process was
+    forked after client creation (e.g. celery prefork pool), a new client
+    is created.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    with _client_lock:
+        if _client is not None and _client_pid == pid:
+            client_stats["reused"] += 1
+            return _client
+
+        _client = create_client()
+        _client_pid = pid
+        client_stats["created"] += 1
+
+    return _client
+
+
+def reset_client() -> None:
+    """Drops cached S3 client; next `get_client` call will create new one
+
+    Called in freshly forked worker processes (see `worker_process_init`).
+    """
+    global _client, _client_pid, _client_lock
+
+    # the lock might have been held by other thread of the parent process
+    # at the moment of fork
+    _client_lock = threading.Lock()
+    _client = None
+    _client_pid = None
+    client_stats.clear()
+    client_stats.update(created=0, reused=0)
+
+
+def create_client() -> "BaseClient":
+    import boto3
+    from botocore.client import Config
+
     session = boto3.Session(
         aws_access_key_id=settings.aws_access_key_id,
         aws_secret_access_key=settings.aws_secret_access_key,
         region_name=settings.aws_region_name,
     )
     # https://stackoverflow.com/questions/26533245/the-authorization-mechanism-you-have-provided-is-not-supported-please-use-aws4  # noqa
-    client = session.client("s3", config=Config(signature_version="s3v4"))
+    client_config = Config(
+        signature_version="s3v4",
+        max_pool_connections=settings.papermerge__s3__max_pool_connections,
+        tcp_keepalive=settings.papermerge__s3__tcp_keepalive,
+        retries={
+            "max_attempts": settings.papermerge__s3__max_attempts,
+            "mode": settings.papermerge__s3__retry_mode,
+        },
+    )
+    client = session.client(
+        "s3",
+        config=client_config,
+        endpoint_url=settings.papermerge__s3__endpoint_url,
+    )
+    logger.debug(f"New S3 client created in process {os.getpid()}")
 
     return client
 
@@ -51,30 +132,70 @@ def is_enabled():
 
 
 def obj_exists(keyname: str) -> bool:
+    return head_object(keyname) is not None
+
+
+def head_object(keyname: str) -> dict | None:
+    """Returns S3 object metadata or None if object does not exist"""
+    from botocore.exceptions import ClientError
+
     client = get_client()
     try:
         logger.debug(f"Checking of -{keyname}- objects exists")
-        client.head_object(Bucket=get_bucket_name(), Key=keyname)
+        return client.head_object(Bucket=get_bucket_name(), Key=keyname)
     except ClientError as ex:
         logger.debug(f"ClientError: {ex}")
-        return False
-
-    return True
+        return None
 
 
 @skip_if_s3_disabled
 def download_docver(docver_id: uuid.UUID, file_name: str):
-    """Downloads document version from S3"""
+    """Downloads document version from S3
+
+    Download is skipped if valid copy of the document version is
+    found in local cache (no network call is performed in this case).
+    """
+    rel_path = plib.docver_path(docver_id, file_name)
+    if cache.lookup(rel_path):
+        logger.debug(f"{rel_path} found in local cache")
+        return
+
     doc_ver_path = plib.abs_docver_path(docver_id, file_name)
-    keyname = Path(get_prefix()) / plib.docver_path(docver_id, file_name)
-    if not doc_ver_path.exists():
-        if not obj_exists(str(keyname)):
-            # no local version + no s3 version
-            raise exceptions.S3DocumentNotFound(f"S3 key {keyname} not found")
+    keyname = Path(get_prefix()) / rel_path
+    head = head_object(str(keyname))
+    if head is None:
+        if doc_ver_path.exists():
+            # local version only
+            return
+        # no local version + no s3 version
+        raise exceptions.S3DocumentNotFound(f"S3 key {keyname} not found")
 
-    client = get_client()
-    doc_ver_path.parent.mkdir(parents=True, exist_ok=True)
-    client.download_file(get_bucket_name(), str(keyname), str(doc_ver_path))
+    if (
+        doc_ver_path.exists()
+        and doc_ver_path.stat().st_size == head["ContentLength"]
+    ):
+        logger.debug(f"{rel_path} found locally")
+    else:
+        download_file(str(keyname), doc_ver_path)
+
+    cache.register(rel_path, etag=head["ETag"])
+    cache.enforce_budget()
+
+
+def download_file(keyname: str, target: Path):
+    """Downloads S3 object into target file
+
+    Object is downloaded into temporary file first, which is then renamed
+    to the target; this way target file is never partially written.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+    try:
+        get_client().download_file(get_bucket_name(), keyname, str(tmp))
+        metrics.inc(metrics.BYTES, tmp.stat().st_size, direction="download")
+        tmp.rename(target)
+    finally:
+        tmp.unlink(missing_ok=True)
 
 
 @skip_if_s3_disabled
@@ -87,15 +208,66 @@ def upload_page_dir(page_id: uuid.UUID) -> None:
     - *.svg
     - *.pdf
     """
-    page_dir = plib.abs_page_path(page_id).glob("*")
-    for path in page_dir:
-        if path.is_file():
-            rel_file_path = plib.page_path(page_id) / path.name
-            upload_file(rel_file_path)
+    upload_pages_dirs([page_id])
+
+
+@skip_if_s3_disabled
+def upload_pages_dirs(page_ids: list[uuid.UUID]) -> None:
+    """Uploads to S3 content of the folders of all given pages
+
+    Files are uploaded concurrently (see `upload_files`). page.pdf files
+    are uploaded after all other files: page.pdf on S3 marks the page as
+    done (see `ocrworker.checkpoint`).
+    """
+    rel_file_paths = []
+    rel_pdf_paths = []
+    for page_id in page_ids:
+        for path in plib.abs_page_path(page_id).glob("*"):
+            if not path.is_file():
+                continue
+            rel_path = plib.page_path(page_id) / path.name
+            if path.name == const.PAGE_PDF:
+                rel_pdf_paths.append(rel_path)
+            else:
+                rel_file_paths.append(rel_path)
+
+    upload_files(rel_file_paths)
+    upload_files(rel_pdf_paths)
+    cache.enforce_budget()
+
+
+@skip_if_s3_disabled
+def upload_files(rel_file_paths: list[Path]) -> None:
+    """Uploads to S3 files specified by relative paths
+
+    Up to `papermerge__s3__upload_concurrency` files are uploaded at
+    the same time. Raises first error encountered (after all
+    uploads finished).
+    """
+    if len(rel_file_paths) == 0:
+        return
+
+    max_workers = min(
+        settings.papermerge__s3__upload_concurrency,
+        settings.papermerge__s3__max_pool_connections,
+        len(rel_file_paths),
+    )
+    # all uploads share connection pool of the client
+    transfer_config = get_transfer_config(parallel_files=max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(upload_file, rel_file_path, transfer_config)
+            for rel_file_path in rel_file_paths
+        ]
+
+    for future in futures:
+        future.result()
 
 
 @skip_if_s3_disabled
-def upload_file(rel_file_path: Path):
+def upload_file(
+    rel_file_path: Path, transfer_config: "TransferConfig | None" = None
+):
     """Uploads to S3 file specified by relative path
 
     Path is relative to `media root`.
@@ -121,10 +293,56 @@ def upload_file(rel_file_path: Path):
     logger.debug(f"target={target} keyname={keyname}")
 
     s3_client.upload_file(
-        str(target), Bucket=get_bucket_name(), Key=str(keyname)
+        str(target),
+        Bucket=get_bucket_name(),
+        Key=str(keyname),
+        Config=transfer_config or get_transfer_config(),
+    )
+    metrics.inc(metrics.BYTES, target.stat().st_size, direction="upload")
+    # file has a copy on S3 now, thus it can be evicted from local disk
+    cache.register(rel_file_path)
+
+
+@lru_cache()
+def get_transfer_config(parallel_files: int = 1) -> "TransferConfig":
+    """Transfer (multipart) configuration of `parallel_files` uploads
+
+    Parts of all files uploaded at the same time together never need
+    more connections than the pool of the client has.
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    max_concurrency = min(
+        settings.papermerge__s3__upload_concurrency,
+        settings.papermerge__s3__max_pool_connections // parallel_files,
+    )
+
+    return TransferConfig(
+        multipart_threshold=settings.papermerge__s3__multipart_threshold,
+        max_concurrency=max(1, max_concurrency),
     )
 
 
+@skip_if_s3_disabled
+def download_dir(rel_dir_path: Path, target_dir: Path) -> int:
+    """Downloads all S3 objects found under given relative path
+
+    Objects are saved in `target_dir` (flat, by object base name).
+    Returns number of downloaded files.
+    """
+    prefix = f"{get_prefix() / rel_dir_path}/"
+    paginator = get_client().get_paginator("list_objects_v2")
+    keynames = [
+        obj["Key"]
+        for page in paginator.paginate(Bucket=get_bucket_name(), Prefix=prefix)
+        for obj in page.get("Contents", [])
+    ]
+    for keyname in keynames:
+        download_file(keyname, target_dir / Path(keyname).name)
+
+    return len(keynames)
+
+
 @skip_if_s3_disabled
 def download_page_txt(page_id: uuid.UUID):
     """Download document page txt from S3"""
@@ -132,13 +350,16 @@ def download_page_txt(page_id: uuid.UUID):
     if abs_path.exists():
         return
 
+    from botocore.exceptions import ClientError
+
     keyname = get_prefix() / plib.page_txt_path(page_id)
-    if not obj_exists(str(keyname)):
+    try:
+        download_file(str(keyname), abs_path)
+    except ClientError as ex:
+        logger.debug(f"ClientError: {ex}")
         raise ValueError(f"{keyname} not found on S3")
 
-    s3_client = get_client()
-    abs_path.parent.mkdir(parents=True, exist_ok=True)
-    s3_client.download_file(get_bucket_name(), str(keyname), str(abs_path))
+    cache.register(plib.page_txt_path(page_id))
 
 
 @skip_if_s3_disabled
@@ -148,49 +369,142 @@ def download_pdf_pages(target_page_ids: list[str]):
     Will download only pages which are not found locally
     """
     to_download = []
+    saved = 0
     for page_id in target_page_ids:
         p = plib.abs_page_path(page_id) / const.PAGE_PDF
         if p.exists():
             logger.debug(f"{p} found locally")
+            cache.touch(plib.page_path(page_id) / const.PAGE_PDF)
+            saved += p.stat().st_size
         else:
             to_download.append(page_id)
 
+    metrics.inc(metrics.BYTES_SAVED, saved)
+    logger.debug(
+        f"{len(target_page_ids) - len(to_download)} of"
+        f" {len(target_page_ids)} pages found locally ({saved} bytes)"
+    )
+
     logger.debug(f"Queued for download from S3 {to_download}")
     download_many_pdf_pages(to_download)
+    for page_id in to_download:
+        cache.register(plib.page_path(page_id) / const.PAGE_PDF)
+    cache.enforce_budget()
 
 
 def download_many_pdf_pages(page_ids: list[str]) -> int:
+    import asyncio
+
     return asyncio.run(supervisor(page_ids))
 
 
 async def supervisor(page_ids: list[str]) -> int:
-    async with AsyncClient() as client:
-        to_download = [
-            download_one_pdf_page(client, page_id) for page_id in page_ids
-        ]
+    """Downloads page.pdf files of the given pages
+
+    At most `papermerge__s3__download_concurrency` pages are downloaded at
+    the same time: that many downloaders take pages one by one from the
+    shared iterator, thus memory use does not depend on the number of pages.
+    Returns number of downloaded pages.
+    """
+    import asyncio
 
-        res = await asyncio.gather(*to_download)
+    from httpx import AsyncClient, Limits
 
-    return len(res)
+    concurrency = max(1, settings.papermerge__s3__download_concurrency)
+    pending = iter(page_ids)
 
+    async def downloader(client: "AsyncClient") -> int:
+        count = 0
+        for page_id in pending:
+            await download_one_pdf_page(client, page_id)
+            count += 1
 
-async def download_one_pdf_page(client: AsyncClient, page_id: str):
-    page_data = await get_pdf_page(client, page_id)
-    file_path = plib.abs_page_path(page_id) / const.PAGE_PDF
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    file_path.write_bytes(page_data)
+        return count
 
+    limits = Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with AsyncClient(limits=limits, timeout=DOWNLOAD_TIMEOUT) as client:
+        counts = await asyncio.gather(
+            *(
+                downloader(client)
+                for _ in range(min(concurrency, len(page_ids)))
+            )
+        )
 
-async def get_pdf_page(client: AsyncClient, page_id: str) -> bytes:
-    s3_client = get_client()
+    return sum(counts)
+
+
+async def download_one_pdf_page(client: "AsyncClient", page_id: str):
+    """Downloads page.pdf file of the page, retrying on transient errors
+
+    Connection errors, timeouts, 429 and 5xx responses are retried (at
+    most `papermerge__s3__max_attempts` attempts, with exponential
+    backoff).
+    """
+    import asyncio
+
+    from httpx import HTTPStatusError, TransportError
+
+    attempts = max(1, settings.papermerge__s3__max_attempts)
+    for attempt in range(1, attempts + 1):
+        try:
+            await stream_pdf_page(client, page_id)
+            return
+        except HTTPStatusError as ex:
+            retryable = ex.response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt == attempts:
+                raise
+            error = ex
+        except TransportError as ex:
+            if attempt == attempts:
+                raise
+            error = ex
+
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        logger.warning(
+            f"Download of page {page_id} failed ({error!r}),"
+            f" attempt {attempt} of {attempts}; retrying in {delay}s"
+        )
+        await asyncio.sleep(delay)
+
+
+async def stream_pdf_page(client: "AsyncClient", page_id: str):
+    """Streams page.pdf of the page into its file (chunk by chunk)"""
+    file_path = plib.abs_page_path(page_id) / const.PAGE_PDF
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}")
+    size = 0
+    try:
+        # URL is signed for each attempt: it expires quickly
+        request_url = get_pdf_page_url(page_id)
+        async with client.stream(
+            "GET", request_url, follow_redirects=True
+        ) as resp:
+            resp.raise_for_status()
+            with tmp_path.open("wb") as file:
+                async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+                    size += len(chunk)
+        metrics.inc(metrics.BYTES, size, direction="download")
+        tmp_path.rename(file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def get_pdf_page_url(page_id: str) -> str:
+    """Presigned URL of page.pdf of the page
+
+    URL is signed (locally, no request is made) by S3 client of the
+    current process (see `get_client`).
+    """
     key = get_prefix() / plib.page_path(page_id) / const.PAGE_PDF
-    request_url = s3_client.generate_presigned_url(
+
+    return get_client().generate_presigned_url(
         "get_object",
         {"Bucket": get_bucket_name(), "Key": str(key)},
-        ExpiresIn=30,
+        ExpiresIn=PRESIGNED_URL_EXPIRES_IN,
     )
-    resp = await client.get(request_url, follow_redirects=True)
-    return resp.read()
 
 
 def get_bucket_name():
@@ -0,0 +1,133 @@
+"""
+Size aware scheduling of OCR workflows.
+
+Documents are split in two size classes by number of pages:
+
+- small documents (at most `papermerge__ocr__small_doc_max_pages` pages)
+  are OCRed via `<prefix>_ocr` queue
+- large documents via `<prefix>_ocr_large` queue
+
+Worker consuming `<prefix>_ocr` queue consumes `<prefix>_ocr_large` queue
+too (see `worker_queues`), unless size scheduling is disabled. Worker
+consuming both queues fetches from them in round robin fashion, thus a
+2000 pages archive scan never blocks single page receipts (and receipts
+never starve the archive scan: it gets at least every other fetch).
+
+Redis priorities are strict within the queue. In the small documents
+queue tasks of smaller documents have higher priority: under sustained
+load of single page documents, a 10 pages one waits until the load drops
+(no aging is done; keep `papermerge__ocr__small_doc_max_pages` small). In
+the large documents queue all OCR tasks have the same priority,
+i.e. large documents are OCRed in the order they were submitted and a
+2000 pages scan is never starved by a stream of 20 pages ones. Tasks
+completing the workflow (stitch, DB update etc.) always get the highest
+priority, so that started workflows finish first.
+
+Each worker also consumes its own node queue (`<prefix>_ocr_node_<node>`):
+stitching task is sent to the node which OCRed most pages of the document,
+so that page.pdf files are found on local disk instead of being downloaded
+from S3.
+"""
+
+import math
+import re
+import socket
+
+from ocrworker import config
+from ocrworker import constants as const
+
+settings = config.get_settings()
+
+SMALL = "small"
+LARGE = "large"
+
+# with Redis broker 0 is the highest priority, 9 the lowest
+HIGHEST_PRIORITY = 0
+LOWEST_PRIORITY = 9
+
+
+def size_class(page_count: int) -> str:
+    if page_count <= settings.papermerge__ocr__small_doc_max_pages:
+        return SMALL
+
+    return LARGE
+
+
+def ocr_queue(page_count: int) -> str:
+    """Name of the queue for OCR tasks of document with `page_count` pages"""
+    if not settings.papermerge__ocr__size_scheduling:
+        return prefixed(const.OCR)
+
+    if size_class(page_count) == SMALL:
+        return prefixed(const.OCR)
+
+    return prefixed(const.OCR_LARGE)
+
+
+def ocr_priority(page_count: int) -> int | None:
+    """Priority of OCR tasks of document with `page_count` pages
+
+    For small documents priority drops by one step each time number of
+    pages doubles: 1 page -> 0, 2-3 pages -> 1, 4-7 pages -> 2 etc. All
+    large documents have the lowest priority, thus their queue is FIFO.
+    """
+    if not settings.papermerge__ocr__size_scheduling:
+        return None
+
+    if size_class(page_count) == LARGE:
+        return LOWEST_PRIORITY
+
+    return min(LOWEST_PRIORITY, int(math.log2(max(1, page_count))))
+
+
+def tail_priority() -> int | None:
+    """Priority of the tasks which complete the workflow"""
+    if not settings.papermerge__ocr__size_scheduling:
+        return None
+
+    return HIGHEST_PRIORITY
+
+
+def node_name() -> str:
+    """Name of the current node (host)"""
+    return settings.papermerge__main__node_name or socket.gethostname()
+
+
+def node_queue(node: str) -> str | None:
+    """Name of the queue consumed only by workers of `node`
+
+    None if locality aware scheduling is disabled.
+    """
+    if not settings.papermerge__ocr__locality:
+        return None
+
+    # queue names end up in Redis keys
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", node)
+
+    return prefixed(f"{const.OCR}_node_{safe_name}")
+
+
+def worker_queues(consumed: set[str]) -> list[str]:
+    """Queues added to those given to the worker (with `-Q`)
+
+    Large documents are OCRed by the workers of `<prefix>_ocr` queue unless
+    dedicated workers are started; node queue is consumed by every worker.
+    """
+    queues = []
+    if settings.papermerge__ocr__size_scheduling:
+        if prefixed(const.OCR) in consumed:
+            queues.append(prefixed(const.OCR_LARGE))
+
+    queue = node_queue(node_name())
+    if queue:
+        queues.append(queue)
+
+    return [queue for queue in queues if queue not in consumed]
+
+
+def prefixed(name: str) -> str:
+    pref = settings.papermerge__main__prefix
+    if pref:
+        return f"{pref}_{name}"
+
+    return name
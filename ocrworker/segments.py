@@ -0,0 +1,142 @@
+"""
+Pre-stitched segments of OCRed document versions.
+
+OCR task of a chunk of consecutive pages stitches its pages into one
+segment right after OCR, while other chunks of the document are still
+being OCRed. Stitching task then joins segments (plus one page pdf files
+of pages not covered by any segment on this node) in page order, and
+what is left after the last page is OCRed is the final join and save.
+
+Segments are kept only on the node which created them (they are not
+uploaded to S3) and are removed by stitching task; see
+`ocrworker.scheduling.node_queue` for how stitching is routed to the node
+which has most of them. Segments of other nodes are never used: OCR tasks
+remove segment folders not modified within `papermerge__ocr__segments_ttl`
+seconds (`sweep`).
+"""
+
+import logging
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from ocrworker import cache, config, metrics, plib, utils
+from ocrworker import constants as const
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+SEGMENT_NAME = re.compile(r"^(\d+)-(\d+)\.pdf$")
+# minimal interval (in seconds) between two sweeps in one process
+SWEEP_INTERVAL = 600
+
+_last_sweep = 0.0
+
+
+def is_enabled() -> bool:
+    return settings.papermerge__ocr__segments
+
+
+def build(
+    target_docver_id: uuid.UUID, pages: list[tuple[int, uuid.UUID]]
+) -> Path | None:
+    """Stitches OCRed pages of the chunk into segment
+
+    `pages` is list of (page number, target page ID) pairs. Segment is
+    built only if pages are consecutive. Returns relative path of the
+    segment (None if no segment was built).
+    """
+    numbers = [page_number for page_number, _ in pages]
+    if len(pages) < 2 or numbers != list(range(numbers[0], numbers[-1] + 1)):
+        return None
+
+    rel_path = plib.segment_path(target_docver_id, numbers[0], numbers[-1])
+    srcs = [
+        plib.abs_page_path(page_id) / const.PAGE_PDF for _, page_id in pages
+    ]
+    with metrics.timer(metrics.STAGE_SECONDS, stage="segment"):
+        utils.stitch_pdf(srcs=srcs, dst=plib.rel2abs(rel_path))
+    cache.register(rel_path)
+    sweep()
+
+    return rel_path
+
+
+def find(target_docver_id: uuid.UUID) -> dict[int, tuple[int, Path]]:
+    """Returns local segments: first page -> (last page, path)"""
+    result = {}
+    folder = plib.abs_segments_path(target_docver_id)
+    if not folder.exists():
+        return result
+
+    for path in folder.iterdir():
+        match = SEGMENT_NAME.match(path.name)
+        if match:
+            result[int(match.group(1))] = (int(match.group(2)), path)
+
+    return result
+
+
+def plan(
+    target_docver_id: uuid.UUID, target_page_ids: list[uuid.UUID]
+) -> tuple[list[Path], list[uuid.UUID]]:
+    """Returns stitching sources (in page order) and pages not in segments
+
+    Pages not covered by local segments are stitched from their page.pdf
+    files (which may need to be downloaded first).
+    """
+    available = find(target_docver_id) if is_enabled() else {}
+    srcs, uncovered = [], []
+    page_number = 1
+    while page_number <= len(target_page_ids):
+        last, path = available.get(page_number, (None, None))
+        if last is not None and last <= len(target_page_ids):
+            srcs.append(path)
+            page_number = last + 1
+            continue
+
+        page_id = target_page_ids[page_number - 1]
+        srcs.append(plib.abs_page_path(page_id) / const.PAGE_PDF)
+        uncovered.append(page_id)
+        page_number += 1
+
+    logger.debug(
+        f"Stitching {len(target_page_ids)} pages from {len(srcs)} files"
+        f" ({len(srcs) - len(uncovered)} segments)"
+    )
+
+    return srcs, uncovered
+
+
+def remove(target_docver_id: uuid.UUID) -> None:
+    shutil.rmtree(plib.abs_segments_path(target_docver_id), ignore_errors=True)
+    cache.forget(plib.segments_path(target_docver_id))
+
+
+def sweep() -> None:
+    """Removes segment folders not modified within TTL
+
+    Folder is modified each time a segment is added to it, thus folders
+    of documents still being OCRed are kept.
+    """
+    global _last_sweep
+
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL:
+        return
+    _last_sweep = now
+
+    root = plib.rel2abs(Path(const.OCR, const.SEGMENTS))
+    for folder in root.glob("*/*/*"):
+        try:
+            expired = now - folder.stat().st_mtime > (
+                settings.papermerge__ocr__segments_ttl
+            )
+        except FileNotFoundError:
+            # removed by stitching task meanwhile
+            continue
+        if expired:
+            logger.debug(f"Removing expired segments {folder.name}")
+            remove(uuid.UUID(folder.name))
@@ -0,0 +1,90 @@
+"""
+Per node cache of single page PDFs.
+
+Document version is split into one page PDF files only once per node
+(and per document version content). OCR page tasks then work with
+their own small file instead of parsing entire document version.
+"""
+
+import fcntl
+import logging
+import shutil
+import tempfile
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+from ocrworker import cache, plib, utils
+
+logger = logging.getLogger(__name__)
+
+
+def split_docver(doc_ver_id: uuid.UUID, file_name: str) -> list[Path]:
+    """Returns paths of one page pdf files of the document version
+
+    Document version is either a pdf file or an image (see
+    `utils.split_document`).
+
+    Pdf files are generated if they are not yet present in the
+    local cache. Cache key is document version ID plus content hash of
+    the document version file, so that a changed file is never served
+    from stale split.
+
+    It is safe to call this function concurrently from multiple worker
+    processes of the same node: only one of them will split the
+    document, the others will wait and reuse the result.
+    """
+    src = plib.abs_docver_path(doc_ver_id, file_name)
+    digest = docver_digest(src)
+    split_dir = plib.abs_docver_split_path(doc_ver_id, digest)
+
+    if split_dir.exists():
+        cache.touch(plib.docver_split_path(doc_ver_id, digest))
+        return _list_pages(split_dir)
+
+    split_dir.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = split_dir.with_suffix(".lock")
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # some other process might have finished splitting
+            # while we were waiting for the lock
+            if not split_dir.exists():
+                _split(src, split_dir)
+                cache.register(plib.docver_split_path(doc_ver_id, digest))
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return _list_pages(split_dir)
+
+
+def docver_digest(path: Path) -> str:
+    """Content hash of the document version file
+
+    Hash is computed only once per file (per worker process) as long as
+    file's size and modification time do not change.
+    """
+    stat = path.stat()
+    return _digest(str(path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=128)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    return utils.file_digest(Path(path))
+
+
+def _split(src: Path, split_dir: Path):
+    logger.debug(f"Splitting {src} into {split_dir}")
+    # split into temporary folder first and then rename it; this way
+    # `split_dir` is either complete or absent
+    tmp_dir = Path(tempfile.mkdtemp(dir=split_dir.parent))
+    try:
+        utils.split_document(src, tmp_dir)
+        tmp_dir.rename(split_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _list_pages(split_dir: Path) -> list[Path]:
+    return sorted(split_dir.glob("*.pdf"))
@@ -1,16 +1,21 @@
 import io
 import logging
+import time
 import uuid
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from celery.app import default_app as celery_app
 
 from celery import chain, group, shared_task
 
-from ocrworker import config, db, plib, utils, s3, exceptions
+from ocrworker import config, db, plib, utils, s3, split, exceptions
+from ocrworker import checkpoint, coordination, cpu_budget, metrics, ocr_cache
+from ocrworker import incremental, lang_detection, normalize, scheduling
+from ocrworker import segments, text_layer
 from ocrworker.db.engine import Session
 from ocrworker import constants as const
-from ocrworker.ocr import run_one_page_ocr
+from ocrworker.ocr import ocr_params, run_one_page_ocr
 
 logger = logging.getLogger(__name__)
 
@@ -39,54 +44,273 @@ def ocr_document_task(document_id: str, lang: str):
         doc_ver = db.get_last_version(db_session, doc_id=uuid.UUID(document_id))
         pages = db.get_pages(db_session, doc_ver_id=doc_ver.id)
 
-    target_docver_uuid = uuid.uuid4()
-    target_page_uuids = [uuid.uuid4() for _ in range(len(pages))]
+    lang = lang.lower()
+    preview_width = 300
+    params = result_params(lang, preview_width)
+
+    # same document version OCRed with same parameters gets same target
+    # IDs, thus pages OCRed by the previous (failed) attempt are found
+    # and not OCRed again (see `ocrworker.checkpoint`)
+    target_docver_uuid, target_page_uuids = checkpoint.target_ids(
+        doc_ver.id, len(pages), params
+    )
 
     logger.debug(f"target_docver_uuid={target_docver_uuid}")
     logger.debug(f"target_page_uuids={target_page_uuids}")
 
-    lang = lang.lower()
+    missing = set(checkpoint.missing_pages(target_page_uuids))
+    # (page number, target page ID) pairs of the pages to OCR
+    todo = [
+        (page_number, page_id)
+        for page_number, page_id in enumerate(target_page_uuids, start=1)
+        if page_id in missing
+    ]
+    logger.info(
+        f"Document {document_id}: {len(pages)} pages"
+        f" ({scheduling.size_class(len(pages))}),"
+        f" {len(pages) - len(todo)} of them already OCRed"
+    )
+
+    if todo:
+        page_files = prepare_docver(doc_ver, page_count=len(pages))
+        # pages which were OCRed in the previous version of the document
+        with metrics.timer(metrics.STAGE_SECONDS, stage="reuse"):
+            todo = reuse_pages(doc_ver.id, todo, page_files, params)
+
+    # OCR tasks of large documents go to separate queue and get lower
+    # priority (see `ocrworker.scheduling`)
+    ocr_options = dict(
+        doc_ver_id=doc_ver.id,
+        target_docver_id=target_docver_uuid,
+        lang=lang,
+        preview_width=preview_width,
+        queue=scheduling.ocr_queue(len(pages)),
+        priority=scheduling.ocr_priority(len(pages)),
+    )
+    tail = tail_tasks(
+        document_id=document_id,
+        doc_ver_id=doc_ver.id,
+        lang=lang,
+        target_docver_id=target_docver_uuid,
+        target_page_ids=target_page_uuids,
+        params=params,
+    )
+    chunks = page_chunks(todo)
+    if not chunks:
+        # nothing to OCR, straight to stitching
+        coordination.run_tail(tail)
+        return
+
+    if not coordination.is_enabled():
+        workflow = chain(
+            group([ocr_task(chunk, **ocr_options) for chunk in chunks]) | tail
+        )
+        # I've tried workflow.apply_async(queue=prefixed(OCR))
+        # but not all tasks in the workflow reached OCR queue
+        # See https://stackoverflow.com/questions/14953521/how-to-route-a-chain-of-tasks-to-a-specific-queue-in-celery  # noqa
+        workflow.apply_async()
+        return
+
+    # tail is published by the OCR task which finishes last (see
+    # `ocrworker.coordination`)
+    workflow_id = uuid.uuid4()
+    coordination.start(workflow_id, total=len(chunks), tail=tail)
+    publish_ocr_tasks(chunks=chunks, workflow_id=workflow_id, **ocr_options)
+
 
+def prepare_docver(doc_ver, page_count: int) -> list[Path]:
+    """Downloads and splits document version; returns one page pdf files
+
+    Raises ValueError if document format is not supported or if number of
+    pages does not match `page_count`.
+    """
     doc_ver_path = plib.abs_docver_path(doc_ver.id, doc_ver.file_name)
-    s3.download_docver(doc_ver.id, doc_ver.file_name)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="download"):
+        s3.download_docver(doc_ver.id, doc_ver.file_name)
     _type, _ = mimetypes.guess_type(doc_ver_path)
 
-    if _type not in ("application/pdf", "application/image"):
+    if _type not in utils.PDF_TYPES + utils.IMAGE_TYPES:
         raise ValueError(f"Unsupported format for document: {doc_ver_path}")
 
-    per_page_ocr_tasks = [
-        ocr_page_task.s(
-            doc_id=doc_ver.id,
-            doc_ver_id=doc_ver.id,
-            page_number=index + 1,
-            target_docver_id=target_docver_uuid,
-            target_page_id=target_page_uuid,
-            lang=lang,
-            preview_width=300,
-        ).set(queue=prefixed(const.OCR))
-        for index, target_page_uuid in enumerate(target_page_uuids)
-    ]
-    workflow = chain(
-        group(per_page_ocr_tasks)
-        | stitch_pages_task.s(
-            doc_ver_id=doc_ver.id,
-            target_docver_id=target_docver_uuid,
-            target_page_ids=target_page_uuids,
-        ).set(queue=prefixed(const.OCR))
+    # split document version (pdf or image) into one page pdf files (in
+    # one pass); page tasks running on this node will reuse them
+    with metrics.timer(metrics.STAGE_SECONDS, stage="split"):
+        page_files = split.split_docver(doc_ver.id, doc_ver.file_name)
+
+    if len(page_files) != page_count:
+        raise ValueError(
+            f"Document version {doc_ver.id} has {page_count} pages,"
+            f" but {len(page_files)} were found in {doc_ver_path}"
+        )
+
+    return page_files
+
+
+def reuse_pages(
+    doc_ver_id: uuid.UUID,
+    todo: list[tuple[int, uuid.UUID]],
+    page_files: list[Path],
+    params: dict,
+) -> list[tuple[int, uuid.UUID]]:
+    """Copies OCR results of pages found in the previous version
+
+    Pages of `todo` (list of (page number, target page ID) pairs) are
+    matched against pages of the previous (OCRed) version of the document
+    by fingerprint (see `ocrworker.incremental`). Returns pages which
+    still need OCR.
+    """
+    with Session() as db_session:
+        previous = db.get_previous_version(db_session, doc_ver_id)
+
+    if previous is None:
+        return todo
+
+    fingerprints = incremental.load_manifest(previous.id, params)
+    if not fingerprints:
+        return todo
+
+    remaining, reused = [], []
+    for page_number, page_id in todo:
+        fingerprint = incremental.page_fingerprint(page_files[page_number - 1])
+        src_page_id = fingerprints.get(fingerprint)
+        if src_page_id and incremental.copy_page(src_page_id, page_id):
+            reused.append(page_id)
+        else:
+            remaining.append((page_number, page_id))
+
+    s3.upload_pages_dirs(reused)
+    metrics.inc(metrics.PAGES, len(reused), stage="reuse")
+    logger.info(
+        f"Document version {doc_ver_id}: {len(reused)} pages reused"
+        f" from version {previous.id}"
+    )
+
+    return remaining
+
+
+def tail_tasks(
+    document_id: str,
+    doc_ver_id: uuid.UUID,
+    lang: str,
+    target_docver_id: uuid.UUID,
+    target_page_ids: list[uuid.UUID],
+    params: dict,
+):
+    """Returns signature of the tasks which run after OCR of all pages"""
+    options = dict(
+        queue=prefixed(const.OCR), priority=scheduling.tail_priority()
+    )
+
+    return (
+        stitch_pages_task.s(
+            doc_ver_id=doc_ver_id,
+            target_docver_id=target_docver_id,
+            target_page_ids=target_page_ids,
+            params=params,
+        ).set(**options)
         | update_db_task.s(
             doc_id=uuid.UUID(document_id),
-            doc_ver_id=doc_ver.id,
+            doc_ver_id=doc_ver_id,
             lang=lang,
-            target_docver_id=target_docver_uuid,
-            target_page_ids=target_page_uuids,
-        ).set(queue=prefixed(const.OCR))
-        | generate_preview.s(doc_id=document_id).set(queue=prefixed(const.OCR))
-        | notify_index_task.s(doc_id=document_id).set(queue=prefixed(const.OCR))
+            target_docver_id=target_docver_id,
+            target_page_ids=target_page_ids,
+        ).set(**options)
+        | generate_preview.s(doc_id=document_id).set(**options)
+        | notify_index_task.s(doc_id=document_id).set(**options)
+    )
+
+
+def page_chunks(pages: list[tuple[int, uuid.UUID]]) -> list[list]:
+    """Splits pages into chunks OCRed by one task
+
+    `pages` is list of (page number, target page ID) pairs.
+    """
+    if not settings.papermerge__ocr__page_batching:
+        return utils.chunks(pages, 1)
+
+    size = utils.page_chunk_size(
+        page_count=len(pages),
+        concurrency=cpu_budget.get_concurrency(),
+        min_size=settings.papermerge__ocr__min_pages_per_task,
+        max_size=settings.papermerge__ocr__max_pages_per_task,
+    )
+    logger.debug(f"OCR {len(pages)} pages in chunks of {size} pages")
+
+    return utils.chunks(pages, size)
+
+
+def ocr_task(
+    chunk: list,
+    doc_ver_id: uuid.UUID,
+    target_docver_id: uuid.UUID,
+    lang: str,
+    preview_width: int,
+    queue: str | None = None,
+    priority: int | None = None,
+    workflow_id: uuid.UUID | None = None,
+):
+    """Returns signature of the OCR task of one chunk of pages"""
+    options = dict(queue=queue or prefixed(const.OCR), priority=priority)
+    extra = {}
+    if workflow_id is not None:
+        # completion is tracked via `ocrworker.coordination`, nobody
+        # reads task's result
+        options["ignore_result"] = True
+        extra["workflow_id"] = workflow_id
+
+    if not settings.papermerge__ocr__page_batching:
+        [(page_number, target_page_id)] = chunk
+        return ocr_page_task.s(
+            doc_id=doc_ver_id,
+            doc_ver_id=doc_ver_id,
+            page_number=page_number,
+            target_docver_id=target_docver_id,
+            target_page_id=target_page_id,
+            lang=lang,
+            preview_width=preview_width,
+            **extra,
+        ).set(**options)
+
+    return ocr_pages_task.s(
+        doc_ver_id=doc_ver_id,
+        target_docver_id=target_docver_id,
+        pages=chunk,
+        lang=lang,
+        preview_width=preview_width,
+        **extra,
+    ).set(**options)
+
+
+def publish_ocr_tasks(chunks: list[list], **kwargs) -> None:
+    """Publishes OCR tasks of the given chunks of pages
+
+    At most `PAPERMERGE__OCR__FAN_OUT` messages are published: if there are
+    more chunks, they are split between `fan_out_task`s which publish
+    (recursively) OCR tasks of their share. This way no message carries
+    signatures of all pages and publishing is spread between workers.
+    """
+    fan_out = settings.papermerge__ocr__fan_out
+    if len(chunks) <= fan_out:
+        for chunk in chunks:
+            ocr_task(chunk, **kwargs).apply_async()
+        return
+
+    for part in utils.split_evenly(chunks, fan_out):
+        fan_out_task.s(chunks=part, **kwargs).set(
+            queue=kwargs["queue"],
+            priority=scheduling.tail_priority(),
+            ignore_result=True,
+        ).apply_async()
+
+
+@shared_task()
+def fan_out_task(**kwargs):
+    """Publishes OCR tasks of part of the document"""
+    logger.debug(
+        f"Publishing OCR tasks of {len(kwargs['chunks'])} chunks"
+        f" of workflow {kwargs['workflow_id']}"
     )
-    # I've tried workflow.apply_async(queue=prefixed(OCR))
-    # but not all tasks in the workflow reached OCR queue
-    # See https://stackoverflow.com/questions/14953521/how-to-route-a-chain-of-tasks-to-a-specific-queue-in-celery  # noqa
-    workflow.apply_async()
+    publish_ocr_tasks(**kwargs)
 
 
 @shared_task()
@@ -103,6 +327,141 @@ def ocr_page_task(**kwargs):
     with Session() as db_session:
         doc_ver = db.get_doc_ver(db_session, doc_ver_id)
 
+    page_files = get_page_files(doc_ver)
+    ocr_page(
+        page_file=page_files[page_number - 1],
+        target_page_id=target_page_id,
+        lang=lang,
+        preview_width=preview_width,
+    )
+    # upload entire page dir (*.pdf file, *.svg, *.txt etc)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="upload"):
+        s3.upload_page_dir(target_page_id)
+
+    if kwargs.get("workflow_id"):
+        coordination.task_done(
+            kwargs["workflow_id"],
+            str(page_number),
+            node=scheduling.node_name(),
+        )
+
+
+@shared_task()
+def ocr_pages_task(**kwargs):
+    """OCR chunk of pages of the same document version
+
+    Document version DB row, download and split are shared by
+    all pages of the chunk.
+    """
+    logger.debug(f"Task started kwargs={kwargs}")
+
+    doc_ver_id = kwargs["doc_ver_id"]
+    pages = kwargs["pages"]  # list of (page number, target page ID)
+    lang = kwargs["lang"]
+    preview_width = kwargs["preview_width"]
+
+    with Session() as db_session:
+        doc_ver = db.get_doc_ver(db_session, doc_ver_id)
+
+    page_files = get_page_files(doc_ver)
+    for page_number, target_page_id in pages:
+        ocr_page(
+            page_file=page_files[page_number - 1],
+            target_page_id=target_page_id,
+            lang=lang,
+            preview_width=preview_width,
+        )
+    # upload all pages dirs in one go
+    with metrics.timer(metrics.STAGE_SECONDS, stage="upload"):
+        s3.upload_pages_dirs([target_page_id for _, target_page_id in pages])
+
+    if segments.is_enabled():
+        # stitching task will join this segment instead of its pages
+        try:
+            segments.build(kwargs["target_docver_id"], pages)
+        except Exception:
+            # segment is an optimization only; stitching falls back
+            # to the page files
+            logger.exception("Failed to build segment")
+
+    if kwargs.get("workflow_id"):
+        # chunk is identified by its first page
+        coordination.task_done(
+            kwargs["workflow_id"],
+            str(pages[0][0]),
+            node=scheduling.node_name(),
+            pages=len(pages),
+        )
+
+
+def get_page_files(doc_ver) -> list[Path]:
+    """Returns one page pdf files of the document version"""
+    with metrics.timer(metrics.STAGE_SECONDS, stage="download"):
+        s3.download_docver(doc_ver.id, doc_ver.file_name)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="split"):
+        return split.split_docver(doc_ver.id, doc_ver.file_name)
+
+
+def result_params(lang: str, preview_width: int) -> dict:
+    """Parameters with effect on OCR results of the page"""
+    params = {
+        **ocr_params(lang=lang, preview_width=preview_width),
+        "text_layer": settings.papermerge__ocr__text_layer,
+        # engines differ in deskew and hOCR output
+        "engine": settings.papermerge__ocr__engine,
+    }
+    if normalize.is_enabled():
+        params["target_dpi"] = settings.papermerge__ocr__target_dpi
+    if lang_detection.is_enabled():
+        params["lang_detection"] = lang_detection.AUTO
+
+    return params
+
+
+def ocr_page(
+    page_file: Path,
+    target_page_id: uuid.UUID,
+    lang: str,
+    preview_width: int,
+):
+    """OCR one page pdf file
+
+    Results are written in the folder of the target page. If same page
+    (with same OCR parameters) was OCRed before, results are taken from
+    the OCR cache.
+    """
+    key = ocr_cache.cache_key(page_file, result_params(lang, preview_width))
+    if ocr_cache.restore(key, target_page_id):
+        return
+    metrics.inc(metrics.PAGES, stage="ocr")
+
+    decision = text_layer.decide(page_file)
+    logger.info(
+        f"Page {target_page_id}: use_text_layer={decision.use_text_layer}"
+        f" ({decision.reason})"
+    )
+    metrics.inc(
+        metrics.TEXT_LAYER,
+        decision="text_layer" if decision.use_text_layer else "ocr",
+    )
+    if decision.use_text_layer:
+        with metrics.timer(metrics.STAGE_SECONDS, stage="text_layer"):
+            text_layer.extract(
+                page_file,
+                output_dir=plib.abs_page_path(target_page_id),
+                page_pdf_name=const.PAGE_PDF,
+                preview_width=preview_width,
+            )
+        if lang_detection.is_enabled():
+            # written after page.pdf; if missing, page gets languages
+            # of the document
+            page_lang = lang_detection.detect_from_text(
+                plib.abs_page_txt_path(target_page_id).read_text(), lang
+            )
+            lang_detection.write(plib.abs_page_path(target_page_id), page_lang)
+        ocr_cache.store(key, target_page_id)
+        return
+
     sidecar_dir = Path(
         settings.papermerge__main__media_root, const.OCR, const.PAGES
     )
@@ -115,18 +474,35 @@ def ocr_page_task(**kwargs):
     if not sidecar_dir.parent.exists():
         sidecar_dir.parent.mkdir(parents=True, exist_ok=True)
 
-    s3.download_docver(doc_ver.id, doc_ver.file_name)
-    run_one_page_ocr(
-        file_path=plib.abs_docver_path(doc_ver.id, doc_ver.file_name),
-        output_dir=output_dir / const.PAGE_PDF,
-        lang=lang,
-        sidecar_dir=sidecar_dir,
-        uuid=target_page_id,
-        page_number=page_number,
-        preview_width=preview_width,
-    )
-    # upload entire page dir (*.pdf file, *.svg, *.txt etc)
-    s3.upload_page_dir(target_page_id)
+    if lang_detection.is_enabled():
+        # page is OCRed only with the languages detected on it
+        with metrics.timer(metrics.STAGE_SECONDS, stage="lang_detection"):
+            page_lang = lang_detection.detect(page_file, lang)
+        logger.info(f"Page {target_page_id}: languages {lang} -> {page_lang}")
+        lang_detection.write(output_dir, page_lang)
+        lang = page_lang
+
+    page_image = None
+    if normalize.is_enabled():
+        with metrics.timer(metrics.STAGE_SECONDS, stage="normalize"):
+            page_image = normalize.measure(page_file)
+
+    start = time.perf_counter()
+    with metrics.timer(metrics.STAGE_SECONDS, stage="ocr"):
+        run_one_page_ocr(
+            file_path=page_file,
+            output_dir=output_dir / const.PAGE_PDF,
+            lang=lang,
+            sidecar_dir=sidecar_dir,
+            uuid=target_page_id,
+            page_number=1,  # one page pdf file
+            preview_width=preview_width,
+        )
+    if normalize.is_enabled():
+        normalize.report(
+            target_page_id, page_image, time.perf_counter() - start
+        )
+    ocr_cache.store(key, target_page_id)
 
 
 @shared_task()
@@ -139,15 +515,31 @@ def stitch_pages_task(_, **kwargs):
     with Session() as db_session:
         doc_ver = db.get_doc_ver(db_session, doc_ver_id)
 
-    dst = plib.abs_docver_path(target_docver_id, doc_ver.file_name)
-    srcs = [
-        plib.abs_page_path(page_id) / const.PAGE_PDF
-        for page_id in target_page_ids
-    ]
-    s3.download_pdf_pages(target_page_ids)
-    utils.stitch_pdf(srcs=srcs, dst=dst)
+    # OCRed images (e.g. scan.tiff) become pdf files (scan.pdf)
+    file_name = utils.target_file_name(doc_ver.file_name)
+    dst = plib.abs_docver_path(target_docver_id, file_name)
+    # segments pre-stitched by OCR tasks on this node plus page.pdf
+    # files of the other pages (see `ocrworker.segments`)
+    srcs, uncovered = segments.plan(target_docver_id, target_page_ids)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="download"):
+        s3.download_pdf_pages(uncovered)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="stitch"):
+        utils.stitch_pdf(srcs=srcs, dst=dst)
+    metrics.inc(metrics.PAGES, len(target_page_ids), stage="stitch")
+    segments.remove(target_docver_id)
     # same as dst, but relative
-    s3.upload_file(plib.docver_path(target_docver_id, doc_ver.file_name))
+    rel_paths = [plib.docver_path(target_docver_id, file_name)]
+    if kwargs.get("params") is not None:
+        # fingerprints of the pages, so that next version of the document
+        # OCRs only new pages (see `ocrworker.incremental`)
+        with metrics.timer(metrics.STAGE_SECONDS, stage="fingerprint"):
+            rel_paths.append(
+                incremental.write_manifest(
+                    target_docver_id, target_page_ids, dst, kwargs["params"]
+                )
+            )
+    with metrics.timer(metrics.STAGE_SECONDS, stage="upload"):
+        s3.upload_files(rel_paths)
 
 
 @shared_task()
@@ -159,31 +551,96 @@ def update_db_task(_, **kwargs):
     target_docver_id = kwargs["target_docver_id"]
     target_page_ids = kwargs["target_page_ids"]
 
+    page_langs = None
+    if lang_detection.is_enabled():
+        # languages detected on each page (see `ocrworker.lang_detection`)
+        with metrics.timer(metrics.STAGE_SECONDS, stage="read_lang"):
+            page_langs = read_pages_lang(target_page_ids)
+
     with Session() as db_session:
-        db.increment_doc_ver(
-            db_session,
-            document_id=doc_id,
-            target_docver_uuid=target_docver_id,
-            target_page_uuids=[tid for tid in target_page_ids],
-            lang=lang,
-        )
-        # these are newly created pages
-        pages = db.get_pages(db_session, doc_ver_id=target_docver_id)
-        streams = []
-        for page in pages:
-            abs_file_path = plib.abs_page_txt_path(page.id)
-            s3.download_page_txt(page.id)
-            if abs_file_path.exists():
-                streams.append(open(abs_file_path))
-            else:
-                logger.debug(
-                    f"{abs_file_path} not found. Page text set to empty string"
+        with metrics.timer(metrics.STAGE_SECONDS, stage="db"):
+            doc_ver = db.get_doc_ver(db_session, kwargs["doc_ver_id"])
+            db.increment_doc_ver(
+                db_session,
+                document_id=doc_id,
+                target_docver_uuid=target_docver_id,
+                target_page_uuids=[tid for tid in target_page_ids],
+                lang=lang,
+                file_name=utils.target_file_name(doc_ver.file_name),
+                page_langs=page_langs,
+            )
+            # these are newly created pages
+            pages = db.get_pages(db_session, doc_ver_id=target_docver_id)
+        # text of the pages is downloaded concurrently and saved in DB
+        # in batches; only one batch of page texts is held in memory (plus
+        # aggregate text of the document version, built along) and no
+        # file is kept open
+        aggregate = io.StringIO()
+        batch_size = settings.papermerge__database__batch_size
+        for index, batch in enumerate(utils.chunks(pages, batch_size)):
+            with metrics.timer(metrics.STAGE_SECONDS, stage="read_text"):
+                texts = read_pages_text([page.id for page in batch])
+            with metrics.timer(metrics.STAGE_SECONDS, stage="db"):
+                db.update_pages_text(
+                    db_session,
+                    {page.id: text for page, text in zip(batch, texts)},
                 )
-                streams.append(io.StringIO(""))
+            if index > 0:
+                aggregate.write("\n")
+            aggregate.write("\n".join(texts))
 
-        db.update_doc_ver_text(
-            db_session, doc_ver_id=target_docver_id, streams=streams
-        )
+        with metrics.timer(metrics.STAGE_SECONDS, stage="db"):
+            db.update_doc_ver_aggregate_text(
+                db_session,
+                doc_ver_id=target_docver_id,
+                texts=[aggregate.getvalue()],
+            )
+            db_session.commit()
+
+
+def read_pages_text(page_ids: list[uuid.UUID]) -> list[str]:
+    """Returns text of the given pages
+
+    Page text files missing locally are downloaded from S3 concurrently.
+    """
+    max_workers = settings.papermerge__s3__download_concurrency
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_page_text, page_ids))
+
+
+def read_page_text(page_id: uuid.UUID) -> str:
+    abs_file_path = plib.abs_page_txt_path(page_id)
+    s3.download_page_txt(page_id)
+    if abs_file_path.exists():
+        return abs_file_path.read_text()
+
+    logger.debug(f"{abs_file_path} not found. Page text set to empty string")
+
+    return ""
+
+
+def read_pages_lang(page_ids: list[uuid.UUID]) -> list[str | None]:
+    """Returns languages detected on the given pages
+
+    Page language files missing locally are downloaded from S3
+    concurrently. None for pages without language file.
+    """
+    max_workers = settings.papermerge__s3__download_concurrency
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_page_lang, page_ids))
+
+
+def read_page_lang(page_id: uuid.UUID) -> str | None:
+    path = plib.abs_page_path(page_id) / const.PAGE_LANG
+    if not path.exists() and s3.is_enabled():
+        keyname = Path(s3.get_prefix()) / plib.page_path(page_id)
+        if s3.obj_exists(str(keyname / const.PAGE_LANG)):
+            s3.download_file(str(keyname / const.PAGE_LANG), path)
+
+    if not path.exists():
+        return None
+
+    return path.read_text().strip() or None
 
 
 @shared_task()
@@ -0,0 +1,227 @@
+"""
+In-process tesseract OCR engine (ocrmypdf plugin).
+
+By default ocrmypdf starts tesseract as subprocess twice per page (deskew
+angle and OCR) and each subprocess loads the language data again. With
+`papermerge__ocr__engine` set to "tesserocr" this plugin replaces the
+engine of `ocrmypdf_papermerge.plugin`: tesseract API handles (one per
+language and engine options) are created once per worker process via
+tesserocr and reused for all pages. Only `MAX_APIS` most recently used
+handles are kept, each holds its language data in memory.
+
+Outputs are the same as with papermerge plugin: hOCR and text files for
+ocrmypdf's hocr renderer, plus page.svg, page.jpg, page.hocr and page.txt
+in the sidecar folder.
+
+tesserocr is an optional dependency (`poetry install -E tesserocr`); it
+must be built against the same libtesseract as the installed tesseract.
+Unlike the subprocess, in-process OCR cannot be interrupted, thus
+tesseract timeouts do not apply.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from ocrmypdf import hookimpl
+from ocrmypdf_papermerge.generate_preview import generate_preview
+from ocrmypdf_papermerge.generate_svg import generate_svg
+from ocrmypdf_papermerge.plugin import CustomEngine
+from ocrmypdf_papermerge.utils import copy_hocr, copy_txt
+from tesserocr import OEM, PSM, PyTessBaseAPI, tesseract_version
+
+logger = logging.getLogger(__name__)
+
+PLUGIN = __name__
+
+# same as written by tesseract's hOCR renderer around the page
+HOCR_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
+ <head>
+  <title></title>
+  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>
+  <meta name='ocr-system' content='tesseract {version}' />
+  <meta name='ocr-capabilities' content='ocr_page ocr_carea ocr_par ocr_line\
+ ocrx_word ocrp_wconf'/>
+ </head>
+ <body>
+"""
+HOCR_FOOTER = """ </body>
+</html>
+"""
+
+# values of tesseract's `thresholding_method` variable, by ocrmypdf's
+# `--tesseract-thresholding` choices
+THRESHOLDING_METHODS = {"auto": 0, "otsu": 0, "adaptive-otsu": 1, "sauvola": 2}
+
+# max number of API handles kept by one process
+MAX_APIS = 2
+
+# (languages, oem, configs, variables) -> API handle of this process, least
+# recently used first
+_apis: OrderedDict[tuple, PyTessBaseAPI] = OrderedDict()
+# handle is not thread safe; a worker process OCRs one page at a time
+# anyway
+_lock = threading.Lock()
+
+
+def get_api(
+    lang: str,
+    oem: int | None = None,
+    configs: tuple[str, ...] = (),
+    variables: tuple[tuple[str, str], ...] = (),
+) -> PyTessBaseAPI:
+    """Returns API handle with loaded `lang` (e.g. "deu+eng")
+
+    Must be called with `_lock` held.
+    """
+    key = (lang, oem, configs, variables)
+    if key in _apis:
+        _apis.move_to_end(key)
+        return _apis[key]
+
+    while len(_apis) >= MAX_APIS:
+        _, evicted = _apis.popitem(last=False)
+        # frees language data
+        evicted.End()
+
+    logger.debug(f"Loading tesseract languages {lang}")
+    _apis[key] = PyTessBaseAPI(
+        lang=lang,
+        oem=OEM.DEFAULT if oem is None else OEM(oem),
+        configs=list(configs),
+        variables=dict(variables),
+    )
+
+    return _apis[key]
+
+
+def preload(langs: str) -> None:
+    """Loads language data of `langs` in advance (see `ocr.warm_up`)"""
+    with _lock:
+        get_api(langs)
+
+
+def _option(options, name: str):
+    # ocrmypdf 17 groups tesseract options, ocrmypdf 16 prefixes them
+    group = getattr(options, "tesseract", None)
+    if group is not None:
+        return getattr(group, name, None)
+
+    return getattr(options, f"tesseract_{name}", None)
+
+
+def thresholding_method(value) -> int:
+    """Tesseract's `thresholding_method` of ocrmypdf option"""
+    if isinstance(value, str):
+        return THRESHOLDING_METHODS[value]
+
+    # 0 (auto) is the default of tesseract
+    return int(value or 0)
+
+
+def _api_for(options) -> PyTessBaseAPI:
+    variables = {}
+    if _option(options, "user_words"):
+        variables["user_words_file"] = str(_option(options, "user_words"))
+    if _option(options, "user_patterns"):
+        variables["user_patterns_file"] = str(_option(options, "user_patterns"))
+
+    return get_api(
+        "+".join(options.languages),
+        oem=_option(options, "oem"),
+        configs=tuple(_option(options, "config") or ()),
+        variables=tuple(sorted(variables.items())),
+    )
+
+
+def recognize(input_file: Path, output_hocr: Path, output_text: Path, options):
+    """Writes hOCR and text of the image file, same as tesseract CLI"""
+    with _lock:
+        api = _api_for(options)
+        try:
+            psm = _option(options, "pagesegmode")
+            api.SetPageSegMode(PSM.AUTO if psm is None else PSM(psm))
+            # handle is reused, thus variable is set even if it is default
+            api.SetVariable(
+                "thresholding_method",
+                str(thresholding_method(_option(options, "thresholding"))),
+            )
+            api.SetImageFile(str(input_file))
+            if not api.Recognize():
+                # e.g. empty page; same as ocrmypdf does
+                output_hocr.write_text("", encoding="utf-8")
+                output_text.write_text("[skipped page]", encoding="utf-8")
+                return
+
+            page = api.GetHOCRText(0)
+            text = api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    output_hocr.write_text(
+        HOCR_HEADER.format(version=tesseract_version().split()[1])
+        + page
+        + HOCR_FOOTER,
+        encoding="utf-8",
+    )
+    output_text.write_text(text, encoding="utf-8")
+
+
+def deskew_angle(input_file: Path, options) -> float:
+    """Deskew angle (in degrees), same as `tesseract --psm 2`"""
+    with _lock:
+        api = _api_for(options)
+        try:
+            api.SetPageSegMode(PSM.AUTO_ONLY)
+            api.SetImageFile(str(input_file))
+            layout = api.AnalyseLayout()
+            if layout is None:
+                # not enough content for a skew angle
+                return 0.0
+            _, _, _, radians = layout.Orientation()
+        finally:
+            api.Clear()
+
+    return math.degrees(radians)
+
+
+class TesserocrEngine(CustomEngine):
+
+    @staticmethod
+    def get_deskew(input_file, options) -> float:
+        return deskew_angle(Path(input_file), options)
+
+    @staticmethod
+    def generate_hocr(input_file, output_hocr, output_text, options):
+        recognize(
+            Path(input_file), Path(output_hocr), Path(output_text), options
+        )
+        # sidecar files, same as `CustomEngine.generate_hocr`
+        generate_preview(
+            input_file=Path(input_file),
+            preview_width=options.preview_width,
+            base_dir=options.sidecar_dir,
+            uuid=options.uuid,
+        )
+        generate_svg(Path(input_file), input_hocr=output_hocr, options=options)
+        copy_hocr(
+            input_file_path=Path(output_hocr),
+            output_dir=options.sidecar_dir,
+            uuid=options.uuid,
+        )
+        copy_txt(
+            input_file_path=Path(output_text),
+            output_dir=options.sidecar_dir,
+            uuid=options.uuid,
+        )
+
+
+@hookimpl
+def get_ocr_engine():
+    # registered after papermerge plugin, thus takes precedence
+    return TesserocrEngine()
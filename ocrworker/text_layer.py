@@ -0,0 +1,419 @@
+"""
+Detection and extraction of the text layer of born-digital pages.
+
+Pages exported from office/ERP software already contain text which is
+better than anything tesseract would produce from rasterized page. With
+`papermerge__ocr__text_layer` set to "auto" (or "skip") such pages are not
+OCRed; instead, all OCR results (page.pdf, page.txt, page.hocr, page.svg
+and page.jpg) are generated from the existing text layer.
+
+Classification is done with pikepdf by walking the page content stream
+(including form XObjects): which text is shown, with which fonts and how
+much of the page is covered by images. Text and word positions are then
+extracted with pdfminer.
+"""
+
+import base64
+import io
+import logging
+import math
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+from xml.sax.saxutils import escape, quoteattr
+
+from pikepdf import Dictionary, Name, Page, Pdf, parse_content_stream
+
+from ocrworker import config
+
+settings = config.get_settings()
+logger = logging.getLogger(__name__)
+
+FORCE = "force"
+SKIP = "skip"
+AUTO = "auto"
+
+# minimal number of extracted characters for text layer to be usable
+MIN_CHARS = 20
+# minimal fraction of letters/digits in extracted text
+MIN_ALNUM_RATIO = 0.5
+# page with images covering more than this fraction of its area is
+# considered a scan (possibly with a few words of digital text on top)
+MAX_IMAGE_COVERAGE = 0.5
+# resolution of page image embedded in page.svg and used for page.jpg
+RENDER_DPI = 150
+
+TEXT_SHOW_OPERATORS = {"Tj", "TJ", "'", '"'}
+# fonts whose text can be extracted without /ToUnicode
+SIMPLE_ENCODINGS = {
+    "/WinAnsiEncoding",
+    "/MacRomanEncoding",
+    "/StandardEncoding",
+    "/PDFDocEncoding",
+}
+MAX_FORM_DEPTH = 8
+
+
+class PageContent(NamedTuple):
+    """What is drawn on the page (as found in its content stream)"""
+
+    # number of text show operators with visible text
+    visible_text_ops: int
+    # number of text show operators with invisible text (render mode 3)
+    # e.g. text layer of previously OCRed page
+    invisible_text_ops: int
+    # number of text show operators using fonts without usable encoding
+    unmapped_text_ops: int
+    # fraction of the page area covered by images (may exceed 1.0)
+    image_coverage: float
+    rotated: bool
+
+
+class Decision(NamedTuple):
+    """Whether OCR of the page can be skipped and why"""
+
+    use_text_layer: bool
+    reason: str
+
+
+def decide(page_file: Path, mode: str | None = None) -> Decision:
+    """Decides if OCR of one page pdf file can be skipped
+
+    - "force": page is always OCRed
+    - "skip": OCR is skipped for every page which has (visible) text
+    - "auto": OCR is skipped only if text layer is usable i.e. text
+      can be extracted, is not garbage and page is not a scan
+    """
+    mode = mode or settings.papermerge__ocr__text_layer
+    if mode == FORCE:
+        return Decision(False, "forced")
+
+    with Pdf.open(page_file) as pdf:
+        content = inspect_page(pdf.pages[0])
+
+    if content.rotated:
+        return Decision(False, "rotated page")
+
+    if content.visible_text_ops == 0:
+        if content.invisible_text_ops:
+            return Decision(False, "invisible text only")
+        return Decision(False, "no text")
+
+    if mode == SKIP:
+        return Decision(True, "has text")
+
+    if content.unmapped_text_ops > content.visible_text_ops / 2:
+        return Decision(False, "fonts without unicode mapping")
+
+    if content.image_coverage > MAX_IMAGE_COVERAGE:
+        return Decision(False, f"images cover {content.image_coverage:.0%}")
+
+    text = "".join(
+        word.text for line in extract_lines(page_file) for word in line.words
+    )
+    if len(text) < MIN_CHARS:
+        return Decision(False, f"too little text ({len(text)} chars)")
+
+    alnum_ratio = sum(char.isalnum() for char in text) / len(text)
+    if alnum_ratio < MIN_ALNUM_RATIO:
+        return Decision(False, f"garbled text ({alnum_ratio:.0%} alnum)")
+
+    return Decision(True, f"usable text ({len(text)} chars)")
+
+
+def inspect_page(page: Page) -> PageContent:
+    stats = {"visible": 0, "invisible": 0, "unmapped": 0, "image_area": 0.0}
+    _inspect(
+        page.obj,
+        page.obj.get("/Resources", Dictionary()),
+        ctm=(1, 0, 0, 1, 0, 0),
+        stats=stats,
+        depth=0,
+    )
+    x0, y0, x1, y1 = (float(v) for v in page.mediabox)
+    page_area = abs((x1 - x0) * (y1 - y0)) or 1
+
+    return PageContent(
+        visible_text_ops=stats["visible"],
+        invisible_text_ops=stats["invisible"],
+        unmapped_text_ops=stats["unmapped"],
+        image_coverage=stats["image_area"] / page_area,
+        rotated=int(page.obj.get("/Rotate", 0)) % 360 != 0,
+    )
+
+
+def _inspect(content, resources, ctm, stats: dict, depth: int) -> None:
+    fonts = resources.get("/Font", Dictionary())
+    xobjects = resources.get("/XObject", Dictionary())
+    ctm_stack = []
+    render_mode = 0
+    font_usable = True
+
+    for operands, operator in parse_content_stream(content):
+        op = str(operator)
+        if op == "q":
+            ctm_stack.append((ctm, render_mode, font_usable))
+        elif op == "Q" and ctm_stack:
+            ctm, render_mode, font_usable = ctm_stack.pop()
+        elif op == "cm":
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif op == "Tr":
+            render_mode = int(operands[0])
+        elif op == "Tf":
+            font_usable = is_font_usable(fonts.get(str(operands[0])))
+        elif op in TEXT_SHOW_OPERATORS:
+            if render_mode == 3:
+                stats["invisible"] += 1
+                continue
+            stats["visible"] += 1
+            if not font_usable:
+                stats["unmapped"] += 1
+        elif op == "BI":
+            # inline image, drawn into unit square
+            stats["image_area"] += _area(ctm)
+        elif op == "Do":
+            xobject = xobjects.get(str(operands[0]))
+            if xobject is None:
+                continue
+            subtype = xobject.get("/Subtype")
+            if subtype == Name.Image:
+                stats["image_area"] += _area(ctm)
+            elif subtype == Name.Form and depth < MAX_FORM_DEPTH:
+                matrix = xobject.get("/Matrix", [1, 0, 0, 1, 0, 0])
+                _inspect(
+                    xobject,
+                    xobject.get("/Resources", resources),
+                    ctm=_multiply(tuple(float(v) for v in matrix), ctm),
+                    stats=stats,
+                    depth=depth + 1,
+                )
+
+
+def is_font_usable(font) -> bool:
+    """True if text shown with the font can be mapped to unicode"""
+    if font is None:
+        return False
+
+    if "/ToUnicode" in font:
+        return True
+
+    if font.get("/Subtype") == Name.Type0:
+        # composite font without /ToUnicode: CIDs only
+        return False
+
+    encoding = font.get("/Encoding")
+    if encoding is None:
+        # standard 14 fonts have built in encoding
+        return font.get("/Subtype") == Name.Type1 and "/FontFile" not in (
+            font.get("/FontDescriptor", Dictionary())
+        )
+
+    if isinstance(encoding, Name):
+        return str(encoding) in SIMPLE_ENCODINGS
+
+    # encoding dictionary (/Differences on top of base encoding)
+    return str(encoding.get("/BaseEncoding", "/StandardEncoding")) in (
+        SIMPLE_ENCODINGS
+    )
+
+
+def _multiply(m1: tuple, m2: tuple) -> tuple:
+    """Product of two PDF transformation matrices (m1 x m2)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _area(ctm: tuple) -> float:
+    """Area of the unit square transformed by `ctm`"""
+    a, b, c, d, _, _ = ctm
+    return abs(a * d - b * c)
+
+
+class Word(NamedTuple):
+    text: str
+    # bbox in pixels (at RENDER_DPI), origin in top left corner
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+
+
+class Line(NamedTuple):
+    words: list[Word]
+    # index of the text block (paragraph) the line belongs to
+    block: int
+
+
+def extract_lines(page_file: Path) -> list[Line]:
+    """Text lines (with word positions) of one page pdf file"""
+    # pdfminer is slow to import; it is needed only for text pages
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTChar, LTTextBox, LTTextLine
+
+    scale = RENDER_DPI / 72
+    (page,) = extract_pages(page_file, maxpages=1)
+    x0, y0, _, y1 = page.bbox
+    height = y1 - y0
+
+    def word(chars: list) -> Word:
+        return Word(
+            text="".join(char.get_text() for char in chars),
+            x1=math.floor((min(c.x0 for c in chars) - x0) * scale),
+            y1=math.floor((height - max(c.y1 for c in chars) + y0) * scale),
+            x2=math.ceil((max(c.x1 for c in chars) - x0) * scale),
+            y2=math.ceil((height - min(c.y0 for c in chars) + y0) * scale),
+        )
+
+    lines = []
+    boxes = [item for item in page if isinstance(item, LTTextBox)]
+    for block, box in enumerate(boxes):
+        for text_line in box:
+            if not isinstance(text_line, LTTextLine):
+                continue
+            words, chars = [], []
+            for char in text_line:
+                if isinstance(char, LTChar) and not char.get_text().isspace():
+                    chars.append(char)
+                elif chars:
+                    words.append(word(chars))
+                    chars = []
+            if chars:
+                words.append(word(chars))
+            if words:
+                lines.append(Line(words=words, block=block))
+
+    return lines
+
+
+def extract(
+    page_file: Path, output_dir: Path, page_pdf_name: str, preview_width: int
+) -> None:
+    """Generates OCR results of the page from its text layer
+
+    Writes same files as OCR does: `page_pdf_name` (copy of the input),
+    page.txt, page.hocr, page.svg and page.jpg.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    lines = extract_lines(page_file)
+    image = render(page_file)
+
+    (output_dir / "page.txt").write_text(to_text(lines))
+    (output_dir / "page.hocr").write_text(to_hocr(lines, image.size))
+
+    jpeg = io.BytesIO()
+    image.convert("RGB").save(jpeg, quality=50, format="JPEG")
+    (output_dir / "page.svg").write_text(
+        to_svg(lines, image.size, base64.b64encode(jpeg.getvalue()).decode())
+    )
+
+    height = int(image.size[1] * preview_width / image.size[0])
+    preview = image.convert("RGB").resize((preview_width, height))
+    preview.save(output_dir / "page.jpg", quality=50, format="JPEG")
+    # last one: page pdf marks page as done (see `ocrworker.checkpoint`)
+    shutil.copy(page_file, output_dir / page_pdf_name)
+
+
+def render(page_file: Path):
+    """Rasterizes first page of the pdf file at RENDER_DPI"""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(page_file)
+    try:
+        return pdf[0].render(scale=RENDER_DPI / 72).to_pil()
+    finally:
+        pdf.close()
+
+
+def to_text(lines: list[Line]) -> str:
+    """Plain text with one blank line between text blocks"""
+    result = []
+    for index, line in enumerate(lines):
+        if index > 0 and line.block != lines[index - 1].block:
+            result.append("")
+        result.append(" ".join(word.text for word in line.words))
+
+    return "\n".join(result) + "\n"
+
+
+def to_hocr(lines: list[Line], size: tuple[int, int]) -> str:
+    width, height = size
+    body = []
+    for line_no, line in enumerate(lines, start=1):
+        words = []
+        for word_no, word in enumerate(line.words, start=1):
+            words.append(
+                f"<span class='ocrx_word' id='word_{line_no}_{word_no}'"
+                f" title='{_bbox(word)}; x_wconf 100'>"
+                f"{escape(word.text)}</span>"
+            )
+        body.append(
+            f"   <span class='ocr_line' id='line_{line_no}'"
+            f" title='{_bbox(_line_bbox(line))}'>{' '.join(words)}</span>"
+        )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml">\n'
+        " <head>\n"
+        "  <title></title>\n"
+        '  <meta http-equiv="Content-Type"'
+        ' content="text/html;charset=utf-8"/>\n'
+        "  <meta name='ocr-system' content='ocrworker text layer'/>\n"
+        "  <meta name='ocr-capabilities' content='ocr_page ocr_line"
+        " ocrx_word'/>\n"
+        " </head>\n"
+        " <body>\n"
+        f"  <div class='ocr_page' id='page_1' title='bbox 0 0 {width}"
+        f" {height}'>\n" + "\n".join(body) + "\n  </div>\n </body>\n</html>\n"
+    )
+
+
+def to_svg(lines: list[Line], size: tuple[int, int], base64_jpeg: str) -> str:
+    """SVG with embedded page image and transparent text overlay
+
+    Same structure as the one generated by ocrmypdf papermerge plugin.
+    """
+    width, height = size
+    texts = []
+    for line_no, line in enumerate(lines, start=1):
+        for word_no, word in enumerate(line.words, start=1):
+            texts.append(
+                f'    <text x="{word.x1}" y="{word.y2}"'
+                f' textLength="{word.x2 - word.x1}"'
+                f' font-size="{word.y2 - word.y1}"'
+                f' id="word_{line_no}_{word_no}" title="{_bbox(word)}"'
+                ' fill="transparent" opacity="0.4">'
+                f"{escape(word.text)}</text>"
+            )
+
+    return (
+        f'<svg viewBox="0 0 {width} {height}"'
+        ' xmlns="http://www.w3.org/2000/svg">\n'
+        '  <g id="image">\n'
+        f'    <image width="{width}"'
+        f" href={quoteattr('data:image/jpeg;base64,' + base64_jpeg)}/>\n"
+        "  </g>\n"
+        '  <g id="text">\n' + "\n".join(texts) + "\n  </g>\n</svg>\n"
+    )
+
+
+def _line_bbox(line: Line) -> Word:
+    return Word(
+        text="",
+        x1=min(word.x1 for word in line.words),
+        y1=min(word.y1 for word in line.words),
+        x2=max(word.x2 for word in line.words),
+        y2=max(word.y2 for word in line.words),
+    )
+
+
+def _bbox(word: Word) -> str:
+    return f"bbox {word.x1} {word.y1} {word.x2} {word.y2}"
@@ -1,9 +1,29 @@
+import hashlib
 import io
+import math
+import mimetypes
+import tempfile
+import uuid
+from collections import Counter
 from logging.config import dictConfig
 from pathlib import Path
 
+import img2pdf
 import yaml
-from pikepdf import Pdf
+from PIL import Image, ImageSequence
+from pikepdf import (
+    Array,
+    Dictionary,
+    Job,
+    Name,
+    Object,
+    ObjectStreamMode,
+    Pdf,
+    Stream,
+)
+
+PDF_TYPES = ("application/pdf", "application/image")
+IMAGE_TYPES = ("image/tiff", "image/jpeg", "image/png")
 
 
 def setup_logging(config: Path):
@@ -29,20 +49,293 @@ def get_pdf_page_count(content: io.BytesIO | bytes) -> int:
 
 def stitch_pdf(srcs: list[Path], dst: Path):
     """
-    Creates target pdf file by 'stitching' source (one page)
-    pdf files.
+    Creates target pdf file by 'stitching' source pdf files (all pages
+    of each source file, in order; sources are one page pdf files and
+    pre-stitched segments of consecutive pages).
 
-    Note that source files are assumed to have only one page.
     * stitch = combine, sew, put together
-    """
-    target = Pdf.new()
-    for src in srcs:
-        with Pdf.open(src) as f:
-            # source pdf files are assumed to have only one page
-            target.pages.append(f.pages[0])
 
+    Identical fonts and images (e.g. glyphless font which ocrmypdf embeds
+    in every OCRed page) are stored in the target file only once. Peak
+    memory is dominated by per-page metadata (page objects and digests of
+    their resources, kept for every page), not by stream data: pages are
+    first merged by qpdf, which reads stream data lazily, into temporary
+    file; the temporary file is then deduplicated and written to `dst`.
+    """
     if not dst.parent.exists():
         dst.parent.mkdir(parents=True, exist_ok=True)
 
-    target.save(dst)
-    target.close()
+    with tempfile.NamedTemporaryFile(dir=dst.parent, suffix=".pdf") as temp:
+        merge_pdf(srcs, Path(temp.name))
+        with Pdf.open(temp.name) as target:
+            dedupe_resources(target)
+            # `dst` is either complete or absent
+            tmp_dst = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}")
+            try:
+                target.save(
+                    tmp_dst,
+                    object_stream_mode=ObjectStreamMode.generate,
+                    compress_streams=True,
+                )
+                tmp_dst.rename(dst)
+            finally:
+                tmp_dst.unlink(missing_ok=True)
+
+
+def merge_pdf(srcs: list[Path], dst: Path):
+    """Merges all pages of the source files into `dst` (with qpdf)"""
+    args = ["qpdf", "--empty", "--pages"]
+    for src in srcs:
+        args.extend([str(src), "1-z"])
+    args.extend(["--", str(dst)])
+
+    Job(args).run()
+
+
+def dedupe_resources(pdf: Pdf) -> int:
+    """
+    Makes all pages share identical fonts and XObjects (e.g. images).
+
+    Objects are compared by content. Duplicates are not referenced anymore
+    and thus are not written when `pdf` is saved. Returns number of
+    replaced references.
+    """
+    # (resources dict, key, object) of all pages
+    entries = []
+    for page in pdf.pages:
+        resources = page.obj.get(Name.Resources)
+        if resources is None:
+            continue
+        for category in (Name.Font, Name.XObject):
+            objects = resources.get(category)
+            if objects is None:
+                continue
+            for key in objects.keys():
+                if objects[key].is_indirect:
+                    entries.append((objects, key, objects[key]))
+
+    # Cheap digest first (without stream data, but with stream length).
+    # Stream data is read and hashed only for objects which have
+    # the same cheap digest i.e. are likely to be duplicates.
+    shape_digests = {}
+    shapes = Counter(
+        _object_digest(obj, shape_digests, with_data=False)
+        for _, _, obj in entries
+    )
+    digests = {}
+    canonical = {}
+    replaced = 0
+    for objects, key, obj in entries:
+        shape = _object_digest(obj, shape_digests, with_data=False)
+        if shapes[shape] < 2:
+            continue
+        first = canonical.setdefault(_object_digest(obj, digests), obj)
+        if first.objgen != obj.objgen:
+            objects[key] = first
+            replaced += 1
+
+    return replaced
+
+
+def _object_digest(
+    obj, digests: dict, visiting: set | None = None, with_data: bool = True
+) -> str:
+    """Hash of the object's content (including all objects it refers to)
+
+    If `with_data` is False, stream data is not hashed (only its length).
+    `digests` memoizes results by object ID and generation.
+    """
+    if not isinstance(obj, Object):
+        # pikepdf converts scalars (e.g. numbers, booleans) to python types
+        return f"{type(obj).__name__}:{obj!r}"
+
+    if visiting is None:
+        visiting = set()
+
+    objgen = obj.objgen if obj.is_indirect else None
+    if objgen in digests:
+        return digests[objgen]
+    if objgen in visiting:
+        # reference cycle
+        return f"cycle:{objgen}"
+    if objgen is not None:
+        visiting.add(objgen)
+
+    digest = hashlib.sha256()
+    if isinstance(obj, (Dictionary, Stream)):
+        digest.update(b"stream" if isinstance(obj, Stream) else b"dict")
+        for key in sorted(obj.keys()):
+            if key == "/Length" and with_data:
+                continue
+            digest.update(key.encode())
+            digest.update(
+                _object_digest(obj[key], digests, visiting, with_data).encode()
+            )
+        if isinstance(obj, Stream) and with_data:
+            digest.update(obj.read_raw_bytes())
+    elif isinstance(obj, Array):
+        digest.update(b"array")
+        for item in obj:
+            digest.update(
+                _object_digest(item, digests, visiting, with_data).encode()
+            )
+    else:
+        digest.update(obj.unparse())
+
+    result = digest.hexdigest()
+    if objgen is not None:
+        visiting.discard(objgen)
+        digests[objgen] = result
+
+    return result
+
+
+def file_digest(path: Path) -> str:
+    """Returns sha256 hex digest of the file content"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def split_pdf(src: Path, dst_dir: Path) -> list[Path]:
+    """
+    Writes each page of the source pdf file as separate (one page)
+    pdf file in `dst_dir`.
+
+    Source file is opened only once. Returns paths of the one page pdf
+    files ordered by page number; file names are zero padded page
+    numbers e.g. "000001.pdf", "000002.pdf".
+    """
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    result = []
+    with Pdf.open(src) as pdf:
+        for number, page in enumerate(pdf.pages, start=1):
+            dst = Pdf.new()
+            dst.pages.append(page)
+            path = dst_dir / f"{number:06d}.pdf"
+            dst.save(path, deterministic_id=True)
+            dst.close()
+            result.append(path)
+
+    return result
+
+
+def is_image(path: Path | str) -> bool:
+    mime_type, _ = mimetypes.guess_type(path)
+    return mime_type in IMAGE_TYPES
+
+
+def target_file_name(file_name: str) -> str:
+    """Name of the file of OCRed document version
+
+    OCRed document version is always a pdf file, thus for images (e.g.
+    "scan.tiff") extension is changed to ".pdf".
+    """
+    if is_image(file_name):
+        return str(Path(file_name).with_suffix(".pdf"))
+
+    return file_name
+
+
+def split_document(src: Path, dst_dir: Path) -> list[Path]:
+    """Writes each page of the pdf file or image as one page pdf file
+
+    See `split_pdf` and `split_image`.
+    """
+    if is_image(src):
+        return split_image(src, dst_dir)
+
+    return split_pdf(src, dst_dir)
+
+
+def split_image(src: Path, dst_dir: Path) -> list[Path]:
+    """
+    Writes each frame of the image (e.g. page of multi-page TIFF) as
+    separate (one page) pdf file in `dst_dir`.
+
+    Frames are decoded one by one i.e. at most one frame is held in
+    memory. JPEG files are embedded as they are (without re-encoding).
+    File names are same as with `split_pdf`.
+    """
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    result = []
+    with Image.open(src) as image:
+        for number, frame in enumerate(ImageSequence.Iterator(image), start=1):
+            if image.format == "JPEG":
+                data = img2pdf.convert(src.read_bytes())
+            else:
+                data = img2pdf.convert(_encode_frame(frame))
+            path = dst_dir / f"{number:06d}.pdf"
+            path.write_bytes(data)
+            result.append(path)
+
+    return result
+
+
+def _encode_frame(frame: Image.Image) -> bytes:
+    """Encodes one frame losslessly in a format embeddable by img2pdf"""
+    if frame.mode in ("RGBA", "LA", "PA") or (
+        frame.mode == "P" and "transparency" in frame.info
+    ):
+        # pdf images have no alpha channel
+        frame = frame.convert("RGB")
+    elif frame.mode not in ("1", "L", "RGB", "CMYK", "P"):
+        # e.g. 16 bit grayscale
+        frame = frame.convert("L" if frame.mode.startswith("I") else "RGB")
+
+    buffer = io.BytesIO()
+    params = {}
+    if "dpi" in frame.info:
+        params["dpi"] = frame.info["dpi"]
+    if frame.mode == "1":
+        # bilevel scans: CCITT G4 is embedded by img2pdf as is
+        frame.save(buffer, format="TIFF", compression="group4", **params)
+    else:
+        frame.save(buffer, format="PNG", **params)
+
+    return buffer.getvalue()
+
+
+def page_chunk_size(
+    page_count: int,
+    concurrency: int,
+    min_size: int = 1,
+    max_size: int | None = None,
+) -> int:
+    """
+    Returns number of pages to OCR in one task.
+
+    Pages are spread evenly over `concurrency` worker processes, but each
+    chunk has at least `min_size` pages (so that short documents are
+    processed by one task) and at most `max_size` pages (so that long
+    documents are still distributed over the whole cluster).
+    """
+    size = math.ceil(page_count / max(concurrency, 1))
+    size = max(size, min_size, 1)
+    if max_size:
+        size = min(size, max_size)
+
+    return size
+
+
+def split_evenly(items: list, parts: int) -> list[list]:
+    """Splits `items` into (at most) `parts` consecutive lists of almost
+    equal length"""
+    size, rest = divmod(len(items), parts)
+    result = []
+    start = 0
+    for index in range(min(parts, len(items))):
+        stop = start + size + (1 if index < rest else 0)
+        result.append(items[start:stop])
+        start = stop
+
+    return result
+
+
+def chunks(items: list, size: int) -> list[list]:
+    """Splits `items` into consecutive chunks of (at most) `size` items"""
+    result = []
+    for start in range(0, len(items), size):
+        stop = start + size
+        result.append(items[start:stop])
+
+    return result
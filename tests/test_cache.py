@@ -0,0 +1,104 @@
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+from ocrworker import cache, config
+
+
+@pytest.fixture()
+def media_root(tmp_path, monkeypatch):
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "papermerge__main__media_root", tmp_path)
+    monkeypatch.setattr(settings, "papermerge__cache__dir", None)
+
+    return tmp_path
+
+
+def write(media_root: Path, rel_path: str, size: int) -> Path:
+    path = media_root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+    return Path(rel_path)
+
+
+def test_lookup_validates_size(media_root):
+    rel_path = write(media_root, "docvers/ab/cd/abcd/doc.pdf", 10)
+
+    assert cache.lookup(rel_path) is False
+
+    cache.register(rel_path, etag='"123"')
+
+    assert cache.lookup(rel_path) is True
+    assert cache.get_etag(rel_path) == '"123"'
+
+    # file changed behind cache's back
+    write(media_root, str(rel_path), 11)
+
+    assert cache.lookup(rel_path) is False
+
+
+def test_enforce_budget_evicts_least_recently_used(media_root, monkeypatch):
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "papermerge__cache__max_size", 25)
+    monkeypatch.setattr(settings, "papermerge__cache__min_age", 0)
+
+    old = write(media_root, "ocr/pages/aa/bb/aabb/page.pdf", 10)
+    cache.register(old)
+    recent = write(media_root, "ocr/pages/cc/dd/ccdd/page.pdf", 10)
+    cache.register(recent)
+    newest = write(media_root, "docvers/ee/ff/eeff/doc.pdf", 10)
+    cache.register(newest)
+    # mark `old` as most recently used one
+    cache.touch(old)
+
+    freed = cache.enforce_budget(force=True)
+
+    assert freed == 10
+    assert (media_root / old).exists()
+    assert not (media_root / recent).exists()
+    # empty parent folders are removed as well
+    assert not os.path.exists(media_root / "ocr/pages/cc")
+    assert (media_root / newest).exists()
+
+
+def test_ocr_cache_store_and_restore(media_root):
+    from ocrworker import ocr_cache, plib
+
+    page_id, other_page_id = uuid.uuid4(), uuid.uuid4()
+    page_file = media_root / "page.pdf"
+    page_file.write_bytes(b"%PDF-1.7")
+    key = ocr_cache.cache_key(page_file, {"lang": "deu"})
+    for name in ("page.pdf", "page.txt"):
+        write(media_root, str(plib.page_path(page_id) / name), 5)
+
+    assert ocr_cache.restore(key, other_page_id) is False
+
+    ocr_cache.store(key, page_id)
+
+    assert ocr_cache.restore(key, other_page_id) is True
+    restored = {p.name for p in plib.abs_page_path(other_page_id).iterdir()}
+    assert restored == {"page.pdf", "page.txt"}
+    # other OCR parameters i.e. other key
+    assert ocr_cache.cache_key(page_file, {"lang": "eng"}) != key
+
+
+def test_ocr_cache_skips_incomplete_entry(media_root, monkeypatch):
+    from ocrworker import ocr_cache, plib, s3
+
+    settings = config.get_settings()
+    monkeypatch.setattr(settings, "papermerge__ocr__result_cache", ocr_cache.S3)
+    key = "0" * 64
+
+    def download_dir(rel_dir_path, target_dir):
+        # marker is listed, but page.txt was not uploaded yet
+        (target_dir / "page.pdf").write_bytes(b"%PDF-1.7")
+        (target_dir / ocr_cache.MARKER).write_text('["page.pdf", "page.txt"]')
+        return 2
+
+    monkeypatch.setattr(s3, "download_dir", download_dir)
+
+    assert ocr_cache.restore(key, uuid.uuid4()) is False
+    assert not plib.abs_ocr_cache_path(key).exists()
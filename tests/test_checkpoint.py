@@ -0,0 +1,58 @@
+import uuid
+
+from ocrworker import checkpoint, plib
+from ocrworker import constants as const
+
+
+def test_target_ids_are_deterministic():
+    doc_ver_id = uuid.uuid4()
+    params = {"lang": "deu", "preview_width": 300}
+
+    first = checkpoint.target_ids(doc_ver_id, 3, params)
+    second = checkpoint.target_ids(doc_ver_id, 3, dict(params))
+    other_lang = checkpoint.target_ids(doc_ver_id, 3, {**params, "lang": "eng"})
+
+    assert first == second
+    assert len(set(first[1])) == 3
+    assert other_lang[0] != first[0]
+    assert not set(other_lang[1]) & set(first[1])
+
+
+def test_missing_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        checkpoint.settings, "papermerge__main__media_root", tmp_path
+    )
+    monkeypatch.setattr(checkpoint.s3, "is_enabled", lambda: False)
+    page_ids = [uuid.uuid4() for _ in range(3)]
+    done_dir = plib.abs_page_path(page_ids[1])
+    done_dir.mkdir(parents=True)
+    (done_dir / const.PAGE_PDF).write_bytes(b"%PDF")
+    # sidecar files without page.pdf: interrupted OCR
+    plib.abs_page_path(page_ids[2]).mkdir(parents=True)
+    plib.abs_page_txt_path(page_ids[2]).write_text("text")
+
+    assert checkpoint.missing_pages(page_ids) == [page_ids[0], page_ids[2]]
+
+
+def test_engine_changes_cache_key_and_target_ids(tmp_path, monkeypatch):
+    from ocrworker import ocr_cache, tasks
+
+    page_file = tmp_path / "page.pdf"
+    page_file.write_bytes(b"%PDF-1.7")
+    doc_ver_id = uuid.uuid4()
+
+    def ids_and_key():
+        params = tasks.result_params("deu", 300)
+        return (
+            checkpoint.target_ids(doc_ver_id, 3, params),
+            ocr_cache.cache_key(page_file, params),
+        )
+
+    monkeypatch.setattr(tasks.settings, "papermerge__ocr__engine", "tesseract")
+    tesseract_ids, tesseract_key = ids_and_key()
+    monkeypatch.setattr(tasks.settings, "papermerge__ocr__engine", "tesserocr")
+    tesserocr_ids, tesserocr_key = ids_and_key()
+
+    assert tesseract_key != tesserocr_key
+    assert tesseract_ids[0] != tesserocr_ids[0]
+    assert not set(tesseract_ids[1]) & set(tesserocr_ids[1])
@@ -0,0 +1,82 @@
+import uuid
+
+from celery import signature
+from kombu.utils import json
+
+from ocrworker import coordination, tasks
+
+
+def test_tail_survives_serialization():
+    target_docver_id = uuid.uuid4()
+    target_page_ids = [uuid.uuid4(), uuid.uuid4()]
+    tail = tasks.tail_tasks(
+        document_id=str(uuid.uuid4()),
+        doc_ver_id=uuid.uuid4(),
+        lang="deu",
+        target_docver_id=target_docver_id,
+        target_page_ids=target_page_ids,
+        params={"lang": "deu"},
+    )
+
+    restored = signature(json.loads(json.dumps(dict(tail))))
+
+    stitch = restored.tasks[0]
+    assert [task.task for task in restored.tasks] == [
+        task.task for task in tail.tasks
+    ]
+    assert stitch.kwargs["target_docver_id"] == target_docver_id
+    assert stitch.kwargs["target_page_ids"] == target_page_ids
+    assert stitch.options["queue"] == tail.tasks[0].options["queue"]
+
+
+def test_run_tail_routes_stitching_to_node(monkeypatch):
+    tail = tasks.tail_tasks(
+        document_id=str(uuid.uuid4()),
+        doc_ver_id=uuid.uuid4(),
+        lang="deu",
+        target_docver_id=uuid.uuid4(),
+        target_page_ids=[uuid.uuid4()],
+        params={"lang": "deu"},
+    )
+    restored = signature(json.loads(json.dumps(dict(tail))))
+    published = []
+    monkeypatch.setattr(
+        type(restored), "apply_async", lambda self, **kw: published.append(kw)
+    )
+
+    monkeypatch.setattr(coordination, "is_alive", lambda node: True)
+
+    coordination.run_tail(restored, node="ocr-2")
+
+    assert published == [{"args": (None,)}]
+    assert restored.tasks[0].options["queue"].endswith("ocr_node_ocr-2")
+    assert not restored.tasks[1].options["queue"].endswith("ocr-2")
+
+
+def test_run_tail_skips_gone_node(monkeypatch):
+    tail = tasks.tail_tasks(
+        document_id=str(uuid.uuid4()),
+        doc_ver_id=uuid.uuid4(),
+        lang="deu",
+        target_docver_id=uuid.uuid4(),
+        target_page_ids=[uuid.uuid4()],
+        params={"lang": "deu"},
+    )
+    monkeypatch.setattr(type(tail), "apply_async", lambda self, **kw: None)
+    monkeypatch.setattr(coordination, "is_alive", lambda node: False)
+
+    coordination.run_tail(tail, node="ocr-2")
+
+    assert tail.tasks[0].options["queue"] == tasks.prefixed("ocr")
+
+
+def test_key_is_per_workflow():
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    assert coordination.key(first, "done") != coordination.key(second, "done")
+    assert coordination.key(first, "done").endswith(f"{first}:done")
+
+
+def test_stitching_goes_to_node_with_most_pages():
+    assert coordination.best_node({"a": 3, "b": 10, "c": 10}) == "b"
+    assert coordination.best_node({}) is None
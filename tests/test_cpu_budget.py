@@ -0,0 +1,24 @@
+import os
+
+from ocrworker import cpu_budget
+
+
+def test_threads_per_process():
+    assert cpu_budget.threads_per_process(budget=8, concurrency=8) == 1
+    assert cpu_budget.threads_per_process(budget=8, concurrency=2) == 4
+    assert cpu_budget.threads_per_process(budget=8, concurrency=3) == 2
+    # more processes than CPUs
+    assert cpu_budget.threads_per_process(budget=2, concurrency=4) == 1
+
+
+def test_init_process_splits_budget(monkeypatch):
+    monkeypatch.setattr(cpu_budget.settings, "papermerge__ocr__cpu_budget", 12)
+    monkeypatch.setattr(cpu_budget, "_threads", None)
+    monkeypatch.setenv("OMP_THREAD_LIMIT", "")
+    cpu_budget.set_concurrency(4)
+    try:
+        assert cpu_budget.init_process() == 3
+        assert cpu_budget.get_threads() == 3
+        assert os.environ["OMP_THREAD_LIMIT"] == "3"
+    finally:
+        cpu_budget.set_concurrency(None)
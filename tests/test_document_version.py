@@ -2,6 +2,7 @@ import io
 import uuid
 
 from ocrworker import db
+from ocrworker.db.orm import DocumentVersion
 
 
 def test_increment_doc_version(db_session, doc_factory):
@@ -29,6 +30,60 @@ def test_increment_doc_version(db_session, doc_factory):
     assert new_ids == set(target_page_uuids)
 
 
+def test_increment_doc_version_is_idempotent(db_session, doc_factory):
+    doc = doc_factory(title="receipt_001.pdf", page_count=2)
+    target_docver_uuid = uuid.uuid4()
+    target_page_uuids = [uuid.uuid4(), uuid.uuid4()]
+
+    for _ in range(2):
+        db.increment_doc_ver(
+            db_session,
+            document_id=doc.id,
+            target_docver_uuid=target_docver_uuid,
+            target_page_uuids=target_page_uuids,
+            lang=doc.lang,
+        )
+
+    last_ver = db.get_last_version(db_session, doc.id)
+
+    assert last_ver.id == target_docver_uuid
+    assert last_ver.number == 2
+
+
+def test_increment_doc_version_with_page_langs(db_session, doc_factory):
+    doc = doc_factory(title="receipt_001.pdf", page_count=2)
+    target_docver_uuid = uuid.uuid4()
+
+    db.increment_doc_ver(
+        db_session,
+        document_id=doc.id,
+        target_docver_uuid=target_docver_uuid,
+        target_page_uuids=[uuid.uuid4(), uuid.uuid4()],
+        lang="deu+eng",
+        page_langs=["eng", None],
+    )
+
+    pages = db.get_pages(db_session, target_docver_uuid)
+
+    assert [page.lang for page in pages] == ["eng", "deu+eng"]
+
+
+def test_get_previous_version(db_session, doc_factory):
+    doc = doc_factory(title="receipt_001.pdf", page_count=2)
+    first = db.get_last_version(db_session, doc.id)
+    db.increment_doc_ver(
+        db_session,
+        document_id=doc.id,
+        target_docver_uuid=uuid.uuid4(),
+        target_page_uuids=[uuid.uuid4(), uuid.uuid4()],
+        lang=doc.lang,
+    )
+    second = db.get_last_version(db_session, doc.id)
+
+    assert db.get_previous_version(db_session, second.id).id == first.id
+    assert db.get_previous_version(db_session, first.id) is None
+
+
 def test_update_doc_ver_text(db_session, doc_ver_factory):
     doc_ver = doc_ver_factory(
         title="receipt_001.pdf",
@@ -48,5 +103,22 @@ def test_update_doc_ver_text(db_session, doc_ver_factory):
     pages = db.get_pages(db_session, doc_ver.id)
     actual_txt = {page.text for page in pages}
     expected_txt = {"Updated text of page 1", "Updated text of page 2"}
+    db_doc_ver = db_session.get(DocumentVersion, doc_ver.id)
 
     assert actual_txt == expected_txt
+    assert db_doc_ver.text == "Updated text of page 1\nUpdated text of page 2"
+
+
+def test_update_pages_text_in_batches(db_session, doc_ver_factory):
+    doc_ver = doc_ver_factory(title="receipt_001.pdf", page_count=3)
+    pages = db.get_pages(db_session, doc_ver.id)
+
+    db.update_pages_text(db_session, {pages[0].id: "one", pages[1].id: "two"})
+    db.update_pages_text(db_session, {pages[2].id: "three"})
+    db.update_doc_ver_aggregate_text(db_session, doc_ver.id, ["one", "two"])
+    db_session.commit()
+
+    pages = db.get_pages(db_session, doc_ver.id)
+
+    assert [page.text for page in pages] == ["one", "two", "three"]
+    assert db_session.get(DocumentVersion, doc_ver.id).text == "one\ntwo"
@@ -0,0 +1,74 @@
+import uuid
+
+from pikepdf import Pdf
+
+from ocrworker import config, incremental, utils
+from tests.test_text_layer import make_scan_page, make_text_page
+
+
+def make_ocred_pages(tmp_path, texts: list[str]):
+    paths = []
+    for number, text in enumerate(texts, start=1):
+        path = tmp_path / f"page-{number}.pdf"
+        make_text_page(path, text=text)
+        paths.append(path)
+
+    return paths
+
+
+def test_fingerprint_survives_stitch_and_page_edits(tmp_path):
+    pages = make_ocred_pages(tmp_path, ["first", "second", "third"])
+    stitched = tmp_path / "ocred.pdf"
+    utils.stitch_pdf(srcs=pages, dst=stitched)
+    # new version: second page removed, pages reordered, new page added
+    make_text_page(tmp_path / "new.pdf", text="new")
+    with Pdf.open(stitched) as pdf, Pdf.open(tmp_path / "new.pdf") as new:
+        pdf.pages.append(new.pages[0])
+        del pdf.pages[1]
+        pdf.pages.reverse()
+        pdf.save(tmp_path / "edited.pdf", compress_streams=False)
+
+    split = utils.split_pdf(tmp_path / "edited.pdf", tmp_path / "split")
+    expected = [incremental.page_fingerprint(path) for path in pages]
+    actual = [incremental.page_fingerprint(path) for path in split]
+
+    assert actual[1:] == [expected[2], expected[0]]
+    assert actual[0] not in expected
+
+
+def test_fingerprint_depends_on_content(tmp_path):
+    make_text_page(tmp_path / "a.pdf", text="same")
+    make_text_page(tmp_path / "b.pdf", text="same")
+    make_text_page(tmp_path / "c.pdf", text="other")
+    make_scan_page(tmp_path / "d.pdf", text="same")
+
+    a, b, c, d = (
+        incremental.page_fingerprint(tmp_path / f"{name}.pdf")
+        for name in "abcd"
+    )
+
+    assert a == b
+    assert len({a, c, d}) == 3
+
+
+def test_manifest_requires_same_params(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        config.get_settings(), "papermerge__main__media_root", tmp_path
+    )
+    monkeypatch.setattr(incremental.s3, "is_enabled", lambda: False)
+    pages = make_ocred_pages(tmp_path, ["first", "second"])
+    docver_id, page_ids = uuid.uuid4(), [uuid.uuid4(), uuid.uuid4()]
+
+    utils.stitch_pdf(srcs=pages, dst=tmp_path / "ocred.pdf")
+
+    incremental.write_manifest(
+        docver_id, page_ids, tmp_path / "ocred.pdf", {"lang": "deu"}
+    )
+    same = incremental.load_manifest(docver_id, {"lang": "deu"})
+    other = incremental.load_manifest(docver_id, {"lang": "eng"})
+
+    assert same == {
+        incremental.page_fingerprint(page): str(page_id)
+        for page, page_id in zip(pages, page_ids)
+    }
+    assert other == {}
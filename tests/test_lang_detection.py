@@ -0,0 +1,53 @@
+from ocrworker import lang_detection
+
+GERMAN = (
+    "Sehr geehrte Damen und Herren, die Rechnung ist nicht bezahlt. Wir"
+    " bitten Sie, den Betrag auf das Konto der Firma zu überweisen."
+)
+ENGLISH = (
+    "Dear customer, the invoice is not paid yet. Please transfer the amount"
+    " to the account of the company and send us the receipt."
+)
+ROMANIAN = (
+    "Factura nu este plătită. Vă rugăm să transferați suma în contul firmei"
+    " și să ne trimiteți chitanța care confirmă plata pentru servicii."
+)
+
+
+def test_choose_german():
+    result = lang_detection.choose(GERMAN, ["deu", "eng", "ron"])
+
+    assert result == ["deu"]
+
+
+def test_choose_romanian_with_diacritics():
+    result = lang_detection.choose(ROMANIAN, ["deu", "eng", "ron"])
+
+    assert result == ["ron"]
+
+
+def test_choose_keeps_all_languages_of_mixed_text():
+    result = lang_detection.choose(f"{GERMAN} {ENGLISH}", ["deu", "eng", "ron"])
+
+    assert result == ["deu", "eng"]
+
+
+def test_choose_keeps_candidates_if_text_is_too_short():
+    result = lang_detection.choose("Total 12,50", ["deu", "eng"])
+
+    assert result == ["deu", "eng"]
+
+
+def test_choose_keeps_languages_without_stop_words():
+    result = lang_detection.choose(ENGLISH, ["deu", "eng", "tur"])
+
+    assert result == ["eng", "tur"]
+
+
+def test_detect_from_text():
+    assert lang_detection.detect_from_text(ENGLISH, "deu+eng") == "eng"
+
+
+def test_detect_single_language(tmp_path):
+    # nothing to detect, page is not even read
+    assert lang_detection.detect(tmp_path / "page.pdf", "deu") == "deu"
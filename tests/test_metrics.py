@@ -0,0 +1,90 @@
+import json
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+from ocrworker import metrics
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics.settings, "papermerge__metrics__port", 0)
+    monkeypatch.setattr(
+        metrics.settings, "papermerge__metrics__host", "127.0.0.1"
+    )
+    monkeypatch.setattr(metrics.settings, "papermerge__metrics__dir", tmp_path)
+    monkeypatch.setattr(metrics, "_node_name", None)
+    metrics.reset()
+    yield tmp_path
+    metrics.reset()
+
+
+def test_histogram_and_counters_are_rendered(enabled):
+    metrics.observe(metrics.STAGE_SECONDS, 0.07, stage="ocr")
+    metrics.observe(metrics.STAGE_SECONDS, 400, stage="ocr")
+    metrics.inc(metrics.PAGES, 2, stage="ocr")
+
+    text = metrics.render([metrics.snapshot()])
+
+    assert 'ocrworker_pages_total{stage="ocr"} 2' in text
+    assert 'ocrworker_stage_seconds_bucket{stage="ocr",le="0.05"} 0' in text
+    assert 'ocrworker_stage_seconds_bucket{stage="ocr",le="0.1"} 1' in text
+    assert 'ocrworker_stage_seconds_bucket{stage="ocr",le="+Inf"} 2' in text
+    assert 'ocrworker_stage_seconds_count{stage="ocr"} 2' in text
+
+
+def test_snapshots_of_worker_processes_are_summed(enabled):
+    metrics.inc(metrics.BYTES, 100, direction="upload")
+    with metrics.timer(metrics.STAGE_SECONDS, stage="stitch"):
+        pass
+    other_process = metrics.snapshot()
+    (enabled / "1-1.json").write_text(json.dumps(other_process))
+    metrics.flush()
+
+    server = metrics.start_http_server()
+    try:
+        # snapshots of previous run are removed on start
+        assert list(enabled.glob("*.json")) == []
+        (enabled / "1-1.json").write_text(json.dumps(other_process))
+        host, port = server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as resp:
+            text = resp.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'ocrworker_bytes_total{direction="upload"} 200' in text
+    assert 'ocrworker_stage_seconds_count{stage="stitch"} 2' in text
+
+
+def test_snapshots_of_exited_processes_are_folded(enabled):
+    metrics.inc(metrics.PAGES, 3, stage="ocr")
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    for name in (f"{process.pid}-1", f"{process.pid}-2"):
+        (enabled / f"{name}.json").write_text(json.dumps(metrics.snapshot()))
+
+    text = metrics.render(metrics.read_snapshots())
+    # retired snapshot is kept, i.e. counters never go backwards
+    text_after_next_read = metrics.render(metrics.read_snapshots())
+
+    assert [path.name for path in enabled.glob("*.json")] == ["retired.json"]
+    assert 'ocrworker_pages_total{stage="ocr"} 9' in text
+    assert text_after_next_read == text
+
+
+def test_workers_sharing_host_have_own_folders(enabled):
+    other_worker = enabled / "celery2_ocr-1"
+    other_worker.mkdir()
+    (other_worker / "1-1.json").write_text("{}")
+
+    server = metrics.start_http_server("celery1@ocr-1")
+    server.shutdown()
+    server.server_close()
+    metrics.flush()
+
+    assert (enabled / "celery1@ocr-1").is_dir()
+    assert list((enabled / "celery1@ocr-1").glob("*.json")) != []
+    assert (other_worker / "1-1.json").exists()
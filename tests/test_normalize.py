@@ -0,0 +1,67 @@
+import io
+
+import img2pdf
+import pytest
+from PIL import Image
+
+from ocrworker import normalize
+
+
+def make_page(path, size=(2480, 3508), dpi=600, mode="RGB"):
+    """One page pdf with page sized image of given DPI"""
+    buffer = io.BytesIO()
+    Image.new(mode, size, color="white").save(buffer, "PNG", dpi=(dpi, dpi))
+    path.write_bytes(img2pdf.convert(buffer.getvalue()))
+
+
+def test_measure(tmp_path):
+    page_file = tmp_path / "page.pdf"
+    make_page(page_file, dpi=600)
+
+    page_image = normalize.measure(page_file)
+
+    assert round(page_image.dpi) == 600
+    assert page_image.components == 3
+    assert page_image.bpc == 8
+    assert page_image.scale == pytest.approx(0.5)
+
+
+def test_measure_low_dpi(tmp_path):
+    page_file = tmp_path / "page.pdf"
+    make_page(page_file, size=(620, 877), dpi=150, mode="L")
+
+    page_image = normalize.measure(page_file)
+
+    assert page_image.components == 1
+    assert page_image.scale == 1
+
+
+def test_normalize_downsamples_to_target_dpi():
+    image = Image.new("RGB", (2480, 3508), color=(250, 240, 230))
+    image.info["dpi"] = (600.0, 600.0)
+
+    result = normalize.normalize(image)
+
+    assert result.mode == "L"
+    assert result.size == (1240, 1754)
+    assert result.info["dpi"] == (300.0, 300.0)
+
+
+def test_normalize_two_levels_become_bitonal():
+    image = Image.new("L", (300, 300), color=230)
+    image.paste(20, (100, 100, 200, 200))
+    image.info["dpi"] = (300.0, 300.0)
+
+    result = normalize.normalize(image)
+
+    assert result.mode == "1"
+    assert result.getpixel((0, 0)) == 255
+    assert result.getpixel((150, 150)) == 0
+    assert result.info["dpi"] == (300.0, 300.0)
+
+
+def test_filter_ocr_image_keeps_bitonal_image_at_target_dpi():
+    image = Image.new("1", (100, 100))
+    image.info["dpi"] = (300, 300)
+
+    assert normalize.filter_ocr_image(None, image) is None
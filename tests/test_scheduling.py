@@ -0,0 +1,43 @@
+from ocrworker import scheduling
+
+
+def test_size_class():
+    assert scheduling.size_class(1) == scheduling.SMALL
+    assert scheduling.size_class(10) == scheduling.SMALL
+    assert scheduling.size_class(11) == scheduling.LARGE
+
+
+def test_ocr_queue():
+    assert scheduling.ocr_queue(3).endswith("ocr")
+    assert scheduling.ocr_queue(2000).endswith("ocr_large")
+
+
+def test_smaller_documents_have_higher_priority():
+    priorities = [scheduling.ocr_priority(n) for n in (1, 2, 5, 10)]
+
+    assert priorities == [0, 1, 2, 3]
+    assert scheduling.tail_priority() == scheduling.HIGHEST_PRIORITY
+
+
+def test_large_documents_are_fifo():
+    assert scheduling.ocr_priority(20) == scheduling.ocr_priority(2000)
+
+
+def test_node_queue(monkeypatch):
+    monkeypatch.setattr(
+        scheduling.settings, "papermerge__main__node_name", "ocr-1.local"
+    )
+
+    assert scheduling.node_name() == "ocr-1.local"
+    assert scheduling.node_queue("ocr 1").endswith("ocr_node_ocr_1")
+
+    monkeypatch.setattr(scheduling.settings, "papermerge__ocr__locality", False)
+    assert scheduling.node_queue("ocr-1") is None
+
+
+def test_worker_queues(monkeypatch):
+    monkeypatch.setattr(scheduling.settings, "papermerge__ocr__locality", False)
+
+    assert scheduling.worker_queues({"ocr"}) == ["ocr_large"]
+    assert scheduling.worker_queues({"ocr", "ocr_large"}) == []
+    assert scheduling.worker_queues({"s3preview"}) == []
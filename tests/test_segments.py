@@ -0,0 +1,67 @@
+import os
+import time
+import uuid
+
+from pikepdf import Pdf
+
+from ocrworker import config, plib, segments, utils
+from ocrworker import constants as const
+from tests.test_text_layer import make_text_page
+
+
+def make_pages(count: int) -> list[uuid.UUID]:
+    page_ids = [uuid.uuid4() for _ in range(count)]
+    for number, page_id in enumerate(page_ids, start=1):
+        page_dir = plib.abs_page_path(page_id)
+        page_dir.mkdir(parents=True)
+        make_text_page(page_dir / const.PAGE_PDF, text=f"page {number}")
+
+    return page_ids
+
+
+def test_stitching_joins_segments_and_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        config.get_settings(), "papermerge__main__media_root", tmp_path
+    )
+    docver_id = uuid.uuid4()
+    page_ids = make_pages(6)
+    pages = list(enumerate(page_ids, start=1))
+
+    first = segments.build(docver_id, pages[0:3])
+    # chunk of pages which are not consecutive
+    skipped = segments.build(docver_id, [pages[3], pages[5]])
+    srcs, uncovered = segments.plan(docver_id, page_ids)
+    utils.stitch_pdf(srcs=srcs, dst=tmp_path / "doc.pdf")
+
+    assert first == plib.segment_path(docver_id, 1, 3)
+    assert skipped is None
+    assert srcs[0] == plib.rel2abs(first)
+    assert uncovered == page_ids[3:]
+    with Pdf.open(tmp_path / "doc.pdf") as pdf:
+        texts = [bytes(page.Contents.read_bytes()) for page in pdf.pages]
+    assert [
+        b"page %d" % number in text
+        for number, text in enumerate(texts, start=1)
+    ] == [True] * 6
+
+    segments.remove(docver_id)
+    assert segments.find(docver_id) == {}
+
+
+def test_sweep_removes_expired_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        config.get_settings(), "papermerge__main__media_root", tmp_path
+    )
+    page_ids = make_pages(4)
+    pages = list(enumerate(page_ids, start=1))
+    old_docver_id, new_docver_id = uuid.uuid4(), uuid.uuid4()
+    segments.build(old_docver_id, pages[0:2])
+    folder = plib.abs_segments_path(old_docver_id)
+    expired = time.time() - config.get_settings().papermerge__ocr__segments_ttl
+    os.utime(folder, (expired - 1, expired - 1))
+    monkeypatch.setattr(segments, "_last_sweep", 0.0)
+
+    segments.build(new_docver_id, pages[2:4])
+
+    assert not folder.exists()
+    assert segments.find(new_docver_id) != {}
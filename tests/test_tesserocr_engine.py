@@ -0,0 +1,52 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+tesserocr_engine = pytest.importorskip("ocrworker.tesserocr_engine")
+
+
+def test_thresholding_method():
+    assert tesserocr_engine.thresholding_method(None) == 0
+    assert tesserocr_engine.thresholding_method("sauvola") == 2
+    assert tesserocr_engine.thresholding_method(1) == 1
+
+
+def test_hocr_document_is_well_formed():
+    page = (
+        "  <div class='ocr_page' id='page_1'"
+        " title='bbox 0 0 100 100; ppageno 0'>\n  </div>\n"
+    )
+    document = (
+        tesserocr_engine.HOCR_HEADER.format(version="5.3.0")
+        + page
+        + tesserocr_engine.HOCR_FOOTER
+    )
+
+    root = ET.fromstring(document.encode())
+
+    assert root.tag == "{http://www.w3.org/1999/xhtml}html"
+
+
+def test_least_recently_used_api_is_ended(monkeypatch):
+    class FakeAPI:
+        def __init__(self, lang, **kwargs):
+            self.lang = lang
+            self.ended = False
+
+        def End(self):
+            self.ended = True
+
+    monkeypatch.setattr(tesserocr_engine, "PyTessBaseAPI", FakeAPI)
+    monkeypatch.setattr(
+        tesserocr_engine, "_apis", type(tesserocr_engine._apis)()
+    )
+    monkeypatch.setattr(tesserocr_engine, "MAX_APIS", 2)
+
+    deu = tesserocr_engine.get_api("deu")
+    eng = tesserocr_engine.get_api("eng")
+    assert tesserocr_engine.get_api("deu") is deu
+    tesserocr_engine.get_api("fra")
+
+    assert eng.ended
+    assert not deu.ended
+    assert list(key[0] for key in tesserocr_engine._apis) == ["deu", "fra"]
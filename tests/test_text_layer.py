@@ -0,0 +1,134 @@
+import io
+
+from PIL import Image
+from pikepdf import Dictionary, Name, Pdf
+
+from ocrworker import text_layer
+
+TEXT = "Invoice 2024-0117 Total amount due 1.234,56 EUR"
+
+
+def make_text_page(path, text: str = TEXT, encoding=Name.WinAnsiEncoding):
+    """One page pdf with visible text shown with Helvetica"""
+    pdf = Pdf.new()
+    page = pdf.add_blank_page(page_size=(595, 842))
+    font = Dictionary(
+        Type=Name.Font,
+        Subtype=Name.Type1,
+        BaseFont=Name.Helvetica,
+        Encoding=encoding,
+    )
+    page.obj.Resources = Dictionary(Font=Dictionary(F1=font))
+    page.obj.Contents = pdf.make_stream(
+        f"BT /F1 12 Tf 72 770 Td ({text}) Tj ET".encode()
+    )
+    pdf.save(path)
+
+
+def make_scan_page(path, text: str = "Scanned by"):
+    """One page pdf with page sized image and a bit of text on top"""
+    pdf = Pdf.new()
+    page = pdf.add_blank_page(page_size=(595, 842))
+    buffer = io.BytesIO()
+    Image.new("L", (60, 80), color=200).save(buffer, format="JPEG")
+    image = pdf.make_stream(
+        buffer.getvalue(),
+        Type=Name.XObject,
+        Subtype=Name.Image,
+        Width=60,
+        Height=80,
+        ColorSpace=Name.DeviceGray,
+        BitsPerComponent=8,
+        Filter=Name.DCTDecode,
+    )
+    font = Dictionary(
+        Type=Name.Font,
+        Subtype=Name.Type1,
+        BaseFont=Name.Helvetica,
+        Encoding=Name.WinAnsiEncoding,
+    )
+    page.obj.Resources = Dictionary(
+        XObject=Dictionary(Im0=image), Font=Dictionary(F1=font)
+    )
+    page.obj.Contents = pdf.make_stream(
+        b"q 595 0 0 842 0 0 cm /Im0 Do Q "
+        + f"BT /F1 8 Tf 10 10 Td ({text}) Tj ET".encode()
+    )
+    pdf.save(path)
+
+
+def test_born_digital_page_uses_text_layer(tmp_path):
+    make_text_page(tmp_path / "page.pdf")
+
+    decision = text_layer.decide(tmp_path / "page.pdf", mode="auto")
+
+    assert decision.use_text_layer, decision.reason
+
+
+def test_every_page_is_ocred_by_default(tmp_path):
+    make_text_page(tmp_path / "page.pdf")
+
+    decision = text_layer.decide(tmp_path / "page.pdf")
+
+    assert not decision.use_text_layer
+
+
+def test_scanned_page_is_ocred(tmp_path):
+    make_scan_page(tmp_path / "page.pdf", text=TEXT)
+
+    auto = text_layer.decide(tmp_path / "page.pdf", mode="auto")
+    skip = text_layer.decide(tmp_path / "page.pdf", mode="skip")
+    force = text_layer.decide(tmp_path / "page.pdf", mode="force")
+
+    assert not auto.use_text_layer
+    assert auto.reason == "images cover 100%"
+    # in "skip" mode any text is good enough
+    assert skip.use_text_layer
+    assert not force.use_text_layer
+
+
+def test_font_without_unicode_mapping_is_ocred(tmp_path):
+    make_text_page(tmp_path / "page.pdf", encoding=Name.Custom)
+
+    decision = text_layer.decide(tmp_path / "page.pdf", mode="auto")
+
+    assert not decision.use_text_layer
+    assert decision.reason == "fonts without unicode mapping"
+
+
+def test_text_and_word_positions_are_extracted(tmp_path):
+    make_text_page(tmp_path / "page.pdf")
+
+    lines = text_layer.extract_lines(tmp_path / "page.pdf")
+    hocr = text_layer.to_hocr(lines, size=(1240, 1754))
+
+    assert text_layer.to_text(lines) == TEXT + "\n"
+    first = lines[0].words[0]
+    assert first.text == "Invoice"
+    # 72pt from the left at 150 DPI
+    assert first.x1 == 150
+    assert first.y1 < first.y2 < 200
+    assert hocr.count("class='ocrx_word'") == len(TEXT.split())
+
+
+def test_extract_writes_ocr_results(tmp_path):
+    make_text_page(tmp_path / "page.pdf")
+
+    text_layer.extract(
+        tmp_path / "page.pdf",
+        output_dir=tmp_path / "out",
+        page_pdf_name="page.pdf",
+        preview_width=300,
+    )
+
+    names = sorted(path.name for path in (tmp_path / "out").iterdir())
+    assert names == [
+        "page.hocr",
+        "page.jpg",
+        "page.pdf",
+        "page.svg",
+        "page.txt",
+    ]
+    assert (tmp_path / "out" / "page.txt").read_text() == TEXT + "\n"
+    with Image.open(tmp_path / "out" / "page.jpg") as preview:
+        assert preview.size[0] == 300
@@ -0,0 +1,132 @@
+import uuid
+
+from PIL import Image
+from pikepdf import Dictionary, Name, Pdf
+
+from ocrworker import config, plib, split, utils
+
+
+def make_pdf(path, page_count: int):
+    pdf = Pdf.new()
+    for number in range(1, page_count + 1):
+        pdf.add_blank_page(page_size=(100 + number, 200))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.save(path)
+
+
+def test_split_pdf(tmp_path):
+    src = tmp_path / "doc.pdf"
+    make_pdf(src, page_count=3)
+
+    paths = utils.split_pdf(src, tmp_path / "pages")
+
+    assert [p.name for p in paths] == ["000001.pdf", "000002.pdf", "000003.pdf"]
+    for number, path in enumerate(paths, start=1):
+        with Pdf.open(path) as pdf:
+            assert len(pdf.pages) == 1
+            assert pdf.pages[0].mediabox[2] == 100 + number
+
+
+def test_split_docver_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        config.get_settings(), "papermerge__main__media_root", tmp_path
+    )
+    doc_ver_id = uuid.uuid4()
+    make_pdf(plib.abs_docver_path(doc_ver_id, "doc.pdf"), page_count=2)
+
+    first = split.split_docver(doc_ver_id, "doc.pdf")
+    mtimes = [p.stat().st_mtime_ns for p in first]
+    second = split.split_docver(doc_ver_id, "doc.pdf")
+
+    assert len(first) == 2
+    assert first == second
+    assert mtimes == [p.stat().st_mtime_ns for p in second]
+
+
+def make_page_with_font(path, width: int):
+    pdf = Pdf.new()
+    page = pdf.add_blank_page(page_size=(width, 200))
+    font = Dictionary(
+        Type=Name.Font,
+        Subtype=Name.TrueType,
+        BaseFont=Name.GlyphLessFont,
+        FontDescriptor=Dictionary(FontFile2=pdf.make_stream(b"font" * 100)),
+    )
+    page.obj.Resources = Dictionary(Font=Dictionary(F0=pdf.make_indirect(font)))
+    pdf.save(path)
+
+
+def test_stitch_pdf_dedupes_fonts(tmp_path):
+    srcs = [tmp_path / "1.pdf", tmp_path / "2.pdf", tmp_path / "3.pdf"]
+    for width, src in enumerate(srcs, start=100):
+        make_page_with_font(src, width)
+    dst = tmp_path / "out" / "doc.pdf"
+
+    utils.stitch_pdf(srcs=srcs, dst=dst)
+
+    with Pdf.open(dst) as pdf:
+        fonts = {page.Resources.Font.F0.objgen for page in pdf.pages}
+        widths = [page.mediabox[2] for page in pdf.pages]
+
+    assert len(fonts) == 1
+    assert widths == [100, 101, 102]
+
+
+def test_page_chunk_size():
+    # short documents are OCRed by one task
+    assert utils.page_chunk_size(3, concurrency=8, min_size=4) == 4
+    # pages are spread over all worker processes
+    assert utils.page_chunk_size(100, concurrency=8, min_size=4) == 13
+    # but chunk never grows above max size
+    assert utils.page_chunk_size(5000, 8, min_size=4, max_size=32) == 32
+
+
+def test_chunks():
+    assert utils.chunks([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert utils.chunks([], 2) == []
+
+
+def test_split_evenly():
+    assert utils.split_evenly([1, 2, 3, 4, 5], 2) == [[1, 2, 3], [4, 5]]
+    assert utils.split_evenly([1, 2], 3) == [[1], [2]]
+    assert utils.split_evenly([], 3) == []
+
+
+def test_split_multi_page_tiff(tmp_path):
+    frames = [
+        Image.new("1", (85, 110), color=1),
+        Image.new("L", (170, 220), color=128),
+        Image.new("RGBA", (85, 110), color=(255, 0, 0, 128)),
+    ]
+    src = tmp_path / "scan.tiff"
+    frames[0].save(src, save_all=True, append_images=frames[1:], dpi=(72, 72))
+
+    paths = utils.split_document(src, tmp_path / "pages")
+
+    assert [p.name for p in paths] == ["000001.pdf", "000002.pdf", "000003.pdf"]
+    widths = []
+    for path in paths:
+        with Pdf.open(path) as pdf:
+            assert len(pdf.pages) == 1
+            widths.append(round(float(pdf.pages[0].mediabox[2])))
+    # page size follows image size and resolution
+    assert widths == [85, 170, 85]
+
+
+def test_split_jpeg(tmp_path):
+    src = tmp_path / "photo.jpg"
+    Image.new("RGB", (100, 50), color=(0, 128, 0)).save(src, dpi=(100, 100))
+
+    (path,) = utils.split_document(src, tmp_path / "pages")
+
+    with Pdf.open(path) as pdf:
+        (image,) = pdf.pages[0].Resources.XObject.values()
+        # JPEG is embedded as is
+        assert image.Filter == Name.DCTDecode
+        assert image.read_raw_bytes() == src.read_bytes()
+
+
+def test_target_file_name():
+    assert utils.target_file_name("scan.tiff") == "scan.pdf"
+    assert utils.target_file_name("photo.JPG") == "photo.pdf"
+    assert utils.target_file_name("invoice.pdf") == "invoice.pdf"